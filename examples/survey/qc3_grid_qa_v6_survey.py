@@ -0,0 +1,49 @@
+import logging
+
+from hyo2.abc.lib.logging import set_logging
+from hyo2.qc.survey.project import SurveyProject
+from hyo2.qc.common import testing
+
+logger = logging.getLogger(__name__)
+set_logging(ns_list=["hyo2.qc", ])
+
+
+def main():
+    # create the project
+    prj = SurveyProject(output_folder=testing.output_data_folder())
+
+    # options
+    workers = 4
+    force_tvu_qc = True
+    calc_object_detection = False
+    calc_full_coverage = True
+    hist_depth = True
+    hist_density = True
+    hist_tvu_qc = True
+    hist_pct_res = True
+    depth_vs_density = True
+    depth_vs_tvu_qc = True
+
+    # add all the test grid files
+    for grid_file in testing.input_test_files(".bag"):
+        prj.add_to_grid_list(path=grid_file)
+        logger.debug("adding test grid file: %s" % grid_file)
+
+    ret = prj.grid_qa_v6_survey(
+        workers=workers, force_tvu_qc=force_tvu_qc,
+        calc_object_detection=calc_object_detection, calc_full_coverage=calc_full_coverage,
+        hist_depth=hist_depth, hist_density=hist_density, hist_tvu_qc=hist_tvu_qc, hist_pct_res=hist_pct_res,
+        depth_vs_density=depth_vs_density, depth_vs_tvu_qc=depth_vs_tvu_qc
+    )
+
+    for grid_path, passed in prj.grid_qa_survey_results:
+        logger.info("%s: passed? %s" % (grid_path, passed))
+    for name, item in prj.grid_qa_survey_stats.summary().items():
+        logger.info("%s: %s" % (name, item))
+    prj.open_gridqa_output_folder()
+    logger.info("survey passed? %s" % ret)
+
+
+# the guard is required by the worker processes (spawned by re-importing this script on Windows and macOS)
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 import sys
+from multiprocessing import freeze_support
 
 from hyo2.abc.lib.logging import set_logging
 from hyo2.qc.qctools.gui import gui
 from hyo2.qc.cli.cli import cli
 
-set_logging(ns_list=["hyo2.qc", ])
+if __name__ == "__main__":
+    # required by the worker processes of the frozen application
+    freeze_support()
 
-if len(sys.argv) == 1:
-    gui()
-else:
-    cli()
+    set_logging(ns_list=["hyo2.qc", ])
+
+    if len(sys.argv) == 1:
+        gui()
+    else:
+        cli()
@@ -1,15 +1,6 @@
 import numpy as np
-from matplotlib import rcParams
 from scipy.spatial import Delaunay
 
-rcParams['ytick.labelsize'] = 8
-rcParams['xtick.labelsize'] = 8
-import matplotlib
-
-matplotlib.use('Qt5Agg')
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
-
 import logging
 
 logger = logging.getLogger(__name__)
@@ -380,6 +371,14 @@ class TriangleRuleV2(BaseTriangle):
         logger.debug('plotting')
         self.progress.add(quantum=10, text="Plotting")
 
+        # the interactive plot is the only GUI part, so matplotlib is loaded here
+        import matplotlib
+        matplotlib.use('Qt5Agg')
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import FuncFormatter
+        matplotlib.rcParams['ytick.labelsize'] = 8
+        matplotlib.rcParams['xtick.labelsize'] = 8
+
         if not save_fig:
             plt.ion()
 
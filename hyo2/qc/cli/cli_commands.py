@@ -33,6 +33,19 @@ class CliCommands:
                                     help='Enable the Noisy Edges Check.')
         self.ff_parser.add_argument('-m', '--check_margins', action='store_true', default=False,
                                     help='Enable the Noisy Margins Check.')
+        self.ff_parser.add_argument('--halo', type=int, default=0,
+                                    help='Number of rows borrowed from the adjacent tiles, so that the checks '
+                                         'also cover the tile seams. Only the flags in the tile core are kept.')
+        self.ff_parser.add_argument('--workers', type=int, default=1,
+                                    help='Number of worker processes used to search the tiles in parallel.')
+        self.ff_parser.add_argument('--tile_cache', action='store_true', default=False,
+                                    help='Keep the flags of each tile in the output folder, so that a new run only '
+                                         'searches the tiles with changed depths or parameters.')
+        self.ff_parser.add_argument('--sweep', nargs='+', type=str, default=None, metavar='HEIGHT:CHECKS:FILTERS',
+                                    help="Run several configurations reading the DTM once "
+                                         "(e.g., '1.0:123:2 auto:23:'). Each one is a height (or 'auto'), the check "
+                                         "numbers and the filter numbers (1: FFF, 2: designated). When passed, the "
+                                         "height, check and filter options are ignored.")
         self.ff_parser.add_argument('--filter_designated', action='store_true', default=False,
                                     help='Enable filtering of designated soundings.')
         self.ff_parser.add_argument('--filter_fff', action='store_true', default=False,
@@ -49,6 +62,9 @@ class CliCommands:
                                     help='Enable KML as an additional output format for the flags.')
         self.ff_parser.add_argument('-s', '--enable_shp_output', action='store_true', default=False,
                                     help='Enable Shapefile as an additional output format for the flags.')
+        self.ff_parser.add_argument('-t', '--enable_tif_output', action='store_true', default=False,
+                                    help='Enable a GeoTIFF raster (with a bit for each check) as an additional output '
+                                         'format for the flags.')
         self.ff_parser.add_argument('--output_in_project_folder', action='store_true', default=False,
                                     help='Output is put in a project folder.')
         self.ff_parser.add_argument('--output_in_tool_folder', action='store_true', default=False,
@@ -2,10 +2,10 @@ import logging
 import os
 from urllib.request import urlopen
 
-from hyo2.abc.app.web_renderer import WebRenderer
 from hyo2.abc.lib.helper import Helper
 from hyo2.qc.common import lib_info
 from hyo2.qc.qctools import app_info
+from hyo2.qc.survey.fliers.find_fliers_v9_sweep import parse_sweep_config
 from hyo2.qc.survey.project import SurveyProject
 from hyo2.qc.cli.cli_commands import CliCommands
 
@@ -21,6 +21,8 @@ class QCToolsParser:
         self._web = None 
 
     def run(self):
+        # the web renderer requires Qt, so it is only loaded when the CLI is run
+        from hyo2.abc.app.web_renderer import WebRenderer
         self._web = WebRenderer(make_app=True)
         args = self.cli_commands.parser.parse_args()
         try:
@@ -107,9 +109,22 @@ class QCToolsParser:
         check_edges = args.check_edges
         check_margins = args.check_margins
 
+        if args.halo < 0:
+            raise RuntimeError('Invalid halo: %s' % args.halo)
+        halo = args.halo
+
+        if args.workers < 1:
+            raise RuntimeError('Invalid number of workers: %s' % args.workers)
+        workers = args.workers
+
         filter_designated = args.filter_designated
         filter_fff = args.filter_fff
 
+        sweep_configs = list()
+        if args.sweep is not None:
+            sweep_configs = [parse_sweep_config(config) for config in args.sweep]
+            logger.debug('sweep configurations: %d' % len(sweep_configs))
+
         self._check_web_page(token='FFv9_%d%d%d%d%d%d%d_%d%d' % (check_laplacian, check_curv, check_adjacent,
                                                                  check_slivers, check_isolated, check_edges,
                                                                  check_margins,
@@ -126,6 +141,22 @@ class QCToolsParser:
             prj.set_cur_grid(path=grid_path)
             prj.open_to_read_cur_grid()
 
+            if len(sweep_configs) > 0:
+                prj.flier_finder_v9_sweep(configs=sweep_configs,
+                                          halo=halo,
+                                          workers=workers,
+                                          tile_cache=args.tile_cache,
+                                          export_flags=args.enable_tif_output)
+                prj.close_cur_grid()
+
+                prj.set_cur_grid(path=grid_path)
+                prj.open_to_read_cur_grid()
+                prj.flier_finder_v9_sweep_apply_filters(distance=distance, delta_z=delta_z)
+
+                nr_saved = prj.save_fliers_sweep()
+                logger.debug('Fliers saved for %d configurations' % nr_saved)
+                continue
+
             prj.flier_finder_v9(height=height_value,
                                 check_laplacian=check_laplacian,
                                 check_curv=check_curv,
@@ -134,8 +165,12 @@ class QCToolsParser:
                                 check_isolated=check_isolated,
                                 check_edges=check_edges,
                                 check_margins=check_margins,
+                                halo=halo,
+                                workers=workers,
+                                tile_cache=args.tile_cache,
                                 filter_fff=filter_fff,
-                                filter_designated=filter_designated)
+                                filter_designated=filter_designated,
+                                export_flags=args.enable_tif_output)
             prj.close_cur_grid()
 
             prj.set_cur_grid(path=grid_path)
@@ -4,13 +4,17 @@ import traceback
 from typing import List, Optional
 
 from hyo2.enc.lib.s57.s57 import S57, S57File
+from hyo2.qc.common.s57_cache import S57Cache
 
 logger = logging.getLogger(__name__)
 
 
 class Features:
 
-    def __init__(self):
+    def __init__(self, s57_cache: Optional[S57Cache] = None):
+
+        # cache of the parsed files (if any)
+        self._s57_cache = s57_cache
 
         # features
         self._cur_s57: Optional[S57File] = None
@@ -116,11 +120,7 @@ class Features:
     def _read_s57_file(self, s57_path: str) -> None:
         """Read the S57 file"""
         try:
-            s57 = S57()
-            # noinspection PyTypeChecker
-            s57.set_input_filename(s57_path)
-            s57.read()
-            self._cur_s57 = s57.input_s57file
+            self._cur_s57 = self._parse(s57_path)
             self._cur_s57_path = s57_path
             self._cur_s57_basename = os.path.basename(self._cur_s57_path)
             # logger.debug("Read S57 file: %s, %s" % (s57_path, self._cur_s57))
@@ -131,6 +131,16 @@ class Features:
             self._cur_s57_basename = None
             raise e
 
+    def _parse(self, s57_path: str):
+        if self._s57_cache is not None:
+            return self._s57_cache.read(s57_path)
+
+        s57 = S57()
+        # noinspection PyTypeChecker
+        s57.set_input_filename(s57_path)
+        s57.read()
+        return s57.input_s57file
+
     # ________________________________________________________________________________
     # ##############################   SS READ METHODS   #############################
 
@@ -156,11 +166,7 @@ class Features:
     def _read_ss_file(self, ss_path: str) -> None:
         """Read the SS file"""
         try:
-            ss = S57()
-            # noinspection PyTypeChecker
-            ss.set_input_filename(ss_path)
-            ss.read()
-            self._cur_ss = ss.input_s57file
+            self._cur_ss = self._parse(ss_path)
             self._cur_ss_path = ss_path
             self._cur_ss_basename = os.path.basename(self._cur_ss_path)
 
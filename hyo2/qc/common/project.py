@@ -8,6 +8,8 @@ from hyo2.abc.lib.progress.cli_progress import CliProgress
 from hyo2.grids.grids_manager import GridsManager
 from hyo2.qc.common import lib_info
 from hyo2.qc.common.features import Features
+from hyo2.qc.common.result_cache import ResultCache
+from hyo2.qc.common.s57_cache import S57Cache
 
 logger = logging.getLogger(__name__)
 
@@ -44,8 +46,12 @@ class BaseProject:
         self._gr = GridsManager()
         self._gr2 = GridsManager()
 
-        # features
-        self._ft = Features()
+        # features (the parsed files are cached and shared by all the tools)
+        self._s57_cache = S57Cache(cache_folder=self.default_s57_cache_folder())
+        self._ft = Features(s57_cache=self._s57_cache)
+
+        # per-file results (reused for the unchanged files, only if enabled with use_result_cache)
+        self._result_cache = None
 
         # outputs
         self._output_shp = True
@@ -73,6 +79,35 @@ class BaseProject:
 
         return output_folder
 
+    @classmethod
+    def default_s57_cache_folder(cls):
+        return os.path.join(Helper(lib_info=lib_info).package_folder(), "s57_cache")
+
+    @classmethod
+    def default_result_cache_folder(cls):
+        return os.path.join(Helper(lib_info=lib_info).package_folder(), "result_cache")
+
+    @property
+    def use_result_cache(self) -> bool:
+        return self._result_cache is not None
+
+    @use_result_cache.setter
+    def use_result_cache(self, value: bool) -> None:
+        """Reuse the per-file results of earlier runs for the unchanged files (off by default)"""
+        if not value:
+            self._result_cache = None
+        elif self._result_cache is None:
+            self._result_cache = ResultCache(cache_folder=self.default_result_cache_folder(), partial_hash=True)
+
+    @property
+    def result_cache(self):
+        """The cache of the per-file results (None, the default, to always recalculate them)"""
+        return self._result_cache
+
+    @result_cache.setter
+    def result_cache(self, result_cache):
+        self._result_cache = result_cache
+
     @property
     def output_folder(self):
         return self._output_folder
@@ -224,7 +259,7 @@ class BaseProject:
         self._gr2.callback = self._cb
 
         # features
-        self._ft = Features()
+        self._ft = Features(s57_cache=self._s57_cache)
 
         # used to name the output folder
         self._survey = str()
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Cache of the per-file QC results, kept in memory and on disk
+
+    Each entry is named by the file path, the tool and its options, and it stores the file identity (size,
+    modification time and, optionally, a hash of the first and last bytes). So, a changed file replaces its entry.
+    """
+
+    version = 1  # type: int
+    partial_hash_size = 1 << 20  # type: int
+
+    def __init__(self, cache_folder: Optional[str] = None, partial_hash: bool = False) -> None:
+        self.cache_folder = cache_folder  # type: Optional[str]
+        self.partial_hash = partial_hash  # type: bool
+        self._memory = dict()  # type: dict
+        self.hits = 0  # type: int
+        self.misses = 0  # type: int
+
+    def identity(self, path: str) -> str:
+        stat = os.stat(path)
+        identity = "%d|%d" % (stat.st_size, stat.st_mtime_ns)
+        if self.partial_hash:
+            hasher = hashlib.blake2b(digest_size=20)
+            with open(path, 'rb') as fid:
+                hasher.update(fid.read(self.partial_hash_size))
+                if stat.st_size > 2 * self.partial_hash_size:
+                    fid.seek(-self.partial_hash_size, os.SEEK_END)
+                    hasher.update(fid.read(self.partial_hash_size))
+            identity += "|%s" % hasher.hexdigest()
+        return identity
+
+    @classmethod
+    def _name(cls, path: str, tool: str, options: dict) -> str:
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(("%d|%s|%s|%s" % (cls.version, os.path.abspath(path), tool,
+                                        json.dumps(options, sort_keys=True))).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _entry_path(self, name: str) -> Optional[str]:
+        if self.cache_folder is None:
+            return None
+        return os.path.join(self.cache_folder, "%s.pkl" % name)
+
+    def read(self, path: str, tool: str, options: dict) -> Optional[dict]:
+        """Return the cached result of the tool for the file (None if missing or if the file has changed)"""
+        name = self._name(path=path, tool=tool, options=options)
+        try:
+            identity = self.identity(path)
+        except OSError as e:
+            logger.info("unable to identify %s: %s" % (path, e))
+            self.misses += 1
+            return None
+
+        entry = self._memory.get(name)
+        entry_path = self._entry_path(name)
+        if (entry is None) and (entry_path is not None) and os.path.exists(entry_path):
+            try:
+                with open(entry_path, 'rb') as fid:
+                    entry = pickle.load(fid)
+
+            except Exception as e:
+                logger.info("unable to read the cached result for %s: %s" % (path, e))
+
+        if (entry is None) or (entry['identity'] != identity):
+            self.misses += 1
+            return None
+
+        self._memory[name] = entry
+        self.hits += 1
+        logger.info("%s result from cache: %s" % (tool, path))
+        return entry['result']
+
+    def write(self, path: str, tool: str, options: dict, result: dict) -> None:
+        name = self._name(path=path, tool=tool, options=options)
+        try:
+            entry = {'identity': self.identity(path), 'result': result}
+        except OSError as e:
+            logger.info("unable to identify %s: %s" % (path, e))
+            return
+        self._memory[name] = entry
+
+        entry_path = self._entry_path(name)
+        if entry_path is None:
+            return
+        tmp_path = entry_path + ".tmp"
+        try:
+            if not os.path.exists(self.cache_folder):
+                os.makedirs(self.cache_folder)
+            with open(tmp_path, 'wb') as fid:
+                pickle.dump(entry, fid, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+
+        except Exception as e:
+            logger.info("unable to cache the result for %s: %s" % (path, e))
+
+    def clear(self) -> None:
+        """Remove all the entries, both in memory and on disk (the *.pkl files in the cache folder)"""
+        self._memory.clear()
+        if (self.cache_folder is None) or not os.path.exists(self.cache_folder):
+            return
+
+        for name in os.listdir(self.cache_folder):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                os.remove(os.path.join(self.cache_folder, name))
+            except OSError as e:
+                logger.info("unable to remove %s: %s" % (name, e))
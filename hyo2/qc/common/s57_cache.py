@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from hyo2.enc.lib.s57.s57 import S57
+
+logger = logging.getLogger(__name__)
+
+
+class CachedS57Point:
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x: float, y: float, z: Optional[float] = None) -> None:
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class CachedS57Attribute:
+    __slots__ = ('acronym', 'value')
+
+    def __init__(self, acronym: str, value: Optional[str]) -> None:
+        self.acronym = acronym
+        self.value = value
+
+
+class CachedS57Feature:
+    __slots__ = ('acronym', 'attributes', 'centroid', 'geo2s', 'geo3s')
+
+    def __init__(self, acronym: str, attributes: List[CachedS57Attribute], centroid: Optional[CachedS57Point],
+                 geo2s: List[CachedS57Point], geo3s: List[CachedS57Point]) -> None:
+        self.acronym = acronym
+        self.attributes = attributes
+        self.centroid = centroid
+        self.geo2s = geo2s
+        self.geo3s = geo3s
+
+
+class CachedS57File:
+    """Subset of the parsed S57 file used by the QC tools: the features with acronym, attributes and positions"""
+
+    def __init__(self, rec10s: List[CachedS57Feature]) -> None:
+        self.rec10s = rec10s
+
+    def __bool__(self) -> bool:
+        return True
+
+
+class S57Cache:
+    """Cache of the parsed S57 files, kept in memory and on disk
+
+    Each file is keyed by path, size and modification time. On disk, the features are stored as NumPy arrays
+    (with offsets for the variable-length geometries and attributes) and a table for all the strings.
+    """
+
+    version = 1  # type: int
+    max_in_memory = 4  # type: int
+
+    def __init__(self, cache_folder: Optional[str] = None) -> None:
+        self.cache_folder = cache_folder  # type: Optional[str]
+        self._memory = OrderedDict()  # type: OrderedDict
+
+    @classmethod
+    def _key(cls, s57_path: str) -> str:
+        stat = os.stat(s57_path)
+        return "%s|%d|%d|%d" % (os.path.abspath(s57_path), stat.st_size, stat.st_mtime_ns, cls.version)
+
+    def _cache_path(self, s57_path: str) -> Optional[str]:
+        if self.cache_folder is None:
+            return None
+        name = hashlib.sha1(os.path.abspath(s57_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_folder, "%s.npz" % name)
+
+    def read(self, s57_path: str):
+        """Return the parsed S57 file, parsing it only if not already cached"""
+        key = self._key(s57_path)
+
+        s57_file = self._memory.get(key)
+        if s57_file is not None:
+            self._memory.move_to_end(key)
+            logger.debug("S57 from memory cache: %s" % s57_path)
+            return s57_file
+
+        cache_path = self._cache_path(s57_path)
+        if (cache_path is not None) and os.path.exists(cache_path):
+            try:
+                s57_file = self._load(cache_path=cache_path, key=key)
+                if s57_file is not None:
+                    logger.debug("S57 from disk cache: %s" % s57_path)
+
+            except Exception as e:
+                logger.info("unable to load the cached S57 for %s: %s" % (s57_path, e))
+
+        if s57_file is None:
+            s57 = S57()
+            # noinspection PyTypeChecker
+            s57.set_input_filename(s57_path)
+            s57.read()
+            s57_file = s57.input_s57file
+
+            if cache_path is not None:
+                try:
+                    self._dump(s57_file=s57_file, cache_path=cache_path, key=key)
+
+                except Exception as e:
+                    logger.info("unable to cache the parsed S57 for %s: %s" % (s57_path, e))
+
+        self._memory[key] = s57_file
+        while len(self._memory) > self.max_in_memory:
+            self._memory.popitem(last=False)
+
+        return s57_file
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    @classmethod
+    def _dump(cls, s57_file, cache_path: str, key: str) -> None:
+        strings = dict()
+
+        def _string_idx(value) -> int:
+            if value is None:
+                return -1
+            if not isinstance(value, str):
+                raise RuntimeError("unsupported value type: %s" % type(value))
+            return strings.setdefault(value, len(strings))
+
+        features = s57_file.rec10s
+        nr_features = len(features)
+        acronyms = np.zeros(nr_features, dtype=np.int32)
+        centroids = np.full((nr_features, 3), np.nan, dtype=np.float64)
+        has_centroid = np.zeros(nr_features, dtype=bool)
+        has_centroid_z = np.zeros(nr_features, dtype=bool)
+        geo2_offsets = np.zeros(nr_features + 1, dtype=np.int64)
+        geo3_offsets = np.zeros(nr_features + 1, dtype=np.int64)
+        attr_offsets = np.zeros(nr_features + 1, dtype=np.int64)
+        geo2s = list()
+        geo3s = list()
+        attrs = list()
+
+        for idx, ft in enumerate(features):
+            acronyms[idx] = _string_idx(ft.acronym)
+
+            if ft.centroid is not None:
+                has_centroid[idx] = True
+                centroids[idx, 0] = float(ft.centroid.x)
+                centroids[idx, 1] = float(ft.centroid.y)
+                z = getattr(ft.centroid, 'z', None)
+                if z is not None:
+                    has_centroid_z[idx] = True
+                    centroids[idx, 2] = float(z)
+
+            for geo2 in ft.geo2s:
+                geo2s.append((float(geo2.x), float(geo2.y)))
+            for geo3 in ft.geo3s:
+                geo3s.append((float(geo3.x), float(geo3.y), float(geo3.z)))
+            for attr in ft.attributes:
+                attrs.append((_string_idx(attr.acronym), _string_idx(attr.value)))
+
+            geo2_offsets[idx + 1] = len(geo2s)
+            geo3_offsets[idx + 1] = len(geo3s)
+            attr_offsets[idx + 1] = len(attrs)
+
+        encoded = [s.encode('utf-8') for s in sorted(strings, key=strings.get)]
+        string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        string_offsets[1:] = np.cumsum([len(s) for s in encoded])
+
+        if not os.path.exists(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path))
+        tmp_path = cache_path + ".tmp.npz"
+        np.savez(tmp_path, key=np.array(key),
+                 acronyms=acronyms, centroids=centroids, has_centroid=has_centroid, has_centroid_z=has_centroid_z,
+                 geo2_offsets=geo2_offsets, geo2s=np.array(geo2s, dtype=np.float64).reshape(-1, 2),
+                 geo3_offsets=geo3_offsets, geo3s=np.array(geo3s, dtype=np.float64).reshape(-1, 3),
+                 attr_offsets=attr_offsets, attrs=np.array(attrs, dtype=np.int32).reshape(-1, 2),
+                 string_offsets=string_offsets, string_blob=np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        os.replace(tmp_path, cache_path)
+
+    @classmethod
+    def _load(cls, cache_path: str, key: str) -> Optional[CachedS57File]:
+        with np.load(cache_path, allow_pickle=False) as npz:
+            if str(npz['key']) != key:
+                return None
+            data = {name: npz[name] for name in npz.files}
+
+        blob = data['string_blob'].tobytes()
+        string_offsets = data['string_offsets'].tolist()
+        strings = [blob[string_offsets[i]:string_offsets[i + 1]].decode('utf-8')
+                   for i in range(len(string_offsets) - 1)]
+        strings.append(None)  # index -1
+
+        centroids = data['centroids'].tolist()
+        has_centroid = data['has_centroid'].tolist()
+        has_centroid_z = data['has_centroid_z'].tolist()
+        geo2_offsets = data['geo2_offsets'].tolist()
+        geo2s = data['geo2s'].tolist()
+        geo3_offsets = data['geo3_offsets'].tolist()
+        geo3s = data['geo3s'].tolist()
+        attr_offsets = data['attr_offsets'].tolist()
+        attrs = data['attrs'].tolist()
+
+        features = list()
+        for idx, acronym in enumerate(data['acronyms'].tolist()):
+            centroid = None
+            if has_centroid[idx]:
+                x, y, z = centroids[idx]
+                centroid = CachedS57Point(x, y, z if has_centroid_z[idx] else None)
+
+            features.append(CachedS57Feature(
+                acronym=strings[acronym],
+                attributes=[CachedS57Attribute(strings[a], strings[v])
+                            for a, v in attrs[attr_offsets[idx]:attr_offsets[idx + 1]]],
+                centroid=centroid,
+                geo2s=[CachedS57Point(x, y) for x, y in geo2s[geo2_offsets[idx]:geo2_offsets[idx + 1]]],
+                geo3s=[CachedS57Point(x, y, z) for x, y, z in geo3s[geo3_offsets[idx]:geo3_offsets[idx + 1]]]))
+
+        return CachedS57File(rec10s=features)
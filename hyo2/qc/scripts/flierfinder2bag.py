@@ -17,13 +17,11 @@ import sys
 from glob import glob
 from shutil import copyfile
 
-import matplotlib.pyplot as plt
 import numpy as np
 import tables as tbl
 from hyo2.grids.grids import _grids
-from osgeo import gdal, osr
-
-plt.ion()
+from osgeo import gdal, ogr, osr
+from scipy.spatial import cKDTree
 
 __doc__ = 'flierfinder2bag'
 __version__ = '0.0.2'
@@ -38,7 +36,8 @@ def process_all_files(flier_path,
                       feat_types=None,
                       output_name_update='roombaed',
                       output_path='',
-                      fix_trackinglist=True):
+                      fix_trackinglist=True,
+                      in_place=False):
     """
     Given a path or several paths, updated all bag by removing all fliers
     that do not correlate with features.  This is the primary method for this
@@ -82,6 +81,10 @@ def process_all_files(flier_path,
                             is determined to be incorrect.  See the method
                             'fix_bag_trackinglist' for more details. Default
                             is True.
+
+        in_place : A boolean that causes the bag files to be updated without
+                   making a copy (output_name_update and output_path are
+                   ignored).  Default is False.
         
     """
     if feat_types is None:
@@ -94,25 +97,34 @@ def process_all_files(flier_path,
 
     print('Processing ' + str(numfiles) + ' flier finder files, skipping ' +
           str(len(report_list)) + ' files.')
+    # several flier files usually share the same feature file
+    projected = {}
     for n, run in enumerate(run_list):
         flier_file, bag_file, feature_file = run
         path, f = os.path.split(flier_file)
         print(str(n + 1) + '/' + str(numfiles) + ': ' + f)
         fliers, fliers_file = open_flier_finder_output(flier_file)
         bag_wkt, res, xmin, ymin = get_bag_info(bag_file)
-        feature_ds = open_feature_file(feature_file)
+        key = (feature_file, bag_wkt)
+        feature_ds = None
+        if key not in projected:
+            feature_ds = open_feature_file(feature_file)
+            projected[key] = project_features(feature_ds, bag_wkt,
+                                              feat_types=feat_types)
         position_list = find_uncorrelated_features(feature_ds,
                                                    fliers,
                                                    bag_wkt,
                                                    buffer=buffer_size,
-                                                   feat_types=feat_types)
+                                                   feat_types=feat_types,
+                                                   projected_features=projected[key])
         bag_index_array = convert_coordinates_to_index(position_list,
                                                        res, xmin, ymin)
         update_new_bag(bag_file,
                        bag_index_array,
                        name_update=output_name_update,
                        new_path=output_path,
-                       fix_trackinglist=fix_trackinglist)
+                       fix_trackinglist=fix_trackinglist,
+                       in_place=in_place)
     if len(report_list) > 0:
         print('These files were not found to have the required correlating files:')
         print(report_list)
@@ -227,8 +239,54 @@ def open_feature_file(feature_filename):
     return features_ds
 
 
+def project_features(feature_file, bag_wkt, feat_types=None):
+    """
+    Provided a GDAL feature file, project once all the features of the
+    selected layer types in the spatial reference system provided as WKT.
+
+    Return an array with the positions of the point features (used to build
+    a spatial index) and a list with the other projected geometries (lines
+    and areas).
+
+    The feature file layer types to be used can be provided as a list of
+    strings.  The default layer types include 'OBSTRN', 'UWTROC' and 'WRECKS'.
+    """
+    if feat_types is None:
+        feat_types = default_feat_types
+
+    dest_srs = osr.SpatialReference()
+    dest_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    dest_srs.ImportFromWkt(bag_wkt)
+
+    points = []
+    geometries = []
+    for m in range(feature_file.GetLayerCount()):
+        slyr = feature_file.GetLayerByIndex(m)
+        # make sure this is a feature layer type we want to work with
+        if slyr.GetName() not in feat_types:
+            continue
+        slyr.ResetReading()
+        feat_srs = slyr.GetSpatialRef()
+        feat_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        feat_trans = osr.CoordinateTransformation(feat_srs, dest_srs)
+        for f in slyr:
+            feat = f.GetGeometryRef()
+            if feat is None:
+                continue
+            # project the geometry so we can work in meters
+            feat = feat.Clone()
+            feat.Transform(feat_trans)
+            if ogr.GT_Flatten(feat.GetGeometryType()) == ogr.wkbPoint:
+                points.append((feat.GetX(), feat.GetY()))
+            else:
+                geometries.append(feat)
+        slyr.ResetReading()
+
+    return np.array(points, dtype=np.float64).reshape(-1, 2), geometries
+
+
 def find_uncorrelated_features(feature_file, fliers, bag_wkt, buffer=16,
-                               feat_types=None):
+                               feat_types=None, projected_features=None):
     """
     Provided a GDAL feature file and a GDAL layer containing the fliers as
     GDAL features (these are assumed to be single point polygons), return
@@ -244,57 +302,65 @@ def find_uncorrelated_features(feature_file, fliers, bag_wkt, buffer=16,
     The feature file layer types to be used for correlation can also be
     provided as a list of strings.  The default layer types include 'OBSTRN', 
     'UWTROC' and 'WRECKS'.
+
+    The output of 'project_features' can be passed as projected_features to
+    reuse it for several flier files with the same feature file.
+
+    The fliers are projected in bulk and matched against a spatial index of
+    the point features.  The other geometries are only measured against the
+    fliers within the radius of their envelope.
     """
-    if feat_types is None:
-        feat_types = default_feat_types
+    if projected_features is None:
+        projected_features = project_features(feature_file, bag_wkt, feat_types=feat_types)
+    feat_points, feat_geometries = projected_features
 
     # get a transformation to utmthe bag reference system
     dest_srs = osr.SpatialReference()
     dest_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
     dest_srs.ImportFromWkt(bag_wkt)
-    # get the number of feature file layers to work with
-    numlyrs = feature_file.GetLayerCount()
     # get the spatial info for the fliers
     flier_srs = fliers.GetSpatialRef()
     flier_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
     flier_trans = osr.CoordinateTransformation(flier_srs, dest_srs)
-    # the fliers that are not correlated with features
-    corr_idx = []
-    # cycle through all the fliers
+
+    # collect all the fliers, then project them at once
+    flier_points = []
+    multipoints = []
+    fliers.ResetReading()
     for n, k in enumerate(fliers):
         g = k.geometry()
         if g.GetGeometryCount() > 1:
             print('multipoint flier found: ' + str(n))
-        else:
-            flier = g.GetGeometryRef(0)
-            flier.Transform(flier_trans)
-            # sort through all the feature layers
-            for m in range(numlyrs):
-                slyr = feature_file.GetLayerByIndex(m)
-                sname = slyr.GetName()
-                # make sure this is a feature layer type we want to work with
-                if sname in feat_types:
-                    slyr.ResetReading()
-                    feat_srs = slyr.GetSpatialRef()
-                    feat_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-                    feat_trans = osr.CoordinateTransformation(feat_srs, dest_srs)
-                    # work through all the features in the layer
-                    for f in slyr:
-                        feat = f.GetGeometryRef()
-                        # project the point so we can work in meters
-                        feat.Transform(feat_trans)
-                        dist = feat.Distance(flier)
-                        if dist < buffer:
-                            corr_idx.append(n)
+            multipoints.append(n)
+        flier = g.GetGeometryRef(0) if g.GetGeometryCount() > 0 else g
+        flier_points.append((flier.GetX(), flier.GetY(), flier.GetZ()))
     fliers.ResetReading()
-    uncor_list = []
-    for n, k in enumerate(fliers):
-        if n not in corr_idx:
-            g = k.geometry()
-            flier = g.GetGeometryRef(0)
-            flier.Transform(flier_trans)
-            uncor_list.append(flier.GetPoint())
-    return uncor_list
+    if len(flier_points) == 0:
+        return []
+    flier_points = np.array(flier_trans.TransformPoints(flier_points), dtype=np.float64)
+    flier_xys = flier_points[:, :2]
+
+    # the fliers that are correlated with features
+    correlated = np.zeros(len(flier_points), dtype=bool)
+    if len(feat_points) > 0:
+        dists, _ = cKDTree(feat_points).query(flier_xys, k=1, distance_upper_bound=buffer)
+        correlated |= dists < buffer
+    if len(feat_geometries) > 0:
+        flier_tree = cKDTree(flier_xys)
+        for feat in feat_geometries:
+            min_x, max_x, min_y, max_y = feat.GetEnvelope()
+            radius = 0.5 * np.hypot(max_x - min_x, max_y - min_y) + buffer
+            for n in flier_tree.query_ball_point(((min_x + max_x) / 2.0, (min_y + max_y) / 2.0), r=radius):
+                if correlated[n]:
+                    continue
+                flier = ogr.Geometry(ogr.wkbPoint)
+                flier.AddPoint_2D(flier_xys[n, 0], flier_xys[n, 1])
+                if feat.Distance(flier) < buffer:
+                    correlated[n] = True
+    # the multipoint fliers are not checked for correlation
+    correlated[multipoints] = False
+
+    return [tuple(p) for p in flier_points[~correlated]]
 
 
 def convert_coordinates_to_index(position_list, res, xmin, ymin):
@@ -315,20 +381,29 @@ def convert_coordinates_to_index(position_list, res, xmin, ymin):
 
 
 def update_new_bag(bagfilename, node_index, name_update='roombaed',
-                   new_path='', fix_trackinglist=True):
+                   new_path='', fix_trackinglist=True, in_place=False):
     """
     Given a bag file name (including the path), copy the file to the new path
     and update the name with name_update.  This new file has the nodes listed
     in node_index updated with the bag no data value (1,000,000).
+
+    If in_place is True, the bag file is updated without making a copy.
+
+    The nodes are grouped by HDF5 chunk, so that each affected chunk of the
+    elevation and uncertainty layers is read and written once, and the
+    tracking list rows are appended in a single call.
     """
-    # setup the name
-    path, filename = os.path.split(bagfilename)
-    root, ext = os.path.splitext(filename)
-    if len(new_path) == 0:
-        new_path = path
-    newbagname = os.path.join(new_path, root + '_' + name_update + '.bag')
-    # copy the file
-    copyfile(bagfilename, newbagname)
+    if in_place:
+        newbagname = bagfilename
+    else:
+        # setup the name
+        path, filename = os.path.split(bagfilename)
+        root, ext = os.path.splitext(filename)
+        if len(new_path) == 0:
+            new_path = path
+        newbagname = os.path.join(new_path, root + '_' + name_update + '.bag')
+        # copy the file
+        copyfile(bagfilename, newbagname)
     # fix the trackling list
     if fix_trackinglist:
         fix_bag_trackinglist(newbagname)
@@ -337,21 +412,75 @@ def update_new_bag(bagfilename, node_index, name_update='roombaed',
         elev_array = bagout.root.BAG_root.elevation
         uncert_array = bagout.root.BAG_root.uncertainty
         tracklist = bagout.root.BAG_root.tracking_list
-        for p in node_index:
-            t = tracklist.row
-            t['row'] = p[1]
-            t['col'] = p[0]
-            t['depth'] = elev_array[p[1], p[0]]
-            t['uncertainty'] = uncert_array[p[1], p[0]]
+        rows, cols = _valid_nodes(node_index, elev_array.shape)
+        if len(rows) > 0:
+            depths, uncertainties = _reject_nodes(elev_array, uncert_array,
+                                                  rows, cols, 1000000)
+            t = np.zeros(len(rows), dtype=tracklist.dtype)
+            t['row'] = rows
+            t['col'] = cols
+            t['depth'] = depths
+            t['uncertainty'] = uncertainties
             t['track_code'] = 9
             t['list_series'] = 9
-            t.append()
-            elev_array[p[1], p[0]] = 1000000
-            uncert_array[p[1], p[0]] = 1000000
+            tracklist.append(t)
         bagout.flush()
     return newbagname
 
 
+def _valid_nodes(node_index, shape):
+    """
+    Return the rows and the columns of the unique nodes (in the passed order)
+    of a [col, row] index array that are within the grid shape.
+    """
+    node_index = np.asarray(node_index, dtype=np.int64)
+    if node_index.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cols = node_index[:, 0]
+    rows = node_index[:, 1]
+    inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+    if not np.all(inside):
+        print('Skipping ' + str(np.count_nonzero(~inside)) +
+              ' nodes outside of the grid.')
+        rows = rows[inside]
+        cols = cols[inside]
+    # a node is rejected (and tracked) once
+    _, first = np.unique(rows * shape[1] + cols, return_index=True)
+    first.sort()
+    return rows[first], cols[first]
+
+
+def _reject_nodes(elev_array, uncert_array, rows, cols, no_data):
+    """
+    Set the passed nodes of the elevation and uncertainty arrays to no_data,
+    reading and writing each affected HDF5 chunk once.  Return the previous
+    elevation and uncertainty values of the nodes.
+    """
+    chunk_shape = elev_array.chunkshape
+    if chunk_shape is None:
+        # contiguous layout: work by blocks of rows
+        chunk_shape = (min(256, elev_array.shape[0]), elev_array.shape[1])
+    chunk_ids = (rows // chunk_shape[0]) * (elev_array.shape[1] // chunk_shape[1] + 1) + cols // chunk_shape[1]
+    order = np.argsort(chunk_ids, kind='stable')
+    bounds = np.flatnonzero(np.diff(chunk_ids[order])) + 1
+
+    depths = np.empty(len(rows), dtype=elev_array.dtype)
+    uncertainties = np.empty(len(rows), dtype=uncert_array.dtype)
+    for group in np.split(order, bounds):
+        r0 = (rows[group[0]] // chunk_shape[0]) * chunk_shape[0]
+        c0 = (cols[group[0]] // chunk_shape[1]) * chunk_shape[1]
+        r1 = min(r0 + chunk_shape[0], elev_array.shape[0])
+        c1 = min(c0 + chunk_shape[1], elev_array.shape[1])
+        block_rows = rows[group] - r0
+        block_cols = cols[group] - c0
+        for array, values in ((elev_array, depths), (uncert_array, uncertainties)):
+            block = array[r0:r1, c0:c1]
+            values[group] = block[block_rows, block_cols]
+            block[block_rows, block_cols] = no_data
+            array[r0:r1, c0:c1] = block
+    return depths, uncertainties
+
+
 def fix_bag_trackinglist(bagfilename, verbose=True):
     """
     Given a bag filename, fix an old bag file written in CARIS HIPS that have
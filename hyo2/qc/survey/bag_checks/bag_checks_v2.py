@@ -2,6 +2,7 @@ import logging
 import os
 import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from typing import Optional, List
 
@@ -10,9 +11,10 @@ from hyo2.abc.app.report import Report
 from hyo2.abc.lib.helper import Helper
 from hyo2.abc.lib.progress.abstract_progress import AbstractProgress
 from hyo2.abc.lib.progress.cli_progress import CliProgress
-from hyo2.bag import bag
 from hyo2.qc import name as lib_name, __version__ as lib_version
 from hyo2.qc.common.project import BaseProject
+from hyo2.qc.common.result_cache import ResultCache
+from hyo2.qc.survey.bag_checks.bag_session import BagSession
 from osgeo import osr
 
 logger = logging.getLogger(__name__)
@@ -20,19 +22,24 @@ logger = logging.getLogger(__name__)
 
 class BagChecksV2:
 
+    sections = ['structure', 'metadata', 'elevation', 'uncertainty', 'tracking_list', 'gdal_compatibility']
+
     def __init__(self, grid_list: List[str], output_folder: str,
                  output_project_folder: bool, output_subfolders: bool,
                  use_nooa_nbs_profile: bool = False, check_structure: bool = False,
                  check_metadata: bool = False, check_elevation: bool = False,
                  check_uncertainty: bool = False, check_tracking_list: bool = False,
                  check_gdal_compatibility: bool = False,
-                 progress: AbstractProgress = CliProgress(), open_output_folder: bool = True):
+                 progress: Optional[AbstractProgress] = CliProgress(), open_output_folder: bool = True,
+                 workers: int = 1, result_cache: Optional[ResultCache] = None):
 
         self.grid_list = grid_list
         self.output_folder = output_folder
         self.output_project_folder = output_project_folder
         self.output_subfolders = output_subfolders
         self.open_output_folder = open_output_folder
+        self.workers = workers
+        self.result_cache = result_cache
 
         self._noaa_nbs_profile = use_nooa_nbs_profile
         self._structure = check_structure
@@ -91,6 +98,8 @@ class BagChecksV2:
         # Check if the grid list is empty
         if len(self.grid_list) == 0:
             raise RuntimeError("The grid list is empty")
+        if self.workers < 1:
+            raise RuntimeError("invalid number of workers: %s" % self.workers)
 
         try:
             start_time = time.time()
@@ -100,33 +109,28 @@ class BagChecksV2:
             opened_folders = list()
 
             nr_of_files = len(self.grid_list)
-            for i, grid_file in enumerate(self.grid_list):
-
-                self._cur_min_depth = None
-                self._cur_max_depth = None
-                self._cur_vr_min_depth = None
-                self._cur_vr_max_depth = None
-                success = self._bag_checks_v2(grid_file=grid_file, idx=i, total=nr_of_files)
-
-                if success:
-                    if self.cur_bag_checks_errors > 0:
-                        self._msg += "- %s: fail\n" % self._grid_basename
-                    elif self.cur_bag_checks_warnings > 0:
-                        if self.cur_bag_checks_warnings == 1:
-                            self._msg += "- %s: pass, with 1 warning\n" % self._grid_basename
-                        else:
-                            self._msg += "- %s: pass, with %d warnings\n" \
-                                         % (self._grid_basename, self.cur_bag_checks_warnings)
-                    else:
-                        self._msg += "- %s: pass\n" % self._grid_basename
+            # the unchanged files are reported from the cache
+            results = [self._cached_result(grid_file=grid_file) for grid_file in self.grid_list]
+            to_check = [i for i, result in enumerate(results) if result is None]
+            if len(to_check) < nr_of_files:
+                logger.info("BAG Checks v2 -> cached results: %d/%d" % (nr_of_files - len(to_check), nr_of_files))
 
-                    if self.open_output_folder:
-                        # open the output folder (if not already open)
-                        if self.bagchecks_output_folder not in opened_folders:
-                            self.open_bagchecks_output_folder()
-                            opened_folders.append(self.bagchecks_output_folder)
-                else:
-                    self._msg += "- %s: skip\n" % self._grid_basename
+            if (self.workers > 1) and (len(to_check) > 1):
+                self._bag_checks_v2_parallel(results=results, to_check=to_check)
+
+            else:
+                for i in to_check:
+
+                    self._cur_min_depth = None
+                    self._cur_max_depth = None
+                    self._cur_vr_min_depth = None
+                    self._cur_vr_max_depth = None
+                    results[i] = self._bag_checks_v2(grid_file=self.grid_list[i], idx=i, total=nr_of_files)
+                    self._cache_result(grid_file=self.grid_list[i], result=results[i])
+
+            # the reports and the message are assembled in the order of the grid list
+            for result in results:
+                self._bag_checks_v2_assemble(result=result, opened_folders=opened_folders)
 
             logger.info("BAG Checks v2 -> execution time: %.3f s" % (time.time() - start_time))
 
@@ -138,71 +142,186 @@ class BagChecksV2:
 
         self.progress.end()
 
-    def _bag_checks_v2(self, grid_file: str, idx: int, total: int) -> bool:
+    def _update_progress(self, value: float, text: str) -> None:
+        # no progress from the worker processes
+        if self.progress is not None:
+            self.progress.update(value=value, text=text)
+
+    def _cache_options(self) -> dict:
+        return {
+            'lib_version': lib_version,
+            'noaa_nbs_profile': self._noaa_nbs_profile,
+            'sections': [section for section in self.sections if getattr(self, '_%s' % section)],
+        }
+
+    def _cached_result(self, grid_file: str) -> Optional[dict]:
+        if self.result_cache is None:
+            return None
+        return self.result_cache.read(path=grid_file, tool="BCv2", options=self._cache_options())
+
+    def _cache_result(self, grid_file: str, result: dict) -> None:
+        if self.result_cache is None:
+            return
+        self.result_cache.write(path=grid_file, tool="BCv2", options=self._cache_options(), result=result)
+
+    def _bag_checks_v2_parallel(self, results: list, to_check: List[int]) -> None:
+        """Check the files at the passed indices in a process pool, storing the outcomes in results"""
+        nr_of_files = len(self.grid_list)
+        nr_to_check = len(to_check)
+        kwargs = {
+            'output_folder': self.output_folder,
+            'output_project_folder': self.output_project_folder,
+            'output_subfolders': self.output_subfolders,
+            'use_nooa_nbs_profile': self._noaa_nbs_profile,
+            'check_structure': self._structure,
+            'check_metadata': self._metadata,
+            'check_elevation': self._elevation,
+            'check_uncertainty': self._uncertainty,
+            'check_tracking_list': self._tracking_list,
+            'check_gdal_compatibility': self._gdal_compatibility,
+        }
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = dict()
+            for i in to_check:
+                futures[executor.submit(_bag_checks_v2_file, self.grid_list[i], i, nr_of_files, kwargs)] = i
+
+            for nr_done, future in enumerate(as_completed(futures)):
+                i = futures[future]
+                grid_file = self.grid_list[i]
+                try:
+                    results[i] = future.result()
+                    self._cache_result(grid_file=grid_file, result=results[i])
+                except Exception as e:
+                    # a failure only skips its file
+                    traceback.print_exc()
+                    logger.warning("unable to check %s: %s" % (grid_file, e))
+                    results[i] = self._bag_checks_v2_result(grid_file=grid_file, success=False)
+                self._update_progress(value=100.0 * (nr_done + 1) / nr_to_check,
+                                      text="[%d/%d] Checked: %s" % (nr_done + 1, nr_to_check,
+                                                                   os.path.basename(grid_file)))
+
+    def _bag_checks_v2(self, grid_file: str, idx: int, total: int) -> dict:
 
         quantum = 100.0 / total
         cur_quantum = quantum * idx
 
-        self.progress.update(value=cur_quantum + quantum * 0.05, text="[%d/%d] File opening" % (idx + 1, total))
+        self._update_progress(value=cur_quantum + quantum * 0.05, text="[%d/%d] File opening" % (idx + 1, total))
 
         # we want to be sure that the label is based on the name of the new file input
         self._survey = BaseProject.make_survey_label_from_path(grid_file)
         self._grid_basename = os.path.splitext(os.path.basename(grid_file))[0]
 
-        # skip CSAR
-        if not bag.BAGFile.is_bag(bag_path=grid_file):  # skip CSAR
-            logger.debug('not a BAG file: %s' % grid_file)
-            return False
+        # the file is opened once, and shared by all the checks
+        with BagSession(grid_file) as session:
 
-        self._is_vr = bag.BAGFile.is_vr(bag_path=grid_file)
-        if self._is_vr:
-            logger.debug('detected VR BAG')
+            # skip CSAR
+            if not session.is_bag():  # skip CSAR
+                logger.debug('not a BAG file: %s' % grid_file)
+                return self._bag_checks_v2_result(grid_file=grid_file, success=False)
 
-        self._bc_report = Report(lib_name=lib_name, lib_version=lib_version)
+            self._is_vr = session.is_vr()
+            if self._is_vr:
+                logger.debug('detected VR BAG')
+
+            self._bag_checks_v2_file(session=session, idx=idx, total=total)
+
+        return self._bag_checks_v2_result(grid_file=grid_file, success=True)
+
+    def _bag_checks_v2_result(self, grid_file: str, success: bool) -> dict:
+        """Collect the outcomes of the checks of a file (to be passed back from a worker process)"""
+        result = {
+            'survey': BaseProject.make_survey_label_from_path(grid_file),
+            'grid_basename': os.path.splitext(os.path.basename(grid_file))[0],
+            'success': success,
+            'is_vr': self._is_vr,
+            'report': self._bc_report if success else None,
+        }
+        for section in self.sections:
+            result['%s_errors' % section] = getattr(self, '_bc_%s_errors' % section)
+            result['%s_warnings' % section] = getattr(self, '_bc_%s_warnings' % section)
+        return result
+
+    def _bag_checks_v2_assemble(self, result: dict, opened_folders: list) -> None:
+        """Generate the PDF report of a checked file, and add its outcome to the message"""
+        self._survey = result['survey']
+        self._grid_basename = result['grid_basename']
+
+        if not result['success']:
+            self._msg += "- %s: skip\n" % self._grid_basename
+            return
+
+        self._is_vr = result['is_vr']
+        self._bc_report = result['report']
+        for section in self.sections:
+            setattr(self, '_bc_%s_errors' % section, result['%s_errors' % section])
+            setattr(self, '_bc_%s_warnings' % section, result['%s_warnings' % section])
+
+        output_pdf = os.path.join(self.bagchecks_output_folder, "%s.BCv2.%s.pdf"
+                                  % (self._grid_basename, datetime.now().strftime("%Y%m%d.%H%M%S")))
+        if self._noaa_nbs_profile:
+            title_pdf = "BAG Checks v2 - Tests against NOAA OCS Profile"
+        else:
+            title_pdf = "BAG Checks v2 - Tests against General Profile"
+        if self._bc_report.generate_pdf(output_pdf, title_pdf, use_colors=True):
+            self._bc_pdf = output_pdf
 
-        self.progress.update(value=cur_quantum + quantum * 0.15, text="[%d/%d] Structure checking" % (idx + 1, total))
+        if self.cur_bag_checks_errors > 0:
+            self._msg += "- %s: fail\n" % self._grid_basename
+        elif self.cur_bag_checks_warnings > 0:
+            if self.cur_bag_checks_warnings == 1:
+                self._msg += "- %s: pass, with 1 warning\n" % self._grid_basename
+            else:
+                self._msg += "- %s: pass, with %d warnings\n" \
+                             % (self._grid_basename, self.cur_bag_checks_warnings)
+        else:
+            self._msg += "- %s: pass\n" % self._grid_basename
 
-        self._bag_checks_v2_structure(grid_file=grid_file)
+        if self.open_output_folder:
+            # open the output folder (if not already open)
+            if self.bagchecks_output_folder not in opened_folders:
+                self.open_bagchecks_output_folder()
+                opened_folders.append(self.bagchecks_output_folder)
 
-        self.progress.update(value=cur_quantum + quantum * 0.3, text="[%d/%d] Metadata checking" % (idx + 1, total))
+    def _bag_checks_v2_file(self, session: BagSession, idx: int, total: int) -> None:
 
-        self._bag_checks_v2_metadata(grid_file=grid_file)
+        quantum = 100.0 / total
+        cur_quantum = quantum * idx
 
-        self.progress.update(value=cur_quantum + quantum * 0.5, text="[%d/%d] Elevation checking" % (idx + 1, total))
+        self._bc_report = Report(lib_name=lib_name, lib_version=lib_version)
 
-        self._bag_checks_v2_elevation(grid_file=grid_file)
+        self._update_progress(value=cur_quantum + quantum * 0.15, text="[%d/%d] Structure checking" % (idx + 1, total))
 
-        self.progress.update(value=cur_quantum + quantum * 0.7, text="[%d/%d] Uncertainty checking" % (idx + 1, total))
+        self._bag_checks_v2_structure(session=session)
 
-        self._bag_checks_v2_uncertainty(grid_file=grid_file)
+        self._update_progress(value=cur_quantum + quantum * 0.3, text="[%d/%d] Metadata checking" % (idx + 1, total))
 
-        self.progress.update(value=cur_quantum + quantum * 0.85,
-                             text="[%d/%d] Tracking list checking" % (idx + 1, total))
+        self._bag_checks_v2_metadata(session=session)
 
-        self._bag_checks_v2_tracking_list(grid_file=grid_file)
+        self._update_progress(value=cur_quantum + quantum * 0.5, text="[%d/%d] Elevation checking" % (idx + 1, total))
 
-        self.progress.update(value=cur_quantum + quantum * 0.90,
-                             text="[%d/%d] GDAL compatibility checking" % (idx + 1, total))
+        self._bag_checks_v2_elevation(session=session)
 
-        self._bag_checks_v2_gdal_compatibility(grid_file=grid_file)
+        self._update_progress(value=cur_quantum + quantum * 0.7, text="[%d/%d] Uncertainty checking" % (idx + 1, total))
 
-        self.progress.update(value=cur_quantum + quantum * 0.95,
-                             text="[%d/%d] Summary" % (idx + 1, total))
+        self._bag_checks_v2_uncertainty(session=session)
 
-        self._bag_checks_v2_summary()
+        self._update_progress(value=cur_quantum + quantum * 0.85,
+                              text="[%d/%d] Tracking list checking" % (idx + 1, total))
 
-        output_pdf = os.path.join(self.bagchecks_output_folder, "%s.BCv2.%s.pdf"
-                                  % (self._grid_basename, datetime.now().strftime("%Y%m%d.%H%M%S")))
-        if self._noaa_nbs_profile:
-            title_pdf = "BAG Checks v2 - Tests against NOAA OCS Profile"
-        else:
-            title_pdf = "BAG Checks v2 - Tests against General Profile"
-        if self._bc_report.generate_pdf(output_pdf, title_pdf, use_colors=True):
-            self._bc_pdf = output_pdf
+        self._bag_checks_v2_tracking_list(session=session)
 
-        return True
+        self._update_progress(value=cur_quantum + quantum * 0.90,
+                              text="[%d/%d] GDAL compatibility checking" % (idx + 1, total))
 
-    def _bag_checks_v2_structure(self, grid_file: str) -> None:
+        self._bag_checks_v2_gdal_compatibility(session=session)
+
+        self._update_progress(value=cur_quantum + quantum * 0.95,
+                              text="[%d/%d] Summary" % (idx + 1, total))
+
+        self._bag_checks_v2_summary()
+
+    def _bag_checks_v2_structure(self, session: BagSession) -> None:
         if self._structure is False:
             self._bc_report += "Structure [SKIP_SEC]"
             self._bc_report += "All structure-related checks are deactivated. [SKIP_REP]"
@@ -214,7 +333,7 @@ class BagChecksV2:
         self._bc_structure_warnings = 0
 
         try:
-            bf = bag.BAGFile(grid_file)
+            bf = session.bf
             # logger.debug('BAG version: %s' % bf.bag_version())
 
             # CHK: presence of root
@@ -296,7 +415,7 @@ class BagChecksV2:
             self._bc_structure_errors += 1
             self._bc_report += "[ERROR] %s" % e
 
-    def _bag_checks_v2_metadata(self, grid_file: str) -> None:
+    def _bag_checks_v2_metadata(self, session: BagSession) -> None:
         if self._metadata is False:
             self._bc_report += "Metadata [SKIP_SEC]"
             self._bc_report += "All metadata-related checks are deactivated. [SKIP_REP]"
@@ -308,7 +427,7 @@ class BagChecksV2:
         self._bc_metadata_warnings = 0
 
         try:
-            bf = bag.BAGFile(grid_file)
+            bf = session.bf
 
             # CHK: presence of metadata
             self._bc_report += "Check the presence of the Metadata dataset [CHECK]"
@@ -319,7 +438,7 @@ class BagChecksV2:
             else:
                 self._bc_report += "OK"
 
-            bf.populate_metadata()
+            session.populate_metadata()
             # bf.extract_metadata('test.xml')
 
             if self._noaa_nbs_profile and not self._is_vr:
@@ -456,7 +575,7 @@ class BagChecksV2:
             self._bc_metadata_errors += 1
             self._bc_report += "[ERROR] Unexpected issue: %s" % e
 
-    def _bag_checks_v2_elevation(self, grid_file: str) -> None:
+    def _bag_checks_v2_elevation(self, session: BagSession) -> None:
         if self._elevation is False:
             self._bc_report += "Elevation [SKIP_SEC]"
             self._bc_report += "All elevation-related checks are deactivated. [SKIP_REP]"
@@ -468,7 +587,7 @@ class BagChecksV2:
         self._bc_elevation_warnings = 0
 
         try:
-            bf = bag.BAGFile(grid_file)
+            bf = session.bf
 
             # CHK: presence of elevation
             self._bc_report += "Check the presence of the Elevation dataset [CHECK]"
@@ -479,7 +598,7 @@ class BagChecksV2:
             else:
                 self._bc_report += "OK"
 
-            self._cur_min_depth, self._cur_max_depth = bf.depth_min_max()
+            self._cur_min_depth, self._cur_max_depth = session.depth_min_max()
             logger.debug('min/max depth: %.2f/%.2f' % (self._cur_min_depth, self._cur_max_depth))
 
             # CHK: all NaN
@@ -499,7 +618,7 @@ class BagChecksV2:
                 else:
                     self._bc_report += "OK"
 
-                self._cur_vr_min_depth, self._cur_vr_max_depth = bf.vr_depth_min_max()
+                self._cur_vr_min_depth, self._cur_vr_max_depth = session.vr_depth_min_max()
                 logger.debug('VR min/max depth: %.2f/%.2f' % (self._cur_vr_min_depth, self._cur_vr_max_depth))
 
                 # CHK: VR depth all NaN
@@ -516,7 +635,7 @@ class BagChecksV2:
             self._bc_elevation_errors += 1
             self._bc_report += "[ERROR] Unknown issue: %s" % e
 
-    def _bag_checks_v2_uncertainty(self, grid_file: str) -> None:
+    def _bag_checks_v2_uncertainty(self, session: BagSession) -> None:
         if self._uncertainty is False:
             self._bc_report += "Uncertainty [SKIP_SEC]"
             self._bc_report += "All uncertainty-related checks are deactivated. [SKIP_REP]"
@@ -528,7 +647,7 @@ class BagChecksV2:
         self._bc_uncertainty_warnings = 0
 
         try:
-            bf = bag.BAGFile(grid_file)
+            bf = session.bf
 
             # CHK: presence of uncertainty
             self._bc_report += "Check the presence of the Uncertainty dataset [CHECK]"
@@ -539,8 +658,8 @@ class BagChecksV2:
             else:
                 self._bc_report += "OK"
 
-            if self._cur_max_depth is None:
-                self._cur_min_depth, self._cur_max_depth = bf.depth_min_max()
+            # calculated once per file (e.g., already by the elevation checks)
+            self._cur_min_depth, self._cur_max_depth = session.depth_min_max()
             # logger.debug('min/max depth: %.2f/%.2f'
             #              % (self._cur_min_depth, self._cur_max_depth))
             if np.isnan(self._cur_max_depth) or (self._cur_max_depth < 0.0):
@@ -550,7 +669,7 @@ class BagChecksV2:
             high_unc_threshold = 4.0 + 0.1 * max_depth
             logger.debug('max uncertainty threshold: %.2f m (max: %.2f m)' % (high_unc_threshold, self._cur_max_depth))
 
-            min_uncertainty, max_uncertainty = bf.uncertainty_min_max()
+            min_uncertainty, max_uncertainty = session.uncertainty_min_max()
             logger.debug('min/max uncertainty: %.2f/%.2f' % (min_uncertainty, max_uncertainty))
 
             if self._noaa_nbs_profile:
@@ -597,8 +716,7 @@ class BagChecksV2:
                 else:
                     self._bc_report += "OK"
 
-                if self._cur_vr_max_depth is None:
-                    self._cur_vr_min_depth, self._cur_vr_max_depth = bf.vr_depth_min_max()
+                self._cur_vr_min_depth, self._cur_vr_max_depth = session.vr_depth_min_max()
                 logger.debug('min/max elevation: %.2f/%.2f'
                              % (self._cur_vr_min_depth, self._cur_vr_max_depth))
                 if np.isnan(self._cur_vr_max_depth) or (self._cur_vr_max_depth < 0.0):
@@ -609,7 +727,7 @@ class BagChecksV2:
                 logger.debug('max VR uncertainty threshold: %.2f m (max: %.2f m)'
                              % (vr_high_unc_threshold, self._cur_vr_max_depth))
 
-                vr_min_uncertainty, vr_max_uncertainty = bf.vr_uncertainty_min_max()
+                vr_min_uncertainty, vr_max_uncertainty = session.vr_uncertainty_min_max()
                 logger.debug('VR min/max uncertainty: %.2f/%.2f' % (vr_min_uncertainty, vr_max_uncertainty))
 
                 if self._noaa_nbs_profile:
@@ -652,7 +770,7 @@ class BagChecksV2:
             self._bc_uncertainty_errors += 1
             self._bc_report += "[ERROR] Unuspected issue: %s" % e
 
-    def _bag_checks_v2_tracking_list(self, grid_file: str) -> None:
+    def _bag_checks_v2_tracking_list(self, session: BagSession) -> None:
         if self._tracking_list is False:
             self._bc_report += "Tracking List [SKIP_SEC]"
             self._bc_report += "All tracking-list-related checks are deactivated. [SKIP_REP]"
@@ -664,7 +782,7 @@ class BagChecksV2:
         self._bc_tracking_list_warnings = 0
 
         try:
-            bf = bag.BAGFile(grid_file)
+            bf = session.bf
 
             # CHK: presence of tracking list
             self._bc_report += "Check the presence of the Tracking List dataset [CHECK]"
@@ -706,7 +824,7 @@ class BagChecksV2:
             self._bc_tracking_list_errors += 1
             self._bc_report += "[ERROR] Unexpected issue: %s" % e
 
-    def _bag_checks_v2_gdal_compatibility(self, grid_file: str) -> None:
+    def _bag_checks_v2_gdal_compatibility(self, session: BagSession) -> None:
         if self._gdal_compatibility is False:
             self._bc_report += "GDAL Compatibility [SKIP_SEC]"
             self._bc_report += "All GDAL-compatibility-related checks are deactivated. [SKIP_REP]"
@@ -718,11 +836,9 @@ class BagChecksV2:
         self._bc_gdal_compatibility_warnings = 0
 
         try:
-            bf = bag.BAGFile(grid_file)
-
             # CHK: Too many refinement grids
             self._bc_report += "Check for 'Too many refinement grids' GDAL error [CHECK]"
-            bf_rows, bf_cols = bf.elevation_shape()
+            bf_rows, bf_cols = session.elevation_shape()
             if self._is_vr and ((bf_rows * bf_cols) > 10000000):
                 self._bc_gdal_compatibility_warnings += 1
                 self._bc_report += "[WARNING] Too big super-grid: %d, %d" % (bf_rows, bf_cols)
@@ -835,3 +951,10 @@ class BagChecksV2:
             os.makedirs(output_folder)
 
         return output_folder
+
+
+# ### WORKER PROCESSES ###
+
+def _bag_checks_v2_file(grid_file: str, idx: int, total: int, kwargs: dict) -> dict:
+    bc = BagChecksV2(grid_list=[grid_file, ], progress=None, open_output_folder=False, **kwargs)
+    return bc._bag_checks_v2(grid_file=grid_file, idx=idx, total=total)
@@ -0,0 +1,99 @@
+import logging
+from typing import Callable, Optional
+
+from hyo2.bag import bag
+from hyo2.qc.survey.bag_checks.bag_stats import calc_bag_stats, calc_vr_bag_stats
+
+logger = logging.getLogger(__name__)
+
+
+class BagSession:
+    """Inspection session of a BAG file, shared by all the checks of the file
+
+    The file is opened once (when first needed), while the parsed metadata and the calculated layer statistics
+    are cached, since each scan of a large BAG (e.g., on a network share) may take minutes.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._bf = None  # type: Optional[bag.BAGFile]
+        self._open_error = None  # type: Optional[Exception]
+        self._meta_populated = False
+        self._stats = dict()  # type: dict
+
+    def __enter__(self) -> 'BagSession':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def bf(self) -> bag.BAGFile:
+        """The opened BAG file (a failed opening is not retried)"""
+        if self._open_error is not None:
+            raise self._open_error
+        if self._bf is None:
+            try:
+                self._bf = bag.BAGFile(self.path)
+            except Exception as e:
+                self._open_error = e
+                raise e
+        return self._bf
+
+    def close(self) -> None:
+        if self._bf is not None:
+            try:
+                self._bf.close()
+            except Exception as e:
+                logger.debug("while closing %s: %s" % (self.path, e))
+        self._bf = None
+        self._stats = dict()
+        self._meta_populated = False
+
+    def is_bag(self) -> bool:
+        try:
+            return self.bf.has_bag_root()
+        except Exception as e:
+            logger.debug("unable to open as BAG: %s -> %s" % (self.path, e))
+            return False
+
+    def is_vr(self) -> bool:
+        # with only one of the VR datasets, the missing one is reported by the checks
+        return self._cached('is_vr', lambda: self.bf.has_varres_metadata() or self.bf.has_varres_refinements())
+
+    @property
+    def meta(self):
+        self.populate_metadata()
+        return self.bf.meta
+
+    def populate_metadata(self) -> None:
+        """Parse the metadata XML (only the first time)"""
+        if not self._meta_populated:
+            self.bf.populate_metadata()
+            self._meta_populated = True
+
+    def _cached(self, key: str, func: Callable):
+        if key not in self._stats:
+            self._stats[key] = func()
+        return self._stats[key]
+
+    def elevation_shape(self) -> tuple:
+        return self._cached('elevation_shape', self.bf.elevation_shape)
+
+    def layer_stats(self, vr: bool = False) -> tuple:
+        """Depth and uncertainty statistics, calculated with a single streamed pass over the layers"""
+        if vr:
+            return self._cached('vr_layer_stats', lambda: calc_vr_bag_stats(self.bf))
+        return self._cached('layer_stats', lambda: calc_bag_stats(self.bf))
+
+    def depth_min_max(self) -> tuple:
+        return self.layer_stats()[0].min_max()
+
+    def vr_depth_min_max(self) -> tuple:
+        return self.layer_stats(vr=True)[0].min_max()
+
+    def uncertainty_min_max(self) -> tuple:
+        return self.layer_stats()[1].min_max()
+
+    def vr_uncertainty_min_max(self) -> tuple:
+        return self.layer_stats(vr=True)[1].min_max()
@@ -0,0 +1,114 @@
+import logging
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+bag_elevation_path = "BAG_root/elevation"
+bag_uncertainty_path = "BAG_root/uncertainty"
+bag_varres_refinements_path = "BAG_root/varres_refinements"
+bag_no_data = 1000000.0
+
+
+class LayerStats:
+    """Statistics of a layer, updated block by block (the no-data values are counted as NaN)"""
+
+    def __init__(self, threshold: Optional[float] = None) -> None:
+        self.threshold = threshold  # type: Optional[float]
+        self.count = 0  # valid values
+        self.nan_count = 0
+        self.non_positive_count = 0
+        self.above_threshold_count = 0
+        self.min = np.nan
+        self.max = np.nan
+
+    def __repr__(self):
+        return "<LayerStats: count %d, NaN %d, non-positive %d, above threshold %d, min %s, max %s>" \
+               % (self.count, self.nan_count, self.non_positive_count, self.above_threshold_count, self.min, self.max)
+
+    def add(self, values: np.ndarray, no_data: Optional[float] = None) -> None:
+        valid = ~np.isnan(values)
+        if no_data is not None:
+            valid &= (values != no_data)
+        nr_valid = int(np.count_nonzero(valid))
+        self.nan_count += values.size - nr_valid
+        if nr_valid == 0:
+            return
+        if nr_valid < values.size:
+            values = values[valid]
+
+        self.count += nr_valid
+        self.non_positive_count += int(np.count_nonzero(values <= 0.0))
+        if self.threshold is not None:
+            self.above_threshold_count += int(np.count_nonzero(values > self.threshold))
+        # fmin/fmax ignore the initial NaN
+        self.min = float(np.fmin(self.min, values.min()))
+        self.max = float(np.fmax(self.max, values.max()))
+
+    def min_max(self) -> Tuple[float, float]:
+        return self.min, self.max
+
+
+def _blocks(dataset, axis: int, block_nodes: int) -> Iterator[slice]:
+    """Slices along the passed axis, aligned with the HDF5 chunks and with about block_nodes values each"""
+    size = dataset.shape[axis]
+    if size == 0:
+        return
+    other_nodes = max(1, int(np.prod(dataset.shape)) // size)
+    step = max(1, block_nodes // other_nodes)
+    if dataset.chunks is not None:
+        chunk = dataset.chunks[axis]
+        step = max(chunk, (step // chunk) * chunk)
+    for start in range(0, size, step):
+        yield slice(start, min(start + step, size))
+
+
+def calc_bag_stats(bf, uncertainty_threshold: Optional[float] = None,
+                   block_nodes: int = 1 << 22) -> Tuple[LayerStats, LayerStats]:
+    """Calculate the depth and uncertainty statistics of a BAG in one pass
+
+    The two layers are read together by blocks of rows (aligned with the HDF5 chunks), so that the memory is
+    bounded. The depths are the negated elevations. A missing layer results in empty statistics.
+    """
+    depth = LayerStats()
+    uncertainty = LayerStats(threshold=uncertainty_threshold)
+
+    elevation_ds = bf[bag_elevation_path] if bag_elevation_path in bf else None
+    uncertainty_ds = bf[bag_uncertainty_path] if bag_uncertainty_path in bf else None
+    reference = elevation_ds if elevation_ds is not None else uncertainty_ds
+    if reference is None:
+        return depth, uncertainty
+
+    for rows in _blocks(reference, axis=0, block_nodes=block_nodes):
+        if elevation_ds is not None:
+            depth.add(np.negative(elevation_ds[rows]), no_data=-bag_no_data)
+        if uncertainty_ds is not None:
+            uncertainty.add(uncertainty_ds[rows], no_data=bag_no_data)
+
+    logger.debug("depth: %s, uncertainty: %s" % (depth, uncertainty))
+    return depth, uncertainty
+
+
+def calc_vr_bag_stats(bf, uncertainty_threshold: Optional[float] = None,
+                      block_nodes: int = 1 << 22) -> Tuple[LayerStats, LayerStats]:
+    """Calculate the depth and uncertainty statistics of the VR refinements of a BAG in one pass
+
+    Each block of refinements provides both the depth and the uncertainty values.
+    """
+    depth = LayerStats()
+    uncertainty = LayerStats(threshold=uncertainty_threshold)
+
+    if bag_varres_refinements_path not in bf:
+        return depth, uncertainty
+    refinements = bf[bag_varres_refinements_path]
+
+    axis = len(refinements.shape) - 1
+    for nodes in _blocks(refinements, axis=axis, block_nodes=block_nodes):
+        index = tuple([slice(None)] * axis + [nodes])
+        block = refinements[index]
+        depth.add(np.negative(block['depth']), no_data=-bag_no_data)
+        uncertainty.add(block['depth_uncrt'], no_data=bag_no_data)
+
+    logger.debug("VR depth: %s, VR uncertainty: %s" % (depth, uncertainty))
+    return depth, uncertainty
@@ -1,5 +1,6 @@
 import logging
 
+import numpy as np
 from hyo2.abc.lib.helper import Helper
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,28 @@ fliers_algos = {
     "FIND_FLIERS_v9": 9,
 }
 
+# each check is stored as a bit (1 << (check - 1)) in the flag bitmasks
+fliers_checks = {
+    1: "laplacian operator",
+    2: "gaussian curvature",
+    3: "adjacent cells",
+    4: "edge slivers",
+    5: "isolated nodes",
+    6: "noisy edges",
+    7: "noisy margins",
+}
+
+# x, y, z in the grid CRS; lon, lat in WGS84; the reported check and the bitmask of all the checks
+flier_dtype = np.dtype([
+    ('x', np.float64),
+    ('y', np.float64),
+    ('z', np.float64),
+    ('lon', np.float64),
+    ('lat', np.float64),
+    ('check', np.uint8),
+    ('bits', np.uint8),
+])
+
 
 class BaseFliers:
 
@@ -18,17 +41,53 @@ class BaseFliers:
         # inputs
         self.grids = grids
         # outputs
-        self.flagged_fliers = list()
-        self.flagged_xs = list()
-        self.flagged_ys = list()
-        self.flagged_zs = list()
-        self.flagged_cks = list()
+        self._flier_chunks = [np.zeros(0, dtype=flier_dtype), ]
+
+    @property
+    def fliers(self) -> np.ndarray:
+        """Structured array (see flier_dtype) with the flagged fliers"""
+        if len(self._flier_chunks) > 1:
+            self._flier_chunks = [np.concatenate(self._flier_chunks), ]
+        return self._flier_chunks[0]
+
+    @fliers.setter
+    def fliers(self, value: np.ndarray) -> None:
+        self._flier_chunks = [value, ]
+
+    def append_fliers(self, fliers: np.ndarray) -> None:
+        self._flier_chunks.append(fliers)
+
+    @property
+    def flagged_fliers(self) -> list:
+        """Fliers as list of [long, lat, check], as expected by the writers"""
+        fliers = self.fliers
+        return np.column_stack((fliers['lon'], fliers['lat'], fliers['check'])).tolist()
+
+    @property
+    def flagged_xs(self) -> np.ndarray:
+        return self.fliers['x']
+
+    @property
+    def flagged_ys(self) -> np.ndarray:
+        return self.fliers['y']
+
+    @property
+    def flagged_zs(self) -> np.ndarray:
+        return self.fliers['z']
+
+    @property
+    def flagged_cks(self) -> np.ndarray:
+        return self.fliers['check']
+
+    @property
+    def flagged_bits(self) -> np.ndarray:
+        return self.fliers['bits']
 
     def __repr__(self):
         msg = "  <FlierDetector>\n"
 
         msg += "    <type: %s>\n" % Helper.first_match(fliers_algos, self.type)
         msg += "    <grids: %s>\n" % bool(self.grids)
-        msg += "    <possible fliers: %s>\n" % len(self.flagged_fliers)
+        msg += "    <possible fliers: %s>\n" % len(self.fliers)
 
         return msg
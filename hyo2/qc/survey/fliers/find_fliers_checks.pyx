@@ -22,7 +22,7 @@ cdef extern from "numpy/npy_math.h":
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_laplacian_operator_double(double[:, :] lap, int[:, :] flag_grid, float th):
+cpdef check_laplacian_operator_double(double[:, :] lap, np.uint8_t[:, :] flag_grid, float th):
 
     cdef unsigned int lap_rows, r
     cdef unsigned int lap_cols, c
@@ -33,7 +33,7 @@ cpdef check_laplacian_operator_double(double[:, :] lap, int[:, :] flag_grid, flo
         find = False
         for c in range(lap_cols):
             if (lap[r,c] < th) or (lap[r,c] > -th):
-                flag_grid[r, c] = 1 # check #1
+                flag_grid[r, c] |= 1  # check #1
                 logger.info("#1 > @(%d,%d)" % (int(r), int(c)))
 
 # noinspection PyUnresolvedReferences
@@ -43,7 +43,7 @@ cpdef check_laplacian_operator_double(double[:, :] lap, int[:, :] flag_grid, flo
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_laplacian_operator_float(float[:, :] lap, int[:, :] flag_grid, float th):
+cpdef check_laplacian_operator_float(float[:, :] lap, np.uint8_t[:, :] flag_grid, float th):
 
     cdef unsigned int lap_rows, r
     cdef unsigned int lap_cols, c
@@ -54,7 +54,7 @@ cpdef check_laplacian_operator_float(float[:, :] lap, int[:, :] flag_grid, float
         find = False
         for c in range(lap_cols):
             if (lap[r,c] < th) or (lap[r,c] > -th):
-                flag_grid[r, c] = 1 # check #1
+                flag_grid[r, c] |= 1  # check #1
                 logger.info("#1 > @(%d,%d)" % (int(r), int(c)))
 
 # noinspection PyUnresolvedReferences
@@ -64,7 +64,7 @@ cpdef check_laplacian_operator_float(float[:, :] lap, int[:, :] flag_grid, float
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_gaussian_curvature_double(double[:, :] gauss_curv, int[:, :] flag_grid, float th):
+cpdef check_gaussian_curvature_double(double[:, :] gauss_curv, np.uint8_t[:, :] flag_grid, float th):
 
     cdef unsigned int lap_rows, r
     cdef unsigned int lap_cols, c
@@ -74,7 +74,7 @@ cpdef check_gaussian_curvature_double(double[:, :] gauss_curv, int[:, :] flag_gr
     for r in range(lap_rows):
         for c in range(lap_cols):
             if gauss_curv[r,c] > th:
-                flag_grid[r, c] = 2 # check #2
+                flag_grid[r, c] |= 2  # check #2
                 logger.info("#2 > @(%d,%d) -> %f > %f" % (int(r), int(c), gauss_curv[r,c], th))
 
 # noinspection PyUnresolvedReferences
@@ -84,7 +84,7 @@ cpdef check_gaussian_curvature_double(double[:, :] gauss_curv, int[:, :] flag_gr
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_gaussian_curvature_float(float[:, :] gauss_curv, int[:, :] flag_grid, float th):
+cpdef check_gaussian_curvature_float(float[:, :] gauss_curv, np.uint8_t[:, :] flag_grid, float th):
 
     cdef unsigned int lap_rows, r
     cdef unsigned int lap_cols, c
@@ -94,7 +94,7 @@ cpdef check_gaussian_curvature_float(float[:, :] gauss_curv, int[:, :] flag_grid
     for r in range(lap_rows):
         for c in range(lap_cols):
             if gauss_curv[r,c] > th:
-                flag_grid[r, c] = 2 # check #2
+                flag_grid[r, c] |= 2  # check #2
                 logger.info("#2 > @(%d,%d) -> %f > %f" % (int(r), int(c), gauss_curv[r,c], th))
 
 # noinspection PyUnresolvedReferences
@@ -104,7 +104,7 @@ cpdef check_gaussian_curvature_float(float[:, :] gauss_curv, int[:, :] flag_grid
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_adjacent_cells_double(double[:, :] bathy, int[:, :] flag_grid, float th, float pct1, float pct2):
+cpdef check_adjacent_cells_double(double[:, :] bathy, np.uint8_t[:, :] flag_grid, float th, float pct1, float pct2):
 
     # logger.debug("[check adjacent] double bathy, using flier height: %.2f" % th)
 
@@ -356,14 +356,14 @@ cpdef check_adjacent_cells_double(double[:, :] bathy, int[:, :] flag_grid, float
 
             pos_ratio = dif_pos_cnt / float(ngb_cnt)
             if pos_ratio >= thr:
-                flag_grid[r, c] = 3  # check #3
+                flag_grid[r, c] |= 4  # check #3
                 logger.info("#3 > + @(%d,%d): %d/%d > node ratio %.2f (threshold: %.2f)"
                              % (r, c, dif_pos_cnt, ngb_cnt, pos_ratio, thr))
                 continue
 
             neg_ratio = dif_neg_cnt / float(ngb_cnt)
             if neg_ratio >= thr:
-                flag_grid[r, c] = 3  # check #3
+                flag_grid[r, c] |= 4  # check #3
                 logger.info("#3 > - @(%d,%d): %d/%d > node ratio %.2f (threshold: %.2f)"
                              % (r, c, dif_neg_cnt, ngb_cnt, neg_ratio, thr))
                 continue
@@ -376,7 +376,7 @@ cpdef check_adjacent_cells_double(double[:, :] bathy, int[:, :] flag_grid, float
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_adjacent_cells_float(float[:, :] bathy, int[:, :] flag_grid, float th, float pct1, float pct2):
+cpdef check_adjacent_cells_float(float[:, :] bathy, np.uint8_t[:, :] flag_grid, float th, float pct1, float pct2):
 
     # logger.debug("[check adjacent] float bathy, using flier height: %.2f" % th)
 
@@ -627,19 +627,646 @@ cpdef check_adjacent_cells_float(float[:, :] bathy, int[:, :] flag_grid, float t
 
             pos_ratio = dif_pos_cnt / float(ngb_cnt)
             if pos_ratio >= thr:
-                flag_grid[r, c] = 3  # check #3
+                flag_grid[r, c] |= 4  # check #3
                 logger.info("#3 > + @(%d,%d): %d/%d > node ratio %.2f (threshold: %.2f)"
                              % (r, c, dif_pos_cnt, ngb_cnt, pos_ratio, thr))
                 continue
 
             neg_ratio = dif_neg_cnt / float(ngb_cnt)
             if neg_ratio >= thr:
-                flag_grid[r, c] = 3  # check #3
+                flag_grid[r, c] |= 4  # check #3
                 logger.info("#3 > - @(%d,%d): %d/%d > node ratio %.2f (threshold: %.2f)"
                              % (r, c, dif_neg_cnt, ngb_cnt, neg_ratio, thr))
                 continue
 
 
+# noinspection PyUnresolvedReferences
+@cython.cdivision(True)
+@cython.cpow(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef inline int _check_adjacent_node_double(double[:, :] bathy, np.uint8_t[:, :] flag_grid,
+                                            np.npy_intp r, np.npy_intp c, float th, float pct1, float pct2):
+    """Evaluate the adjacent cells check (#3) on a single node, returning 3 if flagged"""
+
+    cdef np.npy_intp rows = bathy.shape[0]  # number of rows
+    cdef np.npy_intp cols = bathy.shape[1]  # number of columns
+    cdef double dep_node, dep_ngb
+    cdef float pos_ratio, neg_ratio, thr
+    cdef int dif_pos_cnt, dif_neg_cnt, ngb_cnt
+
+    if flag_grid[r, c] != 0:  # avoid existing flagged nodes
+        return 0
+
+    # for each node in the grid, the depth is retrieved
+    dep_node = bathy[r, c]
+
+    # any further calculation is skipped in case of a no-data value
+    if npy_isnan(dep_node):
+        return 0
+
+    ngb_cnt = 0  # initialize the number of neighbors
+    dif_pos_cnt = 0  # initialize the number of neighbors with positive depth diff
+    dif_neg_cnt = 0  # initialize the number of neighbors with negative depth diff
+
+    # - left node
+
+    if c > 0:  # if we are not on the first column
+
+        # attempt to retrieve depth
+        if flag_grid[r, c - 1] != 0:
+            return 0
+        dep_ngb = bathy[r, c - 1]
+        if npy_isnan(dep_ngb) and c > 1:
+            if flag_grid[r, c - 2] != 0:
+                return 0
+            dep_ngb = bathy[r, c - 2]
+        if npy_isnan(dep_ngb) and c > 2:
+            if flag_grid[r, c - 3] != 0:
+                return 0
+            dep_ngb = bathy[r, c - 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - right node
+
+    if c < cols - 1:  # if we are not on the last column
+
+        # attempt to retrieve depth
+        if flag_grid[r, c + 1] != 0:
+            return 0
+        dep_ngb = bathy[r, c + 1]
+        if npy_isnan(dep_ngb) and (c < cols - 2):
+            if flag_grid[r, c + 2] != 0:
+                return 0
+            dep_ngb = bathy[r, c + 2]
+        if npy_isnan(dep_ngb) and (c < cols - 3):
+            if flag_grid[r, c + 3] != 0:
+                return 0
+            dep_ngb = bathy[r, c + 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - bottom node
+
+    if r > 0:  # if we are not on the first row
+
+        # attempt to retrieve depth
+        if flag_grid[r - 1, c] != 0:
+            return 0
+        dep_ngb = bathy[r - 1, c]
+        if npy_isnan(dep_ngb) and r > 1:
+            if flag_grid[r - 2, c] != 0:
+                return 0
+            dep_ngb = bathy[r - 2, c]
+        if npy_isnan(dep_ngb) and r > 2:
+            if flag_grid[r - 3, c] != 0:
+                return 0
+            dep_ngb = bathy[r - 3, c]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - top node
+
+    if r < rows - 1:  # if we are not on the last row
+
+        # attempt to retrieve depth
+        if flag_grid[r + 1, c] != 0:
+            return 0
+        dep_ngb = bathy[r + 1, c]
+        if npy_isnan(dep_ngb) and (r < rows - 2):
+            if flag_grid[r + 2, c] != 0:
+                return 0
+            dep_ngb = bathy[r + 2, c]
+        if npy_isnan(dep_ngb) and (r < rows - 3):
+            if flag_grid[r + 3, c] != 0:
+                return 0
+            dep_ngb = bathy[r + 3, c]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - bottom-left node
+
+    if (r > 0) and (c > 0):  # if we are not on the first row and col
+
+        # attempt to retrieve depth
+        if flag_grid[r - 1, c - 1] != 0:
+            return 0
+        dep_ngb = bathy[r - 1, c - 1]
+        if npy_isnan(dep_ngb) and r > 1 and c > 1:
+            if flag_grid[r - 2, c - 2] != 0:
+                return 0
+            dep_ngb = bathy[r - 2, c - 2]
+        # if npy_isnan(dep_ngb) and r > 2 and c > 2:
+        #     if flag_grid[r - 3, c - 3] != 0:
+        #         continue
+        #     dep_ngb = bathy[r - 3, c - 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - top-right node
+
+    if (r < rows - 1) and (c < cols - 1):  # if we are not on the last row and col
+
+        # attempt to retrieve depth
+        if flag_grid[r + 1, c + 1] != 0:
+            return 0
+        dep_ngb = bathy[r + 1, c + 1]
+        if npy_isnan(dep_ngb) and (r < rows - 2) and (c < cols - 2):
+            if flag_grid[r + 2, c + 2] != 0:
+                return 0
+            dep_ngb = bathy[r + 2, c + 2]
+        # if npy_isnan(dep_ngb) and (r < rows - 3) and (c < cols - 3):
+        #     if flag_grid[r + 3, c + 3] != 0:
+        #         continue
+        #     dep_ngb = bathy[r + 3, c + 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - bottom-right node
+
+    if (r > 0) and (c < cols - 1):  # if we are not on the first row and last col
+
+        # attempt to retrieve depth
+        if flag_grid[r - 1, c + 1] != 0:
+            return 0
+        dep_ngb = bathy[r - 1, c + 1]
+        if npy_isnan(dep_ngb) and r > 1 and (c < cols - 2):
+            if flag_grid[r - 2, c + 2] != 0:
+                return 0
+            dep_ngb = bathy[r - 2, c + 2]
+        # if npy_isnan(dep_ngb) and r > 2 and c > 2:
+        #     if flag_grid[r - 3, c + 3] != 0:
+        #         continue
+        #     dep_ngb = bathy[r - 3, c + 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - top-left node
+
+    if (r < rows - 1) and (c > 0):  # if we are not on the last row and first col
+
+        # attempt to retrieve depth
+        if flag_grid[r + 1, c - 1] != 0:
+            return 0
+        dep_ngb = bathy[r + 1, c - 1]
+        if npy_isnan(dep_ngb) and (r < rows - 2) and c > 1:
+            if flag_grid[r + 2, c - 2] != 0:
+                return 0
+            dep_ngb = bathy[r + 2, c - 2]
+        # if npy_isnan(dep_ngb) and (r < rows - 3) and c > 2:
+        #     if flag_grid[r + 3, c - 3] != 0:
+        #         continue
+        #     dep_ngb = bathy[r + 3, c - 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    if ngb_cnt == 0:
+        return 0
+
+    # calculate the ratio among flagged and total neighbors, then use it to decide if a flier
+    if (r == 0) or (c == 0) or (r == (rows - 1)) or (c == (cols - 1)):
+        thr = 1.0
+    elif ngb_cnt <= 4:
+        thr = pct1
+    else:
+        thr = pct2
+
+    pos_ratio = dif_pos_cnt / float(ngb_cnt)
+    if pos_ratio >= thr:
+                return 3  # check #3
+
+    neg_ratio = dif_neg_cnt / float(ngb_cnt)
+    if neg_ratio >= thr:
+                return 3  # check #3
+
+    return 0
+
+
+# noinspection PyUnresolvedReferences
+@cython.cdivision(True)
+@cython.cpow(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef inline int _check_adjacent_node_float(float[:, :] bathy, np.uint8_t[:, :] flag_grid,
+                                           np.npy_intp r, np.npy_intp c, float th, float pct1, float pct2):
+    """Evaluate the adjacent cells check (#3) on a single node, returning 3 if flagged"""
+
+    cdef np.npy_intp rows = bathy.shape[0]  # number of rows
+    cdef np.npy_intp cols = bathy.shape[1]  # number of columns
+    cdef float dep_node, dep_ngb
+    cdef float pos_ratio, neg_ratio, thr
+    cdef int dif_pos_cnt, dif_neg_cnt, ngb_cnt
+
+    if flag_grid[r, c] != 0:  # avoid existing flagged nodes
+        return 0
+
+    # for each node in the grid, the depth is retrieved
+    dep_node = bathy[r, c]
+
+    # any further calculation is skipped in case of a no-data value
+    if npy_isnan(dep_node):
+        return 0
+
+    ngb_cnt = 0  # initialize the number of neighbors
+    dif_pos_cnt = 0  # initialize the number of neighbors with positive depth diff
+    dif_neg_cnt = 0  # initialize the number of neighbors with negative depth diff
+
+    # - left node
+
+    if c > 0:  # if we are not on the first column
+
+        # attempt to retrieve depth
+        if flag_grid[r, c - 1] != 0:
+            return 0
+        dep_ngb = bathy[r, c - 1]
+        if npy_isnan(dep_ngb) and c > 1:
+            if flag_grid[r, c - 2] != 0:
+                return 0
+            dep_ngb = bathy[r, c - 2]
+        if npy_isnan(dep_ngb) and c > 2:
+            if flag_grid[r, c - 3] != 0:
+                return 0
+            dep_ngb = bathy[r, c - 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - right node
+
+    if c < cols - 1:  # if we are not on the last column
+
+        # attempt to retrieve depth
+        if flag_grid[r, c + 1] != 0:
+            return 0
+        dep_ngb = bathy[r, c + 1]
+        if npy_isnan(dep_ngb) and (c < cols - 2):
+            if flag_grid[r, c + 2] != 0:
+                return 0
+            dep_ngb = bathy[r, c + 2]
+        if npy_isnan(dep_ngb) and (c < cols - 3):
+            if flag_grid[r, c + 3] != 0:
+                return 0
+            dep_ngb = bathy[r, c + 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - bottom node
+
+    if r > 0:  # if we are not on the first row
+
+        # attempt to retrieve depth
+        if flag_grid[r - 1, c] != 0:
+            return 0
+        dep_ngb = bathy[r - 1, c]
+        if npy_isnan(dep_ngb) and r > 1:
+            if flag_grid[r - 2, c] != 0:
+                return 0
+            dep_ngb = bathy[r - 2, c]
+        if npy_isnan(dep_ngb) and r > 2:
+            if flag_grid[r - 3, c] != 0:
+                return 0
+            dep_ngb = bathy[r - 3, c]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - top node
+
+    if r < rows - 1:  # if we are not on the last row
+
+        # attempt to retrieve depth
+        if flag_grid[r + 1, c] != 0:
+            return 0
+        dep_ngb = bathy[r + 1, c]
+        if npy_isnan(dep_ngb) and (r < rows - 2):
+            if flag_grid[r + 2, c] != 0:
+                return 0
+            dep_ngb = bathy[r + 2, c]
+        if npy_isnan(dep_ngb) and (r < rows - 3):
+            if flag_grid[r + 3, c] != 0:
+                return 0
+            dep_ngb = bathy[r + 3, c]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - bottom-left node
+
+    if (r > 0) and (c > 0):  # if we are not on the first row and col
+
+        # attempt to retrieve depth
+        if flag_grid[r - 1, c - 1] != 0:
+            return 0
+        dep_ngb = bathy[r - 1, c - 1]
+        if npy_isnan(dep_ngb) and r > 1 and c > 1:
+            if flag_grid[r - 2, c - 2] != 0:
+                return 0
+            dep_ngb = bathy[r - 2, c - 2]
+        # if npy_isnan(dep_ngb) and r > 2 and c > 2:
+        #     if flag_grid[r - 3, c - 3] != 0:
+        #         continue
+        #     dep_ngb = bathy[r - 3, c - 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - top-right node
+
+    if (r < rows - 1) and (c < cols - 1):  # if we are not on the last row and col
+
+        # attempt to retrieve depth
+        if flag_grid[r + 1, c + 1] != 0:
+            return 0
+        dep_ngb = bathy[r + 1, c + 1]
+        if npy_isnan(dep_ngb) and (r < rows - 2) and (c < cols - 2):
+            if flag_grid[r + 2, c + 2] != 0:
+                return 0
+            dep_ngb = bathy[r + 2, c + 2]
+        # if npy_isnan(dep_ngb) and (r < rows - 3) and (c < cols - 3):
+        #     if flag_grid[r + 3, c + 3] != 0:
+        #         continue
+        #     dep_ngb = bathy[r + 3, c + 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - bottom-right node
+
+    if (r > 0) and (c < cols - 1):  # if we are not on the first row and last col
+
+        # attempt to retrieve depth
+        if flag_grid[r - 1, c + 1] != 0:
+            return 0
+        dep_ngb = bathy[r - 1, c + 1]
+        if npy_isnan(dep_ngb) and r > 1 and (c < cols - 2):
+            if flag_grid[r - 2, c + 2] != 0:
+                return 0
+            dep_ngb = bathy[r - 2, c + 2]
+        # if npy_isnan(dep_ngb) and r > 2 and c > 2:
+        #     if flag_grid[r - 3, c + 3] != 0:
+        #         continue
+        #     dep_ngb = bathy[r - 3, c + 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    # - top-left node
+
+    if (r < rows - 1) and (c > 0):  # if we are not on the last row and first col
+
+        # attempt to retrieve depth
+        if flag_grid[r + 1, c - 1] != 0:
+            return 0
+        dep_ngb = bathy[r + 1, c - 1]
+        if npy_isnan(dep_ngb) and (r < rows - 2) and c > 1:
+            if flag_grid[r + 2, c - 2] != 0:
+                return 0
+            dep_ngb = bathy[r + 2, c - 2]
+        # if npy_isnan(dep_ngb) and (r < rows - 3) and c > 2:
+        #     if flag_grid[r + 3, c - 3] != 0:
+        #         continue
+        #     dep_ngb = bathy[r + 3, c - 3]
+
+        # evaluate depth difference
+        if not npy_isnan(dep_ngb):
+            ngb_cnt += 1
+            if dep_node - dep_ngb > th:
+                dif_pos_cnt += 1
+            if dep_node - dep_ngb < -th:
+                dif_neg_cnt += 1
+
+    if ngb_cnt == 0:
+        return 0
+
+    # calculate the ratio among flagged and total neighbors, then use it to decide if a flier
+    if (r == 0) or (c == 0) or (r == (rows - 1)) or (c == (cols - 1)):
+        thr = 1.0
+    elif ngb_cnt <= 4:
+        thr = pct1
+    else:
+        thr = pct2
+
+    pos_ratio = dif_pos_cnt / float(ngb_cnt)
+    if pos_ratio >= thr:
+                return 3  # check #3
+
+    neg_ratio = dif_neg_cnt / float(ngb_cnt)
+    if neg_ratio >= thr:
+                return 3  # check #3
+
+    return 0
+
+
+# noinspection PyUnresolvedReferences
+@cython.cdivision(True)
+@cython.cpow(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+#@cython.profile(True)
+cpdef check_fused_double(double[:, :] bathy, double[:, :] gauss_curv, np.uint8_t[:, :] flag_grid,
+                         bint check_laplacian, float lap_th, bint check_curv, float curv_th,
+                         bint check_adjacent, float adj_th, float pct1, float pct2):
+    """Single sweep for the laplacian operator (#1), gaussian curvature (#2) and adjacent cells (#3) checks
+
+    The checks #1 and #2 are evaluated row by row, while the check #3 follows with a lag of 3 rows (the extent of
+    its neighborhood). The resulting flags are the same as running the three checks in sequence: #3 is only
+    evaluated on nodes (and neighbors) not yet flagged.
+    """
+
+    cdef np.npy_intp rows = bathy.shape[0]  # number of rows
+    cdef np.npy_intp cols = bathy.shape[1]  # number of columns
+    cdef np.npy_intp r, c, r_adj
+    cdef double dep_node, dep_up, dep_down, dep_left, dep_right
+    cdef double lap
+    cdef int nr_lap = 0, nr_curv = 0, nr_adj = 0
+
+    for r in range(rows + 3):
+
+        if r < rows:
+
+            for c in range(cols):
+
+                if check_curv and (gauss_curv[r, c] > curv_th):
+                    flag_grid[r, c] |= 2  # check #2
+                    nr_curv += 1
+
+                if check_laplacian:
+                    # same as ndimage.laplace (with 'reflect' mode at the grid boundaries)
+                    dep_node = bathy[r, c]
+                    dep_up = bathy[r - 1, c] if r > 0 else dep_node
+                    dep_down = bathy[r + 1, c] if r < rows - 1 else dep_node
+                    dep_left = bathy[r, c - 1] if c > 0 else dep_node
+                    dep_right = bathy[r, c + 1] if c < cols - 1 else dep_node
+                    lap = (dep_node * -2.0 + (dep_up + dep_down)) + (dep_node * -2.0 + (dep_left + dep_right))
+                    if (lap < lap_th) or (lap > -lap_th):
+                        flag_grid[r, c] |= 1  # check #1
+                        nr_lap += 1
+
+        if not check_adjacent:
+            continue
+
+        r_adj = r - 3
+        if r_adj < 0:
+            continue
+
+        for c in range(1, cols - 1):
+            if _check_adjacent_node_double(bathy, flag_grid, r_adj, c, adj_th, pct1, pct2) == 3:
+                flag_grid[r_adj, c] |= 4  # check #3
+                nr_adj += 1
+
+    logger.debug("[fused] flagged nodes -> #1: %d, #2: %d, #3: %d" % (nr_lap, nr_curv, nr_adj))
+
+
+# noinspection PyUnresolvedReferences
+@cython.cdivision(True)
+@cython.cpow(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+#@cython.profile(True)
+cpdef check_fused_float(float[:, :] bathy, float[:, :] gauss_curv, np.uint8_t[:, :] flag_grid,
+                        bint check_laplacian, float lap_th, bint check_curv, float curv_th,
+                        bint check_adjacent, float adj_th, float pct1, float pct2):
+    """Single sweep for the laplacian operator (#1), gaussian curvature (#2) and adjacent cells (#3) checks
+
+    The checks #1 and #2 are evaluated row by row, while the check #3 follows with a lag of 3 rows (the extent of
+    its neighborhood). The resulting flags are the same as running the three checks in sequence: #3 is only
+    evaluated on nodes (and neighbors) not yet flagged.
+    """
+
+    cdef np.npy_intp rows = bathy.shape[0]  # number of rows
+    cdef np.npy_intp cols = bathy.shape[1]  # number of columns
+    cdef np.npy_intp r, c, r_adj
+    cdef double dep_node, dep_up, dep_down, dep_left, dep_right
+    cdef float lap
+    cdef int nr_lap = 0, nr_curv = 0, nr_adj = 0
+
+    for r in range(rows + 3):
+
+        if r < rows:
+
+            for c in range(cols):
+
+                if check_curv and (gauss_curv[r, c] > curv_th):
+                    flag_grid[r, c] |= 2  # check #2
+                    nr_curv += 1
+
+                if check_laplacian:
+                    # same as ndimage.laplace (with 'reflect' mode at the grid boundaries)
+                    dep_node = bathy[r, c]
+                    dep_up = bathy[r - 1, c] if r > 0 else dep_node
+                    dep_down = bathy[r + 1, c] if r < rows - 1 else dep_node
+                    dep_left = bathy[r, c - 1] if c > 0 else dep_node
+                    dep_right = bathy[r, c + 1] if c < cols - 1 else dep_node
+                    lap = <float> (dep_node * -2.0 + (dep_up + dep_down)) + \
+                          <float> (dep_node * -2.0 + (dep_left + dep_right))
+                    if (lap < lap_th) or (lap > -lap_th):
+                        flag_grid[r, c] |= 1  # check #1
+                        nr_lap += 1
+
+        if not check_adjacent:
+            continue
+
+        r_adj = r - 3
+        if r_adj < 0:
+            continue
+
+        for c in range(1, cols - 1):
+            if _check_adjacent_node_float(bathy, flag_grid, r_adj, c, adj_th, pct1, pct2) == 3:
+                flag_grid[r_adj, c] |= 4  # check #3
+                nr_adj += 1
+
+    logger.debug("[fused] flagged nodes -> #1: %d, #2: %d, #3: %d" % (nr_lap, nr_curv, nr_adj))
+
+
 # noinspection PyUnresolvedReferences
 @cython.cdivision(True)
 @cython.cpow(True)
@@ -647,7 +1274,7 @@ cpdef check_adjacent_cells_float(float[:, :] bathy, int[:, :] flag_grid, float t
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_small_groups_float(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_bin, float[:, :] bathy, int[:, :] flag_grid, float th, double area_limit,
+cpdef check_small_groups_float(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_bin, float[:, :] bathy, np.uint8_t[:, :] flag_grid, float th, double area_limit,
                          bint check_slivers, bint check_isolated):
 
     cdef np.npy_intp last_r, last_c, r, c
@@ -713,7 +1340,7 @@ cpdef check_small_groups_float(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_bi
 
                         if (abs(bathy[r, c] - bathy[nb_rs[ni], nb_cs[ni]]) > th) \
                                 and check_slivers:
-                            flag_grid[r, c] = 4  # check #4
+                            flag_grid[r, c] |= 8  # check #4
                             logger.info("#4 > n%s @(%s, %s)" % (ni + 1, r, c))
                         break
 
@@ -726,7 +1353,7 @@ cpdef check_small_groups_float(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_bi
         # it is an isolated group
         if (last_r > 4) and (last_r < rows - 4) and (last_c > 4) and (last_c < cols - 4):
             if (conn_count == 0) and check_isolated:
-                flag_grid[last_r, last_c] = 5  # check #5
+                flag_grid[last_r, last_c] |= 16  # check #5
                 logger.info("#5 > @(%s, %s)" % (last_r, last_c))
 
 
@@ -738,7 +1365,7 @@ cpdef check_small_groups_float(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_bi
 @cython.nonecheck(False)
 #@cython.profile(True)
 cpdef check_small_groups_double(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_bin, double[:, :] bathy,
-                                int[:, :] flag_grid, float th, double area_limit,
+                                np.uint8_t[:, :] flag_grid, float th, double area_limit,
                                 bint check_slivers, bint check_isolated):
 
     cdef np.npy_intp last_r, last_c, r, c
@@ -804,7 +1431,7 @@ cpdef check_small_groups_double(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_b
 
                         if (abs(bathy[r, c] - bathy[nb_rs[ni], nb_cs[ni]]) > th) \
                                 and check_slivers:
-                            flag_grid[r, c] = 4  # check #4
+                            flag_grid[r, c] |= 8  # check #4
                             logger.info("#4 > n%s @(%s, %s)" % (ni + 1, r, c))
                         break
 
@@ -817,7 +1444,7 @@ cpdef check_small_groups_double(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_b
         # it is an isolated group
         if (last_r > 4) and (last_r < rows - 4) and (last_c > 4) and (last_c < cols - 4):
             if (conn_count == 0) and check_isolated:
-                flag_grid[last_r, last_c] = 5  # check #5
+                flag_grid[last_r, last_c] |= 16  # check #5
                 logger.info("#5 > @(%s, %s)" % (last_r, last_c))
 
 
@@ -828,7 +1455,7 @@ cpdef check_small_groups_double(np.ndarray[np.uint8_t, ndim=2, cast=True] grid_b
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_noisy_edges_double(double[:, :] bathy, int[:, :] flag_grid, int dist, float cf):
+cpdef check_noisy_edges_double(double[:, :] bathy, np.uint8_t[:, :] flag_grid, int dist, float cf):
 
     logger.debug("[noisy edges] double bathy (dist: %d, cf: %.2f)" % (dist, cf))
 
@@ -1072,7 +1699,7 @@ cpdef check_noisy_edges_double(double[:, :] bathy, int[:, :] flag_grid, int dist
                 thr = (1. + (0.023 * -min_dep) ** 2) ** 0.5
 
             if max_diff > cf * thr:
-                flag_grid[r, c] = 6  # check #6
+                flag_grid[r, c] |= 32  # check #6
                 logger.debug("(%s, %s) count: %s, max diff: %.2f, min z: %.2f -> th: %.2f"
                              % (r, c, ngb_cnt, max_diff, min_dep, thr))
 
@@ -1083,7 +1710,7 @@ cpdef check_noisy_edges_double(double[:, :] bathy, int[:, :] flag_grid, int dist
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_noisy_edges_float(float[:, :] bathy, int[:, :] flag_grid, int dist, float cf):
+cpdef check_noisy_edges_float(float[:, :] bathy, np.uint8_t[:, :] flag_grid, int dist, float cf):
 
     logger.debug("[noisy edges] float bathy (dist: %d, cf: %.2f)" % (dist, cf))
 
@@ -1329,7 +1956,7 @@ cpdef check_noisy_edges_float(float[:, :] bathy, int[:, :] flag_grid, int dist,
                 thr = (1. + (0.023 * -min_dep) ** 2) ** 0.5
 
             if max_diff > cf * thr:
-                flag_grid[r, c] = 6  # check #6
+                flag_grid[r, c] |= 32  # check #6
                 logger.debug("(%s, %s) count: %s, max diff: %.2f, min z: %.2f -> th: %.2f"
                              % (r, c, ngb_cnt, max_diff, min_dep, thr))
 
@@ -1341,7 +1968,7 @@ cpdef check_noisy_edges_float(float[:, :] bathy, int[:, :] flag_grid, int dist,
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_noisy_margins_double(double[:, :] bathy, int[:, :] flag_grid, int dist, float cf):
+cpdef check_noisy_margins_double(double[:, :] bathy, np.uint8_t[:, :] flag_grid, int dist, float cf):
 
     logger.debug("[noisy margins] double bathy (dist: %d, cf: %.2f)" % (dist, cf))
 
@@ -1659,7 +2286,7 @@ cpdef check_noisy_margins_double(double[:, :] bathy, int[:, :] flag_grid, int di
                 thr = (1. + (0.023 * -min_dep) ** 2) ** 0.5
 
             if max_diff > cf * thr:
-                flag_grid[r, c] = 7  # check #7
+                flag_grid[r, c] |= 64  # check #7
                 logger.debug("(%s, %s) count: %s, max diff: %.2f, min z: %.2f -> th: %.2f"
                              % (r, c, ngb_cnt, max_diff, min_dep, thr))
 
@@ -1671,7 +2298,7 @@ cpdef check_noisy_margins_double(double[:, :] bathy, int[:, :] flag_grid, int di
 @cython.wraparound(False)
 @cython.nonecheck(False)
 #@cython.profile(True)
-cpdef check_noisy_margins_float(float[:, :] bathy, int[:, :] flag_grid, int dist, float cf):
+cpdef check_noisy_margins_float(float[:, :] bathy, np.uint8_t[:, :] flag_grid, int dist, float cf):
 
     logger.debug("[noisy margins] float bathy (dist: %d, cf: %.2f)" % (dist, cf))
 
@@ -1989,6 +2616,6 @@ cpdef check_noisy_margins_float(float[:, :] bathy, int[:, :] flag_grid, int dist
                 thr = (1. + (0.023 * -min_dep) ** 2) ** 0.5
 
             if max_diff > cf * thr:
-                flag_grid[r, c] = 7  # check #7
+                flag_grid[r, c] |= 64  # check #7
                 logger.debug("(%s, %s) count: %s, max diff: %.2f, min z: %.2f -> th: %.2f"
                              % (r, c, ngb_cnt, max_diff, min_dep, thr))
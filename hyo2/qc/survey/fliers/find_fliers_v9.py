@@ -1,6 +1,8 @@
 import logging
-import math
 import os
+import warnings
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from typing import Optional
 
 import numpy as np
@@ -8,32 +10,46 @@ from hyo2.abc.lib.progress.abstract_progress import AbstractProgress
 from hyo2.abc.lib.gdal_aux import GdalAux
 # noinspection PyProtectedMember
 from hyo2.grids._grids import FLOAT as GRIDS_FLOAT, DOUBLE as GRIDS_DOUBLE
-from hyo2.qc.survey.fliers.base_fliers import BaseFliers, fliers_algos
+from hyo2.qc.common.s57_cache import S57Cache
+from hyo2.qc.survey.fliers.base_fliers import BaseFliers, fliers_algos, fliers_checks, flier_dtype
+from hyo2.qc.survey.fliers.halo_tiles import DepthTile, HaloTiles
+from hyo2.qc.survey.fliers.raster_mosaic import MosaicWriter, RasterMosaic
+from hyo2.qc.survey.fliers.tile_cache import TileCache
 from hyo2.qc.survey.fliers.find_fliers_checks import \
     check_laplacian_operator_float, check_laplacian_operator_double, \
     check_gaussian_curvature_float, check_gaussian_curvature_double, \
     check_adjacent_cells_float, check_adjacent_cells_double, \
     check_small_groups_float, check_small_groups_double, \
     check_noisy_edges_float, check_noisy_edges_double, \
-    check_noisy_margins_float, check_noisy_margins_double
+    check_noisy_margins_float, check_noisy_margins_double, \
+    check_fused_float, check_fused_double
 from hyo2.enc.lib.s57.s57 import S57
 from osgeo import osr, gdal
 from scipy import ndimage
+from scipy.spatial import cKDTree
 
 logger = logging.getLogger(__name__)
 
+# proxies and surfaces shared by all the configurations run on the same tile
+_proxy_keys = ('median', 'nmad', 'dtm_mean', 'dtm_std', 'dtm_mad', 'gx', 'gy', 'gauss_curv', 'std_gauss_curv')
+
+# lookup from flag bitmask to the reported check (the highest bit set)
+_check_codes = np.array([int(bits).bit_length() for bits in range(256)], dtype=np.uint8)
+
 
 class FindFliersV9(BaseFliers):
     default_filter_distance = 1.0  # type: float
     default_filter_delta_z = 0.01  # type: float
+    debug_nodata = -9999.0  # type: float
 
     def __init__(self, grids, height: Optional[float] = None,
                  check_laplacian: bool = True, check_curv: bool = True, check_adjacent: bool = True,
                  check_slivers: bool = True, check_isolated: bool = True, check_edges: bool = True,
-                 check_margins: bool = True,
+                 check_margins: bool = True, halo: int = 0, workers: int = 1, tile_cache: bool = False,
                  filter_fff: bool = False, filter_designated: bool = False, save_bathy: bool = False,
                  save_proxies: bool = False, save_heights: bool = False, save_curvatures: bool = False,
-                 output_folder: Optional[str] = None, progress_bar: Optional[AbstractProgress] = None):
+                 save_flags: bool = False, output_folder: Optional[str] = None,
+                 progress_bar: Optional[AbstractProgress] = None):
 
         super().__init__(grids=grids)
         self.type = fliers_algos["FIND_FLIERS_v9"]  # type: int
@@ -42,6 +58,7 @@ class FindFliersV9(BaseFliers):
         self.save_proxies = save_proxies  # type: bool
         self.save_heights = save_heights  # type: bool
         self.save_curvatures = save_curvatures  # type: bool
+        self.save_flags = save_flags  # type: bool
 
         if output_folder is None:
             raise RuntimeError("missing output folder")
@@ -60,6 +77,14 @@ class FindFliersV9(BaseFliers):
         self.check_margins = check_margins  # type: bool # 7
         self.edges_distance = 3  # type: int
         self.edges_pct_tvu = 1.0  # type: float
+        self.fused_checks = True  # type: bool  # single sweep for checks #1, #2 and #3
+        if halo < 0:
+            raise RuntimeError("invalid halo: %s" % halo)
+        self.halo = halo  # type: int
+        if workers < 1:
+            raise RuntimeError("invalid number of workers: %s" % workers)
+        self.workers = workers  # type: int
+        self.use_tile_cache = tile_cache  # type: bool  # reuse the flags of the unchanged tiles
         self.filter_fff = filter_fff  # type: bool
         self.filter_designated = filter_designated  # type: bool
         self.progress = progress_bar  # type: Optional[AbstractProgress]
@@ -69,13 +94,15 @@ class FindFliersV9(BaseFliers):
         self.bathy_is_double = False  # type: bool
         self.bathy_hrs = None
         self.bathy_transform = None
+        self.bathy_core = None  # type: Optional[slice]
+        self.bathy_core_transform = None
         self.bathy_tile = 0  # type: int
 
         # designated
         self.designated_soundings = list()  # type: list
 
         # intermediate
-        self.dtm_mask = None
+        self.dtm_valid = None
         self.median = None
         self.nmad = None
         self.gx = None
@@ -88,6 +115,25 @@ class FindFliersV9(BaseFliers):
 
         # outputs
         self.flag_grid = None
+        self._loc2geo = None
+        self._tile_cache = None  # type: Optional[TileCache]
+        self._debug_rasters = None  # type: Optional[MosaicWriter]
+        self.flags_extent = None  # type: Optional[list]  # x min, y min, x max, y max
+        self.flags_res = None  # type: Optional[list]
+
+    def __getstate__(self) -> dict:
+        # only the settings are passed to the worker processes (e.g., the grids cannot be pickled)
+        state = self.__dict__.copy()
+        state['grids'] = None
+        state['progress'] = None
+        state['designated_soundings'] = list()
+        state['_flier_chunks'] = list()
+        state['_loc2geo'] = None
+        state['_tile_cache'] = None
+        state['_debug_rasters'] = None
+        for key in ['bathy_values', 'dtm_valid', 'gx', 'gy', 'gauss_curv', 'flag_grid']:
+            state[key] = None
+        return state
 
     @property
     def basename(self) -> str:
@@ -158,48 +204,153 @@ class FindFliersV9(BaseFliers):
                        self.check_isolated, self.check_edges))
         logger.debug("noisy edges -> distance: %d, pct tvu: %.1f"
                      % (self.edges_distance, self.edges_pct_tvu * 100))
+        logger.debug("tile halo: %d, workers: %d, tile cache: %s" % (self.halo, self.workers, self.use_tile_cache))
         logger.info("active filters: FFF: %s, designated: %s"
                     % (self.filter_fff, self.filter_designated))
-        logger.debug("save: bathy %s, heights %s, proxies %s, curvatures %s"
-                     % (self.save_bathy, self.save_heights, self.save_proxies, self.save_curvatures))
+        logger.debug("save: bathy %s, heights %s, proxies %s, curvatures %s, flags %s"
+                     % (self.save_bathy, self.save_heights, self.save_proxies, self.save_curvatures, self.save_flags))
 
         self.bathy_tile = 0
-        while self.grids.read_next_tile(layers=[self.grids.depth_layer_name(), ]):
-            self._run_slice()
-            self.grids.clear_tiles()
-            self.bathy_tile += 1
-            logger.debug("new tile: %s" % self.bathy_tile)
+        self.open_tile_cache()
+        self.open_debug_rasters()
+        try:
+            tiles = HaloTiles(read_tile=self._read_depth_tile, halo=self.halo)
+            if self.workers > 1:
+                self._run_parallel(tiles=tiles)
+            else:
+                for tile in tiles:
+                    self._run_slice(tile=tile)
+                    self.bathy_tile += 1
+                    logger.debug("new tile: %s" % self.bathy_tile)
+
+        finally:
+            self.close_debug_rasters()
+        self.grids.clear_tiles()
+        self.close_tile_cache()
+
+    def open_tile_cache(self):
+        """Open the cache of the tile flags in the output folder (if enabled)"""
+        self._tile_cache = None
+        if not self.use_tile_cache:
+            return
+
+        if self.save_proxies:
+            logger.info("tile cache disabled by the export of the proxies")
+            return
+
+        params = {
+            'height': self.flier_height,
+            'checks': [self.check_laplacian, self.check_curv, self.check_adjacent, self.check_slivers,
+                       self.check_isolated, self.check_edges, self.check_margins],
+            'edges': [self.edges_distance, self.edges_pct_tvu],
+        }
+        self._tile_cache = TileCache(cache_folder=os.path.join(self.output_folder, "%s.tiles" % self.basename),
+                                     params=params)
+
+    def close_tile_cache(self):
+        """Remove the cached tiles that were not part of the last run"""
+        if self._tile_cache is None:
+            return
 
-    def _run_slice(self):
+        self._tile_cache.prune()
+        self._tile_cache = None
+
+    def _read_cached_tile(self, tile: DepthTile) -> tuple:
+        """Return the tile fingerprint and the cached results (None if missing)"""
+        fingerprint = self._tile_cache.fingerprint(tile)
+        results = self._tile_cache.read(fingerprint, shape=tile.values.shape)
+        if results is not None:
+            # the proxy surfaces of the tile are not available
+            results.update({'gx': None, 'gy': None, 'gauss_curv': None})
+        return fingerprint, results
+
+    def _run_parallel(self, tiles: HaloTiles):
+        """Run the checks on a pool of worker processes, then collect the flags in the tiles order"""
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_tile_worker,
+                                 initargs=(self,)) as executor:
+            for tile in tiles:
+                fingerprint = None
+                if self._tile_cache is not None:
+                    fingerprint, results = self._read_cached_tile(tile)
+                    if results is not None:
+                        future = Future()
+                        future.set_result(results)
+                        pending.append((tile, None, future))
+                        continue
+
+                pending.append((tile, fingerprint, executor.submit(_find_fliers_in_tile, tile)))
+
+                # limit the number of tiles kept in memory
+                if len(pending) >= 2 * self.workers:
+                    self._collect_slice(*pending.popleft())
+
+            while len(pending) > 0:
+                self._collect_slice(*pending.popleft())
+
+    def _collect_slice(self, tile: DepthTile, fingerprint: Optional[str], future: Future):
+        results = future.result()
+        if fingerprint is not None:
+            self._tile_cache.write(fingerprint, results)
+        self._run_slice(tile=tile, results=results)
+        self.bathy_tile += 1
+        logger.debug("new tile: %s" % self.bathy_tile)
+
+    def _run_slice(self, tile: DepthTile, results: Optional[dict] = None, proxies: Optional[dict] = None) -> dict:
+        """Run the checks on the tile (unless already done by a worker), then store the flagged fliers"""
 
         # load depths
-        self._load_depths()
+        self._load_depths(tile=tile)
+        self._save_bathy()
 
-        if (self.dtm_mask.shape[0] < 3) or (self.dtm_mask.shape[1] < 3):
-            logger.info('Skipping too small tile: %d, %d' % (self.dtm_mask.shape[0], self.dtm_mask.shape[1]))
-            return
+        if results is None:
+            fingerprint = None
+            if self._tile_cache is not None:
+                fingerprint, results = self._read_cached_tile(tile)
 
-        # to force recalculation
-        self.gy = None
-        self.gx = None
+            if results is None:
+                results = self._find_fliers(proxies=proxies)
+                if fingerprint is not None:
+                    self._tile_cache.write(fingerprint, results)
+
+        if len(results) == 0:
+            return results
+        self.__dict__.update(results)
+
+        self._save_proxies()
+
+        self._georef_fliers()
+        return results
+
+    def _find_fliers(self, proxies: Optional[dict] = None) -> dict:
+        """Run the enabled checks on the loaded depths, returning the resulting flags and proxies"""
+
+        if (self.bathy_values.shape[0] < 3) or (self.bathy_values.shape[1] < 3):
+            logger.info('Skipping too small tile: %d, %d' % (self.bathy_values.shape[0], self.bathy_values.shape[1]))
+            return dict()
 
         self.cur_height = self.flier_height
-        self.estimate_height_and_curv_th()
+        self.estimate_height_and_curv_th(proxies=proxies)
         if self.cur_height == 0:
             raise RuntimeError("unable to estimate height, and one of the selected algorithms "
                                "needs the estimated height")
 
-        # create a 0 grid of the same size as input grid to be used to store the flagged node
-        self.flag_grid = np.zeros(self.bathy_values.shape, dtype=int)
+        # create a 0 grid of the same size as input grid to be used to store the flagged node (a bit for each check)
+        self.flag_grid = np.zeros(self.bathy_values.shape, dtype=np.uint8)
 
-        if self.check_laplacian:
-            self._check_laplacian_operator()
+        if self.fused_checks:
+            if self.check_laplacian or self.check_curv or self.check_adjacent:
+                self._check_fused()
 
-        if self.check_curv:
-            self._check_gaussian_curvature()
+        else:
+            if self.check_laplacian:
+                self._check_laplacian_operator()
 
-        if self.check_adjacent:
-            self._check_adjacent_cells()
+            if self.check_curv:
+                self._check_gaussian_curvature()
+
+            if self.check_adjacent:
+                self._check_adjacent_cells()
 
         if self.check_isolated or self.check_slivers:
             self._check_small_groups()
@@ -210,14 +361,37 @@ class FindFliersV9(BaseFliers):
         if self.check_margins:
             self._check_margins()
 
-        self._georef_fliers()
+        # only keep the flags in the tile core (the halo rows belong to the adjacent tiles)
+        self.flag_grid[:self.bathy_core.start] = 0
+        self.flag_grid[self.bathy_core.stop:] = 0
+
+        results = {
+            'flag_grid': self.flag_grid,
+            'cur_height': self.cur_height,
+            'cur_curv_th': self.cur_curv_th,
+            'median': self.median,
+            'nmad': self.nmad,
+            'std_gauss_curv': self.std_gauss_curv,
+            'dtm_mean': self.dtm_mean,
+            'dtm_std': self.dtm_std,
+            'dtm_mad': self.dtm_mad,
+        }
+        # the curvatures are only passed back (from the worker processes) when saved as proxies
+        if self.save_proxies:
+            results['gauss_curv'] = self.gauss_curv
+        return results
 
     # ###  INPUTS  ###
 
-    def _load_depths(self):
-        """Helper function that loads the depths values"""
+    def _read_depth_tile(self) -> Optional[DepthTile]:
+        """Helper function that reads the next tile and retrieves the depths values"""
         # logger.debug("depth layer: %s" % self.grids.depth_layer_name())
 
+        # the previous tile is only released here, so that its values can be used without copies when halo is 0
+        self.grids.clear_tiles()
+        if not self.grids.read_next_tile(layers=[self.grids.depth_layer_name(), ]):
+            return None
+
         tile = self.grids.tiles[0]
         # logger.debug("types: %s" % (list(tile.types),))
 
@@ -227,59 +401,84 @@ class FindFliersV9(BaseFliers):
 
         if depth_type == GRIDS_DOUBLE:
 
-            self.bathy_is_double = True
-            self.bathy_values = tile.doubles[depth_idx]
-            self.bathy_values[tile.doubles[depth_idx] == tile.doubles_nodata[depth_idx]] = np.nan
-            if len(self.bathy_values) == 0:
+            is_double = True
+            values = tile.doubles[depth_idx]
+            values[tile.doubles[depth_idx] == tile.doubles_nodata[depth_idx]] = np.nan
+            if len(values) == 0:
                 raise RuntimeError("No bathy values")
 
         elif depth_type == GRIDS_FLOAT:
 
-            self.bathy_is_double = False
-            self.bathy_values = tile.floats[depth_idx]
-            self.bathy_values[tile.floats[depth_idx] == tile.floats_nodata[depth_idx]] = np.nan
-            if len(self.bathy_values) == 0:
+            is_double = False
+            values = tile.floats[depth_idx]
+            values[tile.floats[depth_idx] == tile.floats_nodata[depth_idx]] = np.nan
+            if len(values) == 0:
                 raise RuntimeError("No bathy values")
 
         elif depth_type == "KLUSTER_FLOAT32":
 
-            self.bathy_is_double = False
-            self.bathy_values = tile.layers[depth_idx]
-            self.bathy_values[np.isnan(tile.layers[depth_idx])] = np.nan
-            if len(self.bathy_values) == 0:
+            is_double = False
+            values = tile.layers[depth_idx]
+            values[np.isnan(tile.layers[depth_idx])] = np.nan
+            if len(values) == 0:
                 raise RuntimeError("No bathy values")
 
         else:
             raise RuntimeError("Unsupported data type for bathy: %s" % depth_type)
 
+        # the values are used after that the tile has been released (halo rows, worker processes)
+        if (self.halo > 0) or (self.workers > 1):
+            values = values.copy()
+
+        transform = [tile.bbox.transform[0], tile.bbox.transform[1], tile.bbox.transform[2],
+                     tile.bbox.transform[3], tile.bbox.transform[4], tile.bbox.transform[5], ]
+
+        return DepthTile(values=values, is_double=is_double, transform=transform, hrs=tile.bbox.hrs)
+
+    def _load_depths(self, tile: DepthTile):
+        """Helper function that loads the depths values"""
+
+        self.bathy_is_double = tile.is_double
+        self.bathy_values = tile.values
+        self.bathy_core = tile.core
+
         if self.bathy_hrs is None:
-            self.bathy_hrs = tile.bbox.hrs
+            self.bathy_hrs = tile.hrs
         # logger.info(self.bathy_hrs)
-        self.bathy_transform = [tile.bbox.transform[0], tile.bbox.transform[1], tile.bbox.transform[2],
-                                tile.bbox.transform[3], tile.bbox.transform[4], tile.bbox.transform[5], ]
+        self.bathy_transform = tile.transform
+        self.bathy_core_transform = tile.core_transform
         # logger.debug("transform: [%s, %s, %s, %s, %s, %s]"
         #              % (self.bathy_transform[0], self.bathy_transform[1], self.bathy_transform[2],
         #                 self.bathy_transform[3], self.bathy_transform[4], self.bathy_transform[5],))
 
-        # mask to avoid nan issues
-        self.dtm_mask = np.ma.masked_invalid(self.bathy_values)
-        # logger.debug('dtm: %s (valid: %d, masked: %d)'
-        #              % (self.bathy_values.shape, self.dtm_mask.count(), np.ma.count_masked(self.dtm_mask)))
+        # valid nodes (the proxies are calculated with NaN-aware functions)
+        self.dtm_valid = np.isfinite(self.bathy_values)
+        # logger.debug('dtm: %s (valid: %d)' % (self.bathy_values.shape, np.count_nonzero(self.dtm_valid)))
+
+        self._update_flags_extent()
 
+    def _update_flags_extent(self):
+        """Extend the area covered by the flags raster with the core of the current tile"""
+        t = self.bathy_core_transform
+        xs = [t[0], t[0] + (self.bathy_values.shape[1] - 1) * t[1]]
+        ys = [t[3], t[3] + (self.bathy_core.stop - self.bathy_core.start - 1) * t[5]]
+
+        if self.flags_extent is None:
+            self.flags_extent = [min(xs), min(ys), max(xs), max(ys)]
+            self.flags_res = [abs(t[1]), abs(t[5])]
+            return
+
+        self.flags_extent = [min(self.flags_extent[0], min(xs)), min(self.flags_extent[1], min(ys)),
+                             max(self.flags_extent[2], max(xs)), max(self.flags_extent[3], max(ys))]
+
+    def _save_bathy(self):
         if self.save_bathy:
-            try:
-                self._save_bathy_as_geotiff()
-            except Exception as e:
-                logger.info("unable to save bathy geotiff: %s" % e)
-            try:
-                self._save_bathy_as_xyz()
-            except Exception as e:
-                logger.info("unable to save bathy xyz: %s" % e)
+            self._write_debug_raster(name="bathy", array=self.bathy_values)
 
     # ### HEIGHT ESTIMATION ###
 
     def _calc_gradients(self):
-        self.gy, self.gx = np.gradient(self.dtm_mask)
+        self.gy, self.gx = np.gradient(self.bathy_values)
 
     def _calc_gaussian_curvatures(self):
         """Calculate gaussian (K) curvatures
@@ -287,47 +486,65 @@ class FindFliersV9(BaseFliers):
         The method is based on: "Computation of Surface Curvature from Range Images
         Using Geometrically Intrinsic Weights"*, T. Kurita and P. Boulanger, 1992.
         - gauss_curv: (3)
+
+        The curvature is NaN for the nodes whose stencil includes a void node.
         """
-        if self.gx is None:
-            self._calc_gradients()
+        self._calc_gradients()
         gxy, gxx = np.gradient(self.gx)
         gyy, _ = np.gradient(self.gy)
         self.gauss_curv = (gxx * gyy - (gxy ** 2)) / (1 + (self.gx ** 2) + (self.gy ** 2)) ** 2
-        self.std_gauss_curv = np.std(self.gauss_curv)
+        with warnings.catch_warnings():  # empty tile core
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            self.std_gauss_curv = np.nanstd(self.gauss_curv[self.bathy_core], dtype=np.float64)
 
         # comment out for visual debugging
         # from matplotlib import pyplot as plt
         # plt.ion()
         # plt.figure()
         # plt.subplot(211)
-        # plt.imshow(self.dtm_mask, origin="lower")
+        # plt.imshow(self.bathy_values, origin="lower")
         # plt.colorbar()
         # plt.subplot(212)
         # plt.imshow(self.gauss_curv, origin="lower")
         # plt.colorbar()
         # plt.show()
 
-        # logger.info("non masked values: %d" % self.dtm_mask.count())
+        # logger.info("valid values: %d" % np.count_nonzero(self.dtm_valid))
         # logger.info("gx: %s" % self.gx)
         # logger.info("gy: %s" % self.gy)
         # logger.info("gauss curv: %s" % self.gauss_curv)
         # logger.info("std gauss curv: %s" % self.std_gauss_curv)
 
-    def estimate_height_and_curv_th(self):
+    @property
+    def proxies(self) -> Optional[dict]:
+        """Proxies and derived surfaces of the current tile, that do not depend on the selected height and checks"""
+        if self.gauss_curv is None:  # e.g., tile results from the cache
+            return None
+        return {key: getattr(self, key) for key in _proxy_keys}
+
+    def _calc_proxies(self):
+        # np.savetxt('array_%d' % self.bathy_tile, self.bathy_values)
+        dtm_core = self.bathy_values[self.bathy_core]
+        with warnings.catch_warnings():  # empty or flat tile core
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            self.median = np.nanmedian(dtm_core)  # compute the median along a flattened version of the array
+            self.dtm_mean = np.nanmean(dtm_core, dtype=np.float64)
+            self.dtm_std = np.nanstd(dtm_core, dtype=np.float64)
+            self.dtm_mad = abs(self.median - self.dtm_mean)  # median absolute deviation to measure data variability
+            self.nmad = self.dtm_mad / self.dtm_std
+        # the gradients and the curvatures are calculated once, and then reused by the checks
+        self._calc_gaussian_curvatures()
+
+    def estimate_height_and_curv_th(self, proxies: Optional[dict] = None):
+        """Estimate height and curvature thresholds, reusing the passed proxies (if any) of the current tile"""
         # logger.info("estimation of flier heights ...")
 
         estimated_curv_th = 6.0
 
-        self.gy = None
-        self.gx = None
-        # logger.debug("dtm_mask: %s" % self.dtm_mask)
-        # np.savetxt('array_%d' % self.bathy_tile, self.dtm_mask)
-        self.median = np.ma.median(self.dtm_mask)  # compute the median along a flattened version of the array
-        self.dtm_mean = np.ma.mean(self.dtm_mask)
-        self.dtm_std = np.ma.std(self.dtm_mask)
-        self.dtm_mad = abs(self.median - self.dtm_mean)  # median absolute deviation to measure the data variability
-        self.nmad = self.dtm_mad / self.dtm_std
-        self._calc_gaussian_curvatures()
+        if proxies is None:
+            self._calc_proxies()
+        else:
+            self.__dict__.update(proxies)
 
         # noinspection PyStringFormat
         logger.debug("proxies -> median: %f, nmad: %f, std curv: %f" % (self.median, self.nmad, self.std_gauss_curv))
@@ -383,21 +600,16 @@ class FindFliersV9(BaseFliers):
         logger.info("estimated gaussian threshold: %.1f" % estimated_curv_th)
         self.cur_curv_th = estimated_curv_th
 
+    def _save_proxies(self):
         if self.save_proxies:
-            try:
-                self._save_proxies_as_geotiff()
-            except Exception as e:
-                logger.info("unable to save proxies geotiff: %s" % e)
+            self._write_debug_value(name="medians", value=self.median)
+            self._write_debug_value(name="nmads", value=self.nmad)
+            self._write_debug_value(name="std_gauss_curvs", value=self.std_gauss_curv)
+            self._write_debug_raster(name="gauss_curvs", array=self.gauss_curv)
         if self.save_heights:
-            try:
-                self._save_heights_as_geotiff()
-            except Exception as e:
-                logger.info("unable to save heights geotiff: %s" % e)
+            self._write_debug_value(name="th_heights", value=self.cur_height)
         if self.save_curvatures:
-            try:
-                self._save_curvatures_as_geotiff()
-            except Exception as e:
-                logger.info("unable to save curvatures geotiff: %s" % e)
+            self._write_debug_value(name="th_curvatures", value=self.cur_curv_th)
 
     # ###  CHECKS  ###
 
@@ -415,7 +627,7 @@ class FindFliersV9(BaseFliers):
         # plt.ion()
         # plt.figure()
         # plt.subplot(211)
-        # plt.imshow(self.dtm_mask, origin="lower")
+        # plt.imshow(self.bathy_values, origin="lower")
         # plt.colorbar()
         # plt.title("Elevation")
         # plt.subplot(212)
@@ -442,8 +654,7 @@ class FindFliersV9(BaseFliers):
 
         # logging.debug("*** CHECK #2: START ***")
 
-        self._calc_gaussian_curvatures()
-
+        # the gaussian curvatures are those calculated for the height estimation
         if self.bathy_is_double:
             check_gaussian_curvature_double(self.gauss_curv, self.flag_grid, self.cur_curv_th)
         else:
@@ -469,6 +680,29 @@ class FindFliersV9(BaseFliers):
             check_adjacent_cells_float(self.bathy_values, self.flag_grid, self.cur_height, 0.75, 0.8)
         # logging.debug("*** CHECK #3: END ***")
 
+    def _check_fused(self):
+        """Check the laplacian operator, the gaussian curvature and the adjacent cells in a single sweep"""
+
+        # logging.debug("*** CHECKS #1/2/3: START ***")
+
+        lap_th = 0.0
+        if self.check_laplacian:
+            lap_th = -4. * self.cur_height
+        adj_th = 0.0
+        if self.check_adjacent:
+            adj_th = self.cur_height
+
+        # the gaussian curvatures are those calculated for the height estimation
+        if self.bathy_is_double:
+            check_fused_double(self.bathy_values, self.gauss_curv, self.flag_grid,
+                               self.check_laplacian, lap_th, self.check_curv, self.cur_curv_th,
+                               self.check_adjacent, adj_th, 0.75, 0.8)
+        else:
+            check_fused_float(self.bathy_values, self.gauss_curv, self.flag_grid,
+                              self.check_laplacian, lap_th, self.check_curv, self.cur_curv_th,
+                              self.check_adjacent, adj_th, 0.75, 0.8)
+        # logging.debug("*** CHECKS #1/2/3: END ***")
+
     def _check_edges(self):
         """Check the edges"""
 
@@ -516,7 +750,7 @@ class FindFliersV9(BaseFliers):
 
     # ### FILTERING ###
 
-    def apply_filters(self, s57_list: list, distance=1.0, delta_z=0.01) -> bool:
+    def apply_filters(self, s57_list: list, distance=1.0, delta_z=0.01, s57_cache: Optional[S57Cache] = None) -> bool:
 
         logger.debug("filters -> distance: %s, delta_z: %s" % (distance, delta_z))
 
@@ -525,7 +759,7 @@ class FindFliersV9(BaseFliers):
             self._remove_designated(distance=distance, delta_z=delta_z)
 
         if self.filter_fff:
-            self._remove_fff(s57_list=s57_list, distance=distance, delta_z=delta_z)
+            self._remove_fff(s57_list=s57_list, distance=distance, delta_z=delta_z, s57_cache=s57_cache)
 
         return True
 
@@ -553,72 +787,66 @@ class FindFliersV9(BaseFliers):
     def _remove_designated(self, distance=1.0, delta_z=0.01):
         logger.debug("removing co-located designated soundings ...")
 
+        nr_designated = len(self.designated_soundings)
+        ft_xs = np.fromiter((designated.x for designated in self.designated_soundings), np.float64, nr_designated)
+        ft_ys = np.fromiter((designated.y for designated in self.designated_soundings), np.float64, nr_designated)
+        ft_zs = np.fromiter((designated.designated_depth for designated in self.designated_soundings), np.float64,
+                            nr_designated)
+        self._remove_colocated(ft_xs=ft_xs, ft_ys=ft_ys, ft_zs=ft_zs, distance=distance, delta_z=delta_z)
+
+    def _remove_colocated(self, ft_xs: np.ndarray, ft_ys: np.ndarray, ft_zs: np.ndarray,
+                          distance: float, delta_z: float) -> None:
+        """Remove the fliers within distance (in grid nodes) of a feature and not deeper than delta_z from it
+
+        The features (in grid CRS) are indexed in a KD-tree, and all the fliers are queried at once.
+        """
         grid_res = self.grids.cur_grids.bbox().res_x
         logger.debug("grid resolution: %.3f" % grid_res)
 
-        nr_initially_flagged = len(self.flagged_fliers)
+        fliers = self.fliers
+        nr_initially_flagged = len(fliers)
         logger.debug("initially flagged fliers: %d" % nr_initially_flagged)
+        logger.debug("co-located features: %d" % len(ft_xs))
+        if (nr_initially_flagged == 0) or (len(ft_xs) == 0):
+            return
 
-        fliers = list()
-        xs = list()
-        ys = list()
-        zs = list()
-        cks = list()
-
-        # for each flagged flier
-        for flg_idx, flg in enumerate(self.flagged_fliers):
-            flg = self.flagged_fliers[flg_idx]
-            flg_x = self.flagged_xs[flg_idx]
-            flg_y = self.flagged_ys[flg_idx]
-            flg_z = self.flagged_zs[flg_idx]
-            flg_ck = self.flagged_cks[flg_idx]
-            logger.debug("[%d/%d] (%.3f, %.3f, %.3f)" % (flg_idx, nr_initially_flagged, flg_x, flg_y, flg_z))
-
-            remove_flagged = False
-            nr_designated = len(self.designated_soundings)
-            # for each designated sounding
-            for des_idx, designated in enumerate(self.designated_soundings):
-
-                des_x = designated.x
-                des_y = designated.y
-                des_z = designated.designated_depth
-
-                dist = math.hypot(flg_x - des_x, flg_y - des_y)
-                if dist <= (grid_res * distance):
-                    d_z = flg_z - des_z
-                    if d_z <= delta_z:
-                        logger.debug("|-> [%d/%d] (%.3f, %.3f, %.3f) -> dist: %.3f, delta z: %.3f"
-                                     % (des_idx, nr_designated, des_x, des_y, des_z, dist, d_z))
-                        remove_flagged = True
-                        break
-
-            if remove_flagged:
-                continue
+        radius = grid_res * distance
+        tree = cKDTree(np.column_stack((ft_xs, ft_ys)))
+        # slightly enlarged radius, since the candidates are then checked with the same criterion as for each pair
+        candidates = tree.query_ball_point(np.column_stack((fliers['x'], fliers['y'])), r=radius * (1.0 + 1e-9))
+        nr_candidates = np.fromiter((len(cand) for cand in candidates), np.int64, nr_initially_flagged)
+        if nr_candidates.sum() == 0:
+            logger.debug("resulting flagged fliers: %d" % nr_initially_flagged)
+            return
 
-            fliers.append(flg)
-            xs.append(flg_x)
-            ys.append(flg_y)
-            zs.append(flg_z)
-            cks.append(flg_ck)
+        flg_idx = np.repeat(np.arange(nr_initially_flagged), nr_candidates)
+        ft_idx = np.fromiter((idx for cand in candidates for idx in cand), np.int64, nr_candidates.sum())
 
-        nr_resulting_flagged = len(fliers)
-        logger.debug("resulting flagged fliers: %d" % nr_resulting_flagged)
+        dist = np.hypot(fliers['x'][flg_idx] - ft_xs[ft_idx], fliers['y'][flg_idx] - ft_ys[ft_idx])
+        d_z = fliers['z'][flg_idx] - ft_zs[ft_idx]
+        colocated = (dist <= radius) & (d_z <= delta_z)
 
-        self.flagged_fliers = fliers
-        self.flagged_xs = xs
-        self.flagged_ys = ys
-        self.flagged_zs = zs
-        self.flagged_cks = cks
+        keep = np.ones(nr_initially_flagged, dtype=bool)
+        keep[flg_idx[colocated]] = False
+        for idx in np.flatnonzero(~keep):
+            logger.debug("|-> removed (%.3f, %.3f, %.3f)" % (fliers['x'][idx], fliers['y'][idx], fliers['z'][idx]))
+
+        self.fliers = fliers[keep]
+        nr_resulting_flagged = len(self.fliers)
+        logger.debug("resulting flagged fliers: %d" % nr_resulting_flagged)
 
     @classmethod
-    def _prepare_fff_list(cls, s57_path: str, s57_idx: int):
+    def _prepare_fff_list(cls, s57_path: str, s57_idx: int, s57_cache: Optional[S57Cache] = None):
         selected_features = list()
 
         # open the file
-        s57 = S57()
-        s57.set_input_filename(s57_path)
-        s57.read()
-        cur_s57 = s57.input_s57file
+        if s57_cache is not None:
+            cur_s57 = s57_cache.read(s57_path)
+        else:
+            s57 = S57()
+            s57.set_input_filename(s57_path)
+            s57.read()
+            cur_s57 = s57.input_s57file
 
         # retrieve all features
         all_features = cur_s57.rec10s
@@ -642,21 +870,9 @@ class FindFliersV9(BaseFliers):
 
         return selected_features
 
-    def _remove_fff(self, s57_list: list, distance=1.0, delta_z=0.01):
+    def _remove_fff(self, s57_list: list, distance=1.0, delta_z=0.01, s57_cache: Optional[S57Cache] = None):
         logger.debug("removing specific co-located FFF ...")
 
-        grid_res = self.grids.cur_grids.bbox().res_x
-        logger.debug("grid resolution: %.3f" % grid_res)
-
-        nr_initially_flagged = len(self.flagged_fliers)
-        logger.debug("initially flagged fliers: %d" % nr_initially_flagged)
-
-        fliers = list()
-        xs = list()
-        ys = list()
-        zs = list()
-        cks = list()
-
         # store the coordinate transform from geo to grid CRS (using GDAL)
         try:
             osr_grid = osr.SpatialReference()
@@ -678,263 +894,222 @@ class FindFliersV9(BaseFliers):
         except Exception as e:
             raise RuntimeError("unable to create a valid coords transform: %s" % e)
 
-        list_selected_features = list()
-        # for each S57 file
+        # first retrieve [long, lat, depth] for all the S57 files
+        fts_geo = list()
         for s57_idx, s57_path in enumerate(s57_list):
-            list_selected_features.append(self._prepare_fff_list(s57_path=s57_path, s57_idx=s57_idx))
-
-        # for each flagged flier
-        for flg_idx, flg in enumerate(self.flagged_fliers):
-            flg = self.flagged_fliers[flg_idx]
-            flg_x = self.flagged_xs[flg_idx]
-            flg_y = self.flagged_ys[flg_idx]
-            flg_z = self.flagged_zs[flg_idx]
-            flg_ck = self.flagged_cks[flg_idx]
-            logger.debug("[%d/%d] (%.3f, %.3f, %.3f)" % (flg_idx, nr_initially_flagged, flg_x, flg_y, flg_z))
-
-            remove_flagged = False
-            # for each S57 file
-            for selected_features in list_selected_features:
-
-                nr_selected_features = len(selected_features)
-
-                # first retrieve [long, lat, depth]
-                for ft_idx, feature in enumerate(selected_features):
-
-                    # manage soundings
-                    if len(feature.geo3s) != 0:
-
-                        # retrieve depth value
-                        for geo3_idx, geo3 in enumerate(feature.geo3s):
-
-                            try:
-                                # invert sign due to the CSAR/BAG convention (depths are negative)
-                                soundg_depth = -float(geo3.z)
-                                # logger.debug("[%d][%d] %s -> depth value: %f"
-                                #              % (ft_idx, geo3_idx, feature.acronym, soundg_depth))
-                            except Exception:
-                                logger.debug("[%d][%d] %s -> depth value: %s -> skip"
-                                             % (ft_idx, geo3_idx, feature.acronym, geo3.z))
-                                continue
-
-                            if soundg_depth is None:
-                                continue
-
-                            # append [long, lat, depth]
-                            soundg_geo = [[geo3.x, geo3.y, soundg_depth], ]
-                            soundg_utm = np.array(geo2loc.TransformPoints(np.array(soundg_geo, np.float64)),
-                                                  np.float64)
-
-                            ft_x = soundg_utm[0][0]
-                            ft_y = soundg_utm[0][1]
-                            ft_z = soundg_depth
-                            # logger.debug("  |-> [%d/%d] (%.3f, %.3f, %.3f)"
-                            #              % (ft_idx, nr_selected_features, ft_x, ft_y, ft_z))
-
-                            dist = math.hypot(flg_x - ft_x, flg_y - ft_y)
-                            if dist <= (grid_res * distance):
-                                d_z = flg_z - ft_z
-                                if d_z <= delta_z:
-                                    logger.debug("  |-> [%d/%d] (%.3f, %.3f, %.3f) -> dist: %.3f, delta z: %.3f"
-                                                 % (ft_idx, nr_selected_features, ft_x, ft_y, ft_z, dist, d_z))
-                                    remove_flagged = True
-                                    break
-
-                    # other features (no soundings)
-                    else:
-                        # retrieve depth value
-                        s57_valsou = None
-                        for attr in feature.attributes:
-
-                            if attr.acronym == 'VALSOU':
-                                try:
-                                    # invert sign due to the CSAR/BAG convention (depths are negative)
-                                    s57_valsou = -float(attr.value)
-                                    # logger.debug("[%d] %s -> VALSOU value: %f"
-                                    #              % (ft_idx, feature.acronym, s57_valsou))
-
-                                except Exception:
-                                    logger.debug("[%d] %s -> VALSOU value: %s -> skip"
-                                                 % (ft_idx, feature.acronym, attr.value))
-                                continue
-
-                        if s57_valsou is None:
-                            continue
-
-                        # append [long, lat, depth]
-                        valsou_geo = [[feature.centroid.x, feature.centroid.y, s57_valsou], ]
-                        valsou_utm = np.array(geo2loc.TransformPoints(np.array(valsou_geo, np.float64)),
-                                              np.float64)
-
-                        ft_x = valsou_utm[0][0]
-                        ft_y = valsou_utm[0][1]
-                        ft_z = s57_valsou
-                        # logger.debug("  |-> [%d/%d] (%.3f, %.3f, %.3f)"
-                        #              % (ft_idx, nr_selected_features, ft_x, ft_y, ft_z))
-
-                        dist = math.hypot(flg_x - ft_x, flg_y - ft_y)
-                        if dist <= (grid_res * distance):
-                            d_z = flg_z - ft_z
-                            if d_z <= delta_z:
-                                logger.debug("  |-> [%d/%d] (%.3f, %.3f, %.3f) -> dist: %.3f, delta z: %.3f"
-                                             % (ft_idx, nr_selected_features, ft_x, ft_y, ft_z, dist, d_z))
-                                remove_flagged = True
-                                break
-
-            if remove_flagged:
-                continue
-
-            fliers.append(flg)
-            xs.append(flg_x)
-            ys.append(flg_y)
-            zs.append(flg_z)
-            cks.append(flg_ck)
-
-        nr_resulting_flagged = len(fliers)
-        logger.debug("resulting flagged fliers: %d" % nr_resulting_flagged)
+            selected_features = self._prepare_fff_list(s57_path=s57_path, s57_idx=s57_idx, s57_cache=s57_cache)
+            fts_geo.extend(self._fff_positions(selected_features))
 
-        self.flagged_fliers = fliers
-        self.flagged_xs = xs
-        self.flagged_ys = ys
-        self.flagged_zs = zs
-        self.flagged_cks = cks
-
-    # ### OUTPUT ###
-
-    # rasters
-
-    def _save_bathy_as_xyz(self) -> None:
-        # logger.debug("saving geotiff for heights")
-
-        dtm_mask_path = os.path.join(self.output_folder, "%s.t%05d.bathy.xyz" % (self.basename, self.bathy_tile))
-        # logger.debug('saved DTM mask: %s' % dtm_mask_path)
-
-        np.savetxt(dtm_mask_path, self.dtm_mask, fmt='%7.3f')
-
-    def _save_bathy_as_geotiff(self) -> None:
-        # logger.debug("saving geotiff for bathys")
-
-        geotiff_path = os.path.join(self.output_folder, "%s.t%05d.bathy.tif" % (self.basename, self.bathy_tile))
-        # logger.debug("bathy output: %s" % bathy_path)
+        if len(fts_geo) == 0:
+            logger.debug("no FFF features with depth")
+            return
 
-        nodata = -9999.0
-        array = np.empty_like(self.dtm_mask, dtype=np.float32)
-        array[self.dtm_mask.mask] = nodata
-        array[~self.dtm_mask.mask] = self.dtm_mask
+        fts_geo = np.array(fts_geo, np.float64)
+        fts_utm = np.array(geo2loc.TransformPoints(fts_geo), np.float64)
+        self._remove_colocated(ft_xs=fts_utm[:, 0], ft_ys=fts_utm[:, 1], ft_zs=fts_geo[:, 2],
+                               distance=distance, delta_z=delta_z)
 
-        self._save_array_as_geotiff(geotiff_path=geotiff_path, array=array, nodata=nodata)
+    @classmethod
+    def _fff_positions(cls, selected_features: list) -> list:
+        """Retrieve [long, lat, depth] for the soundings and the features with VALSOU"""
+        positions = list()
 
-    def _save_proxies_as_geotiff(self) -> None:
-        # logger.debug("saving geotiff for heights")
+        for ft_idx, feature in enumerate(selected_features):
 
-        # median
+            # manage soundings
+            if len(feature.geo3s) != 0:
 
-        geotiff_path = os.path.join(self.output_folder, "%s.t%05d.medians.tif" % (self.basename, self.bathy_tile))
-        # logger.debug("heights output: %s" % geotiff_path)
+                # retrieve depth value
+                for geo3_idx, geo3 in enumerate(feature.geo3s):
 
-        nodata = -9999.0
-        array = np.empty_like(self.dtm_mask, dtype=np.float32)
-        array[self.dtm_mask.mask] = nodata
-        array[~self.dtm_mask.mask] = self.median
+                    try:
+                        # invert sign due to the CSAR/BAG convention (depths are negative)
+                        soundg_depth = -float(geo3.z)
+                        # logger.debug("[%d][%d] %s -> depth value: %f"
+                        #              % (ft_idx, geo3_idx, feature.acronym, soundg_depth))
+                    except Exception:
+                        logger.debug("[%d][%d] %s -> depth value: %s -> skip"
+                                     % (ft_idx, geo3_idx, feature.acronym, geo3.z))
+                        continue
 
-        self._save_array_as_geotiff(geotiff_path=geotiff_path, array=array, nodata=nodata)
+                    # append [long, lat, depth]
+                    positions.append([geo3.x, geo3.y, soundg_depth])
 
-        # nmad
+            # other features (no soundings)
+            else:
+                # retrieve depth value
+                s57_valsou = None
+                for attr in feature.attributes:
 
-        geotiff_path = os.path.join(self.output_folder, "%s.t%05d.nmads.tif" % (self.basename, self.bathy_tile))
-        # logger.debug("heights output: %s" % geotiff_path)
+                    if attr.acronym == 'VALSOU':
+                        try:
+                            # invert sign due to the CSAR/BAG convention (depths are negative)
+                            s57_valsou = -float(attr.value)
+                            # logger.debug("[%d] %s -> VALSOU value: %f"
+                            #              % (ft_idx, feature.acronym, s57_valsou))
 
-        nodata = -9999.0
-        array = np.empty_like(self.dtm_mask, dtype=np.float32)
-        array[self.dtm_mask.mask] = nodata
-        array[~self.dtm_mask.mask] = self.nmad
+                        except Exception:
+                            logger.debug("[%d] %s -> VALSOU value: %s -> skip"
+                                         % (ft_idx, feature.acronym, attr.value))
+                        continue
 
-        self._save_array_as_geotiff(geotiff_path=geotiff_path, array=array, nodata=nodata)
+                if s57_valsou is None:
+                    continue
 
-        # std gauss curv
+                # append [long, lat, depth]
+                positions.append([feature.centroid.x, feature.centroid.y, s57_valsou])
 
-        geotiff_path = os.path.join(self.output_folder,
-                                    "%s.t%05d.std_gauss_curvs.tif" % (self.basename, self.bathy_tile))
-        # logger.debug("heights output: %s" % geotiff_path)
+        return positions
 
-        nodata = -9999.0
-        array = np.empty_like(self.dtm_mask, dtype=np.float32)
-        array[self.dtm_mask.mask] = nodata
-        array[~self.dtm_mask.mask] = self.std_gauss_curv
+    # ### OUTPUT ###
 
-        self._save_array_as_geotiff(geotiff_path=geotiff_path, array=array, nodata=nodata)
+    # rasters
 
-        # gauss curv
+    def open_debug_rasters(self):
+        """Create the enabled debug rasters (one for each product, covering the whole grid)"""
+        self._debug_rasters = None
 
-        geotiff_path = os.path.join(self.output_folder, "%s.t%05d.gauss_curvs.tif" % (self.basename, self.bathy_tile))
-        # logger.debug("heights output: %s" % geotiff_path)
+        names = list()
+        if self.save_bathy:
+            names.append("bathy")
+        if self.save_proxies:
+            names.extend(["medians", "nmads", "std_gauss_curvs", "gauss_curvs"])
+        if self.save_heights:
+            names.append("th_heights")
+        if self.save_curvatures:
+            names.append("th_curvatures")
+        if len(names) == 0:
+            return
 
-        nodata = -9999.0
-        array = np.empty_like(self.dtm_mask, dtype=np.float32)
-        array[self.dtm_mask.mask] = nodata
-        array[~self.dtm_mask.mask] = self.gauss_curv[~self.dtm_mask.mask]
+        bbox = self.grids.cur_grids.bbox()
+        transform = [bbox.transform[0], bbox.transform[1], bbox.transform[2],
+                     bbox.transform[3], bbox.transform[4], bbox.transform[5], ]
+        self._debug_rasters = MosaicWriter()
+        for name in names:
+            geotiff_path = os.path.join(self.output_folder, "%s.%s.tif" % (self.basename, name))
+            try:
+                self._debug_rasters.add(name, RasterMosaic(path=geotiff_path, rows=int(bbox.rows),
+                                                           cols=int(bbox.cols), transform=transform, hrs=bbox.hrs,
+                                                           nodata=self.debug_nodata))
+            except Exception as e:
+                logger.info("unable to create %s raster: %s" % (name, e))
 
-        self._save_array_as_geotiff(geotiff_path=geotiff_path, array=array, nodata=nodata)
+    def close_debug_rasters(self):
+        """Wait for the pending writes, then finalize the debug rasters"""
+        if self._debug_rasters is None:
+            return
 
-    def _save_heights_as_geotiff(self) -> None:
-        # logger.debug("saving geotiff for heights")
+        self._debug_rasters.close()
+        self._debug_rasters = None
 
-        geotiff_path = os.path.join(self.output_folder, "%s.t%05d.th_heights.tif" % (self.basename, self.bathy_tile))
-        # logger.debug("heights output: %s" % geotiff_path)
+    def _write_debug_raster(self, name: str, array: np.ndarray) -> None:
+        """Queue the tile core of the passed array to be written in the named debug raster"""
+        if (self._debug_rasters is None) or (name not in self._debug_rasters):
+            return
 
-        nodata = -9999.0
-        array = np.empty_like(self.dtm_mask, dtype=np.float32)
-        array[self.dtm_mask.mask] = nodata
-        array[~self.dtm_mask.mask] = self.cur_height
+        core = array[self.bathy_core]
+        # a new array is created, since the writes happen in the background
+        values = np.where(np.isfinite(core), core, self.debug_nodata).astype(np.float32)
+        self._debug_rasters.write(name=name, array=values, transform=self.bathy_core_transform)
 
-        self._save_array_as_geotiff(geotiff_path=geotiff_path, array=array, nodata=nodata)
+    def _write_debug_value(self, name: str, value: Optional[float]) -> None:
+        """Queue the tile core, with the passed value for all the valid nodes, to be written in the named raster"""
+        if (self._debug_rasters is None) or (name not in self._debug_rasters):
+            return
 
-    def _save_curvatures_as_geotiff(self) -> None:
-        # logger.debug("saving geotiff for curvatures")
+        values = np.full((self.bathy_core.stop - self.bathy_core.start, self.bathy_values.shape[1]),
+                         self.debug_nodata, dtype=np.float32)
+        if value is not None:
+            values[self.dtm_valid[self.bathy_core]] = value
+        self._debug_rasters.write(name=name, array=values, transform=self.bathy_core_transform)
 
-        geotiff_path = os.path.join(self.output_folder, "%s.t%05d.th_curvatures.tif" % (self.basename, self.bathy_tile))
-        # logger.debug("heights output: %s" % geotiff_path)
+    def save_flags_as_geotiff(self, geotiff_path: str, block_size: int = 256) -> bool:
+        """Save the flagged fliers as a tiled, compressed GeoTIFF
 
-        nodata = -9999.0
-        array = np.empty_like(self.dtm_mask, dtype=np.float32)
-        array[self.dtm_mask.mask] = nodata
-        array[~self.dtm_mask.mask] = self.cur_curv_th
+        Each check is stored as a bit of the uint8 values (check #1 -> 1, check #2 -> 2, check #3 -> 4, etc.).
+        Only the blocks with flagged nodes are written.
+        """
+        if self.flags_extent is None:
+            logger.warning("no tiles to save as flags raster")
+            return False
 
-        self._save_array_as_geotiff(geotiff_path=geotiff_path, array=array, nodata=nodata)
+        x_min, y_min, x_max, y_max = self.flags_extent
+        res_x, res_y = self.flags_res
+        cols = int(round((x_max - x_min) / res_x)) + 1
+        rows = int(round((y_max - y_min) / res_y)) + 1
+        logger.debug("flags raster: %d x %d" % (rows, cols))
 
-    def _save_array_as_geotiff(self, geotiff_path: str, array: np.ndarray, nodata: float) -> None:
         driver = gdal.GetDriverByName('GTiff')
-        ds = driver.Create(geotiff_path, array.shape[1], array.shape[0], 1, gdal.GDT_Float32, )
+        ds = driver.Create(geotiff_path, cols, rows, 1, gdal.GDT_Byte,
+                           options=['TILED=YES', 'BLOCKXSIZE=%d' % block_size, 'BLOCKYSIZE=%d' % block_size,
+                                    'COMPRESS=DEFLATE', 'SPARSE_OK=TRUE'])
+        if ds is None:
+            raise RuntimeError("unable to create flags raster: %s" % geotiff_path)
         ds.SetProjection(self.bathy_hrs)
-        # logger.debug("transform: [%s, %s, %s, %s, %s, %s]"
-        #              % (self.bathy_transform[0], self.bathy_transform[1], self.bathy_transform[2],
-        #                 self.bathy_transform[3], self.bathy_transform[4], self.bathy_transform[5],))
-        ds.SetGeoTransform((self.bathy_transform[0] - self.bathy_transform[1] * 0.5,
-                            self.bathy_transform[1],
-                            self.bathy_transform[2],
-                            self.bathy_transform[3] - self.bathy_transform[5] * 0.5,
-                            self.bathy_transform[4],
-                            self.bathy_transform[5],))
-        ds.GetRasterBand(1).SetNoDataValue(nodata)
-        ds.GetRasterBand(1).WriteArray(array)
+        ds.SetGeoTransform((x_min - res_x * 0.5, res_x, 0.0, y_max + res_y * 0.5, 0.0, -res_y))
+        band = ds.GetRasterBand(1)
+        band.SetNoDataValue(0)
+        band.SetDescription("flier finder checks")
+        band.SetMetadata(dict(("BIT_%d" % (check - 1), "check #%d: %s" % (check, name))
+                              for check, name in fliers_checks.items()))
+
+        fliers = self.fliers
+        if len(fliers) > 0:
+            cs = np.clip(np.rint((fliers['x'] - x_min) / res_x).astype(np.int64), 0, cols - 1)
+            rs = np.clip(np.rint((y_max - fliers['y']) / res_y).astype(np.int64), 0, rows - 1)
+            bits = fliers['bits']
+
+            # group the flagged nodes by raster block
+            nr_block_cols = (cols + block_size - 1) // block_size
+            block_ids = (rs // block_size) * nr_block_cols + (cs // block_size)
+            order = np.argsort(block_ids, kind='stable')
+            block_ids, firsts = np.unique(block_ids[order], return_index=True)
+            lasts = np.append(firsts[1:], len(order))
+
+            for block_id, first, last in zip(block_ids, firsts, lasts):
+                r0 = (block_id // nr_block_cols) * block_size
+                c0 = (block_id % nr_block_cols) * block_size
+                block = np.zeros((min(block_size, rows - r0), min(block_size, cols - c0)), dtype=np.uint8)
+                idx = order[first:last]
+                np.bitwise_or.at(block, (rs[idx] - r0, cs[idx] - c0), bits[idx])
+                band.WriteArray(block, int(c0), int(r0))
+
         ds.FlushCache()
+        return True
 
     def _georef_fliers(self):
         """Helper function that looks at the flagged array and store the node != 0 as feature fliers"""
 
-        # selected holes
-        fliers_x = list()
-        fliers_y = list()
-        fliers_z = list()
-        fliers_ck = list()
-
         nz_y, nz_x = self.flag_grid.nonzero()
-        for i, x in enumerate(nz_x):
-            y = nz_y[i]
-            fliers_x.append(x)
-            fliers_y.append(y)
-            fliers_z.append(self.bathy_values[y, x])
-            fliers_ck.append(self.flag_grid[y, x])
+        if len(nz_x) == 0:
+            logger.info("No fliers detected in current slice, total fliers: %s" % len(self.fliers))
+            return
+
+        fliers = np.zeros(len(nz_x), dtype=flier_dtype)
+        t = self.bathy_transform
+        fliers['x'] = t[0] + nz_x * t[1] + nz_y * t[2]
+        fliers['y'] = t[3] + nz_x * t[4] + nz_y * t[5]
+        fliers['z'] = self.bathy_values[nz_y, nz_x]
+        fliers['bits'] = self.flag_grid[nz_y, nz_x]
+        fliers['check'] = _check_codes[fliers['bits']]
+
+        # convert flagged nodes to geographic coords
+        try:
+            lonlat = np.array(self._geo_transform().TransformPoints(np.column_stack((fliers['x'], fliers['y']))),
+                              np.float64)
+            fliers['lon'] = lonlat[:, 0]
+            fliers['lat'] = lonlat[:, 1]
+
+        except Exception as e:
+            raise RuntimeError("Unable to perform conversion of the flagged fliers to geographic: %s" % e)
+
+        self.append_fliers(fliers)
+        logger.info("Detected %s possible fliers (%d in current slice)" % (len(self.fliers), len(fliers)))
+
+    def _geo_transform(self) -> osr.CoordinateTransformation:
+        """Helper function that creates (once) the transform from the grid CRS to geographic WGS84"""
+        if self._loc2geo is not None:
+            return self._loc2geo
 
         GdalAux.check_gdal_data()
 
@@ -952,59 +1127,24 @@ class FindFliersV9(BaseFliers):
             osr_geo = osr.SpatialReference()
             osr_geo.ImportFromEPSG(4326)  # geographic WGS84
             osr_geo.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-            loc2geo = osr.CoordinateTransformation(osr_grid, osr_geo)
+            self._loc2geo = osr.CoordinateTransformation(osr_grid, osr_geo)
 
         except Exception as e:
             raise IOError("unable to create a valid coords transform: %s" % e)
 
-        if len(fliers_x) == 0:
-            logger.info("No fliers detected in current slice, total fliers: %s" % len(self.flagged_fliers))
-            return
+        return self._loc2geo
 
-        tile = self.grids.tiles[0]
 
-        flagged_xs = list()
-        flagged_ys = list()
-        flagged_zs = list()
-        flagged_cks = list()
-        for i, x in enumerate(fliers_x):
-            e = tile.convert_easting(int(x))
-            n = tile.convert_northing(int(fliers_y[i]))
-            z = fliers_z[i]
-            c = fliers_ck[i]
-            logger.debug("#%d: %.0f, %.0f -> %.2f %.2f %.2f : %d" % (i, x, fliers_y[i], e, n, z, c))
-            flagged_xs.append(e)
-            flagged_ys.append(n)
-            flagged_zs.append(z)
-            flagged_cks.append(c)
-
-        logger.info("Initial lists length: %s, %s, %s, %s"
-                    % (len(self.flagged_xs), len(self.flagged_ys), len(self.flagged_zs), len(self.flagged_cks)))
+# ### WORKER PROCESSES ###
 
-        # convert flagged nodes to geographic coords
-        try:
-            xs = np.array(flagged_xs)
-            ys = np.array(flagged_ys)
-            cks = np.array(flagged_cks)
-            # logger.debug("xs: %s" % xs)
-            # logger.debug("ys: %s" % ys)
-
-            # convert to geographic
-            lonlat = np.array(loc2geo.TransformPoints(np.vstack((xs, ys)).transpose()), np.float64)
-
-            # add checks
-            lonlat[:, 2] = cks
-            # store as list of list
-            self.flagged_fliers += lonlat.tolist()
-            self.flagged_xs += flagged_xs
-            self.flagged_ys += flagged_ys
-            self.flagged_zs += flagged_zs
-            self.flagged_cks += flagged_cks
-
-            logger.info("Detected %s possible fliers" % len(self.flagged_fliers))
-            logger.info("Resulting lists lengths: %s, %s, %s, %s"
-                        % (len(self.flagged_xs), len(self.flagged_ys), len(self.flagged_zs), len(self.flagged_cks)))
-            logger.debug(f"Flagged fliers: {self.flagged_fliers}")
+_tile_finder = None  # type: Optional[FindFliersV9]
 
-        except Exception as e:
-            raise RuntimeError("Unable to perform conversion of the flagged fliers to geographic: %s" % e)
+
+def _init_tile_worker(finder: FindFliersV9) -> None:
+    global _tile_finder
+    _tile_finder = finder
+
+
+def _find_fliers_in_tile(tile: DepthTile) -> dict:
+    _tile_finder._load_depths(tile=tile)
+    return _tile_finder._find_fliers()
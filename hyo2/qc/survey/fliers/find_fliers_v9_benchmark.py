@@ -0,0 +1,198 @@
+"""Benchmark and accuracy suite of the flier finder v9 on seeded synthetic DTMs
+
+Usage example:
+    python -m hyo2.qc.survey.fliers.find_fliers_v9_benchmark --sizes 256 1024 --json results.json
+    python -m hyo2.qc.survey.fliers.find_fliers_v9_benchmark --compare results.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+
+import numpy as np
+
+from hyo2.qc.survey.fliers.find_fliers_v9 import FindFliersV9
+from hyo2.qc.survey.fliers.halo_tiles import DepthTile
+from hyo2.qc.survey.fliers.synthetic_dtm import inject_spikes, score_flags, surface_kinds, synthetic_surface
+
+logger = logging.getLogger(__name__)
+
+_all_checks = ("check_laplacian", "check_curv", "check_adjacent", "check_slivers", "check_isolated", "check_edges",
+               "check_margins")
+
+# name -> (enabled checks, fused checks #1 to #3)
+benchmark_configs = {
+    "chk1": ((1,), False),
+    "chk2": ((2,), False),
+    "chk3": ((3,), False),
+    "chk4": ((4,), False),
+    "chk5": ((5,), False),
+    "chk6": ((6,), False),
+    "chk7": ((7,), False),
+    "seq123": ((1, 2, 3), False),
+    "fused123": ((1, 2, 3), True),
+    "all": ((1, 2, 3, 4, 5, 6, 7), True),
+}
+
+
+def _make_finder(checks: tuple, fused: bool, height: Optional[float], output_folder: str) -> FindFliersV9:
+    kwargs = dict((name, (idx + 1) in checks) for idx, name in enumerate(_all_checks))
+    finder = FindFliersV9(grids=None, height=height, output_folder=output_folder, **kwargs)
+    finder.fused_checks = fused
+    return finder
+
+
+def _find_fliers(finder: FindFliersV9, tile: DepthTile) -> np.ndarray:
+    finder._load_depths(tile=tile)
+    results = finder._find_fliers()
+    return results['flag_grid']
+
+
+def run_case(kind: str, size: int, dtype, config: str, height: Optional[float] = 1.0, spike_height: float = 2.0,
+             nr_spikes: int = 0, repeats: int = 3, seed: int = 0, output_folder: Optional[str] = None) -> dict:
+    """Run a configuration on a synthetic surface, returning timing, peak memory and accuracy"""
+    checks, fused = benchmark_configs[config]
+
+    surface = synthetic_surface(kind=kind, rows=size, cols=size, seed=seed, dtype=dtype)
+    if nr_spikes <= 0:
+        nr_spikes = max(1, (size * size) // 1024)
+    spiked, spike_r, spike_c = inject_spikes(surface, nr_spikes=nr_spikes, height=spike_height, seed=seed + 1)
+    tile = DepthTile(values=spiked, is_double=(np.dtype(dtype) == np.float64),
+                     transform=[0.0, 1.0, 0.0, 0.0, 0.0, 1.0], hrs="")
+
+    if output_folder is None:
+        output_folder = tempfile.gettempdir()
+    finder = _make_finder(checks=checks, fused=fused, height=height, output_folder=output_folder)
+
+    # timing (best of the repeats)
+    elapsed = list()
+    flag_grid = None
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter()
+        flag_grid = _find_fliers(finder=finder, tile=tile)
+        elapsed.append(time.perf_counter() - start)
+    best = min(elapsed)
+
+    # peak memory (in a separate run, since tracing slows down the allocations)
+    tracemalloc.start()
+    _find_fliers(finder=finder, tile=tile)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'kind': kind,
+        'size': size,
+        'dtype': np.dtype(dtype).name,
+        'config': config,
+        'seconds': best,
+        'nodes_per_second': (size * size) / best if best > 0 else float('inf'),
+        'peak_mb': peak / (1024 * 1024),
+        'flags_hash': hashlib.blake2b(np.ascontiguousarray(flag_grid).data, digest_size=8).hexdigest(),
+        'per_check': dict(),
+    }
+    result.update(score_flags(flag_grid != 0, spike_r, spike_c))
+    for check in checks:
+        result['per_check'][str(check)] = score_flags(flag_grid & (1 << (check - 1)), spike_r, spike_c)
+    return result
+
+
+def run_suite(kinds: List[str], sizes: List[int], dtypes: List[str], configs: List[str], repeats: int = 3,
+              height: Optional[float] = 1.0, spike_height: float = 2.0, seed: int = 0) -> List[dict]:
+    results = list()
+    with tempfile.TemporaryDirectory() as output_folder:
+        for kind in kinds:
+            for size in sizes:
+                for dtype in dtypes:
+                    for config in configs:
+                        result = run_case(kind=kind, size=size, dtype=np.dtype(dtype), config=config, height=height,
+                                          spike_height=spike_height, repeats=repeats, seed=seed,
+                                          output_folder=output_folder)
+                        logger.info("%s" % format_result(result))
+                        results.append(result)
+    return results
+
+
+def format_result(result: dict) -> str:
+    return "%-6s %5d %-7s %-8s | %8.3f s | %10.0f nodes/s | %7.1f MB | recall: %.3f (%d/%d), false pos.: %d" \
+           % (result['kind'], result['size'], result['dtype'], result['config'], result['seconds'],
+              result['nodes_per_second'], result['peak_mb'], result['recall'], result['detected'], result['spikes'],
+              result['false_positives'])
+
+
+def check_consistency(results: List[dict]) -> List[str]:
+    """Check that the fused and the sequential checks #1 to #3 flag the same nodes"""
+    issues = list()
+    seq = dict(((r['kind'], r['size'], r['dtype']), r['flags_hash']) for r in results if r['config'] == "seq123")
+    for r in results:
+        if r['config'] != "fused123":
+            continue
+        key = (r['kind'], r['size'], r['dtype'])
+        if (key in seq) and (seq[key] != r['flags_hash']):
+            issues.append("fused and sequential checks differ: %s %d %s" % key)
+    return issues
+
+
+def compare_results(results: List[dict], baseline: List[dict], max_slowdown: float = 0.2) -> List[str]:
+    """Compare with a baseline run, returning the detection changes and the performance regressions"""
+    issues = list()
+    ref = dict(((r['kind'], r['size'], r['dtype'], r['config']), r) for r in baseline)
+    for r in results:
+        key = (r['kind'], r['size'], r['dtype'], r['config'])
+        if key not in ref:
+            continue
+        if r['flags_hash'] != ref[key]['flags_hash']:
+            issues.append("detections changed: %s %d %s %s (flagged: %d -> %d)"
+                          % (key + (ref[key]['flagged'], r['flagged'])))
+        if r['nodes_per_second'] < (1.0 - max_slowdown) * ref[key]['nodes_per_second']:
+            issues.append("slower: %s %d %s %s (%.0f -> %.0f nodes/s)"
+                          % (key + (ref[key]['nodes_per_second'], r['nodes_per_second'])))
+    return issues
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Flier finder v9 benchmark on synthetic DTMs",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--kinds', nargs='+', default=list(surface_kinds), choices=surface_kinds)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[256, 1024])
+    parser.add_argument('--dtypes', nargs='+', default=["float32", "float64"], choices=["float32", "float64"])
+    parser.add_argument('--configs', nargs='+', default=list(benchmark_configs.keys()),
+                        choices=list(benchmark_configs.keys()))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--height', type=float, default=1.0, help='Flier height passed to the checks.')
+    parser.add_argument('--spike_height', type=float, default=2.0, help='Height of the injected spikes.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=str, default=None, help='Save the results as JSON (e.g., as a baseline).')
+    parser.add_argument('--compare', type=str, default=None, help='Compare with a JSON baseline.')
+    parser.add_argument('--max_slowdown', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # the kernels log each flagged node
+    logging.getLogger("hyo2.qc.survey.fliers").setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    results = run_suite(kinds=args.kinds, sizes=args.sizes, dtypes=args.dtypes, configs=args.configs,
+                        repeats=args.repeats, height=args.height, spike_height=args.spike_height, seed=args.seed)
+
+    issues = check_consistency(results)
+
+    if args.json is not None:
+        with open(args.json, "w") as fod:
+            json.dump(results, fod, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as fid:
+            issues.extend(compare_results(results, json.load(fid), max_slowdown=args.max_slowdown))
+
+    for issue in issues:
+        logger.warning(issue)
+    return 1 if len(issues) > 0 else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,163 @@
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List
+
+from hyo2.qc.survey.fliers.find_fliers_v9 import FindFliersV9
+from hyo2.qc.survey.fliers.halo_tiles import DepthTile, HaloTiles
+
+logger = logging.getLogger(__name__)
+
+# check number -> FindFliersV9 parameter
+sweep_checks = {
+    1: "check_laplacian",
+    2: "check_curv",
+    3: "check_adjacent",
+    4: "check_slivers",
+    5: "check_isolated",
+    6: "check_edges",
+    7: "check_margins",
+}
+
+# filter number -> FindFliersV9 parameter
+sweep_filters = {
+    1: "filter_fff",
+    2: "filter_designated",
+}
+
+
+def parse_sweep_config(config: str) -> dict:
+    """Parse a sweep configuration as 'height:checks:filters' (e.g., '1.5:1235:2' or 'auto:23:')"""
+    tokens = config.split(':')
+    if len(tokens) not in (2, 3):
+        raise RuntimeError("invalid sweep configuration: %s" % config)
+
+    parsed = dict()
+
+    if tokens[0].strip().lower() in ("", "auto"):
+        parsed['height'] = None
+    else:
+        try:
+            parsed['height'] = float(tokens[0])
+        except ValueError:
+            raise RuntimeError("invalid height in sweep configuration: %s" % config)
+        if parsed['height'] <= 0.0:
+            raise RuntimeError("invalid height in sweep configuration: %s" % config)
+
+    for name in sweep_checks.values():
+        parsed[name] = False
+    for token in tokens[1].strip():
+        if not token.isdigit() or (int(token) not in sweep_checks):
+            raise RuntimeError("invalid check '%s' in sweep configuration: %s" % (token, config))
+        parsed[sweep_checks[int(token)]] = True
+
+    for name in sweep_filters.values():
+        parsed[name] = False
+    if len(tokens) == 3:
+        for token in tokens[2].strip():
+            if not token.isdigit() or (int(token) not in sweep_filters):
+                raise RuntimeError("invalid filter '%s' in sweep configuration: %s" % (token, config))
+            parsed[sweep_filters[int(token)]] = True
+
+    return parsed
+
+
+class FindFliersV9Sweep:
+    """Run several flier finder configurations on the same grid, reading each tile only once
+
+    The proxies and the derived surfaces (gradients and curvatures) of each tile are calculated by the first
+    configuration, and then reused by the others. Each configuration collects its own fliers.
+    """
+
+    def __init__(self, finders: List[FindFliersV9]) -> None:
+        if len(finders) == 0:
+            raise RuntimeError("missing configurations to sweep")
+
+        for finder in finders[1:]:
+            if finder.grids is not finders[0].grids:
+                raise RuntimeError("the configurations to sweep must share the same grids")
+            if (finder.halo != finders[0].halo) or (finder.workers != finders[0].workers):
+                raise RuntimeError("the configurations to sweep must share halo and workers")
+
+        self.finders = finders  # type: List[FindFliersV9]
+
+    @property
+    def halo(self) -> int:
+        return self.finders[0].halo
+
+    @property
+    def workers(self) -> int:
+        return self.finders[0].workers
+
+    def run(self):
+        logger.info("sweep of %d configurations: %s"
+                    % (len(self.finders), ", ".join([finder.basename for finder in self.finders])))
+
+        for finder in self.finders:
+            finder.bathy_tile = 0
+            if self.workers == 1:
+                finder.open_tile_cache()
+            finder.open_debug_rasters()
+        try:
+            tiles = HaloTiles(read_tile=self.finders[0]._read_depth_tile, halo=self.halo)
+            if self.workers > 1:
+                self._run_parallel(tiles=tiles)
+            else:
+                for tile in tiles:
+                    self._run_slice(tile=tile)
+
+        finally:
+            for finder in self.finders:
+                finder.close_debug_rasters()
+        self.finders[0].grids.clear_tiles()
+        for finder in self.finders:
+            finder.close_tile_cache()
+
+    def _run_slice(self, tile: DepthTile) -> None:
+        proxies = None
+        for finder in self.finders:
+            results = finder._run_slice(tile=tile, proxies=proxies)
+            if (proxies is None) and (len(results) > 0):
+                proxies = finder.proxies
+            finder.bathy_tile += 1
+
+    def _run_parallel(self, tiles: HaloTiles):
+        """Run the configurations on a pool of worker processes, then collect the flags in the tiles order"""
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_sweep_worker,
+                                 initargs=(self.finders,)) as executor:
+            for tile in tiles:
+                pending.append((tile, executor.submit(_sweep_tile, tile)))
+
+                # limit the number of tiles kept in memory
+                if len(pending) >= 2 * self.workers:
+                    self._collect_slice(*pending.popleft())
+
+            while len(pending) > 0:
+                self._collect_slice(*pending.popleft())
+
+    def _collect_slice(self, tile: DepthTile, future: Future):
+        for finder, results in zip(self.finders, future.result()):
+            finder._run_slice(tile=tile, results=results)
+            finder.bathy_tile += 1
+
+
+# the configurations used by a worker process (set once, when the process starts)
+_sweep_finders = list()  # type: List[FindFliersV9]
+
+
+def _init_sweep_worker(finders: List[FindFliersV9]) -> None:
+    global _sweep_finders
+    _sweep_finders = finders
+
+
+def _sweep_tile(tile: DepthTile) -> List[dict]:
+    proxies = None
+    sweep_results = list()
+    for finder in _sweep_finders:
+        finder._load_depths(tile=tile)
+        results = finder._find_fliers(proxies=proxies)
+        if (proxies is None) and (len(results) > 0):
+            proxies = finder.proxies
+        sweep_results.append(results)
+    return sweep_results
@@ -0,0 +1,112 @@
+import logging
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class DepthTile:
+    """Depth values of a grid tile, detached from the grids library
+
+    The rows in [core.start, core.stop) belong to the tile, the other rows (if any) form the halo
+    borrowed from the adjacent tiles.
+    """
+
+    def __init__(self, values: np.ndarray, is_double: bool, transform: List[float], hrs: str,
+                 core: Optional[slice] = None) -> None:
+        self.values = values
+        self.is_double = is_double  # type: bool
+        self.transform = transform  # type: List[float]
+        self.hrs = hrs  # type: str
+        if core is None:
+            core = slice(0, values.shape[0])
+        self.core = core  # type: slice
+
+    @property
+    def rows(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def cols(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def core_transform(self) -> List[float]:
+        """Geotransform of the first node of the tile core"""
+        return [self.transform[0] + self.core.start * self.transform[2], self.transform[1], self.transform[2],
+                self.transform[3] + self.core.start * self.transform[5], self.transform[4], self.transform[5], ]
+
+    def is_followed_by(self, other: 'DepthTile') -> bool:
+        """Check whether the other tile starts right after the last row of this tile"""
+        if self.cols != other.cols:
+            return False
+
+        for idx in range(6):
+            if idx in (0, 3):
+                continue
+            if self.transform[idx] != other.transform[idx]:
+                return False
+
+        next_x = self.transform[0] + self.rows * self.transform[2]
+        next_y = self.transform[3] + self.rows * self.transform[5]
+        return (abs(other.transform[0] - next_x) < abs(self.transform[1]) / 2.0) and \
+               (abs(other.transform[3] - next_y) < abs(self.transform[5]) / 2.0)
+
+
+class HaloTiles:
+    """Iterate over the tiles of a grid, extending each of them with a halo of rows from the adjacent tiles
+
+    The halo is only borrowed from tiles that share the same columns and are contiguous by rows.
+    In all the other cases, the tile is provided without halo on that side.
+    """
+
+    def __init__(self, read_tile: Callable[[], Optional[DepthTile]], halo: int = 0) -> None:
+        if halo < 0:
+            raise RuntimeError("invalid halo: %s" % halo)
+
+        self._read_tile = read_tile
+        self.halo = halo  # type: int
+
+    def __iter__(self) -> Iterator[DepthTile]:
+        if self.halo == 0:
+            tile = self._read_tile()
+            while tile is not None:
+                yield tile
+                tile = self._read_tile()
+            return
+
+        prev_tile = None
+        cur_tile = self._read_tile()
+        while cur_tile is not None:
+            next_tile = self._read_tile()
+            yield self._extend(prev_tile=prev_tile, cur_tile=cur_tile, next_tile=next_tile)
+            prev_tile = cur_tile
+            cur_tile = next_tile
+
+    def _extend(self, prev_tile: Optional[DepthTile], cur_tile: DepthTile,
+                next_tile: Optional[DepthTile]) -> DepthTile:
+
+        parts = list()
+        top = 0
+        if (prev_tile is not None) and prev_tile.is_followed_by(cur_tile):
+            top = min(self.halo, prev_tile.rows)
+            parts.append(prev_tile.values[prev_tile.rows - top:])
+
+        parts.append(cur_tile.values)
+
+        bottom = 0
+        if (next_tile is not None) and cur_tile.is_followed_by(next_tile):
+            bottom = min(self.halo, next_tile.rows)
+            parts.append(next_tile.values[:bottom])
+
+        logger.debug("halo rows -> top: %d, bottom: %d" % (top, bottom))
+        if len(parts) == 1:
+            return cur_tile
+
+        transform = [cur_tile.transform[0] - top * cur_tile.transform[2], cur_tile.transform[1],
+                     cur_tile.transform[2], cur_tile.transform[3] - top * cur_tile.transform[5],
+                     cur_tile.transform[4], cur_tile.transform[5], ]
+
+        return DepthTile(values=np.vstack(parts), is_double=cur_tile.is_double, transform=transform,
+                         hrs=cur_tile.hrs, core=slice(top, top + cur_tile.rows))
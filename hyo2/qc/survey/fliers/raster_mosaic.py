@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from osgeo import gdal
+
+logger = logging.getLogger(__name__)
+
+
+class RasterMosaic:
+    """Single-band, tiled and compressed GeoTIFF covering the whole grid, and filled tile by tile
+
+    The transform is the one of the grid nodes (the GeoTIFF is shifted by half a cell).
+    """
+
+    def __init__(self, path: str, rows: int, cols: int, transform: List[float], hrs: str,
+                 nodata: float = -9999.0, block_size: int = 256) -> None:
+        self.path = path  # type: str
+        self.rows = rows  # type: int
+        self.cols = cols  # type: int
+        self.transform = transform  # type: List[float]
+        self.block_size = block_size  # type: int
+
+        driver = gdal.GetDriverByName('GTiff')
+        self._ds = driver.Create(path, cols, rows, 1, gdal.GDT_Float32,
+                                 options=['TILED=YES', 'BLOCKXSIZE=%d' % block_size, 'BLOCKYSIZE=%d' % block_size,
+                                          'COMPRESS=DEFLATE', 'PREDICTOR=3', 'SPARSE_OK=TRUE', 'BIGTIFF=IF_SAFER'])
+        if self._ds is None:
+            raise RuntimeError("unable to create raster: %s" % path)
+        self._ds.SetProjection(hrs)
+        self._ds.SetGeoTransform((transform[0] - transform[1] * 0.5, transform[1], transform[2],
+                                  transform[3] - transform[5] * 0.5, transform[4], transform[5],))
+        self._band = self._ds.GetRasterBand(1)
+        self._band.SetNoDataValue(nodata)
+
+    def offsets(self, transform: List[float]) -> Optional[tuple]:
+        """Return the row and column offsets of a tile with the passed transform (None if not aligned)"""
+        if (transform[1] != self.transform[1]) or (transform[5] != self.transform[5]):
+            return None
+
+        row_off = int(round((transform[3] - self.transform[3]) / self.transform[5]))
+        col_off = int(round((transform[0] - self.transform[0]) / self.transform[1]))
+        return row_off, col_off
+
+    def write(self, array: np.ndarray, row_off: int, col_off: int) -> None:
+        # clip the array to the raster
+        r0 = max(0, -row_off)
+        c0 = max(0, -col_off)
+        r1 = min(array.shape[0], self.rows - row_off)
+        c1 = min(array.shape[1], self.cols - col_off)
+        if (r1 <= r0) or (c1 <= c0):
+            logger.warning("tile outside of %s: %d, %d" % (self.path, row_off, col_off))
+            return
+
+        self._band.WriteArray(array[r0:r1, c0:c1], col_off + c0, row_off + r0)
+
+    def close(self, overviews: bool = True) -> None:
+        if self._ds is None:
+            return
+
+        if overviews:
+            levels = list()
+            level = 2
+            while (min(self.rows, self.cols) // level) >= self.block_size:
+                levels.append(level)
+                level *= 2
+            if len(levels) > 0:
+                self._ds.BuildOverviews("AVERAGE", levels)
+
+        self._ds.FlushCache()
+        self._band = None
+        self._ds = None
+
+
+class MosaicWriter:
+    """Write the tiles of several raster mosaics from a background thread
+
+    The queue of tiles to write is bounded, so that the memory is limited when the disk is slower than the search.
+    """
+
+    def __init__(self, max_queued: int = 8) -> None:
+        self._mosaics = dict()  # type: Dict[str, RasterMosaic]
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = threading.Thread(target=self._run, name="MosaicWriter", daemon=True)
+        self._thread.start()
+
+    def add(self, name: str, mosaic: RasterMosaic) -> None:
+        self._mosaics[name] = mosaic
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._mosaics
+
+    def write(self, name: str, array: np.ndarray, transform: List[float]) -> None:
+        """Queue the array (that must not be modified afterwards) to be written at the passed transform"""
+        offsets = self._mosaics[name].offsets(transform)
+        if offsets is None:
+            logger.warning("tile not aligned with %s -> skipped" % self._mosaics[name].path)
+            return
+        self._queue.put((name, array, offsets[0], offsets[1]))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            name, array, row_off, col_off = item
+            try:
+                self._mosaics[name].write(array=array, row_off=row_off, col_off=col_off)
+            except Exception as e:
+                logger.warning("unable to write tile to %s: %s" % (self._mosaics[name].path, e))
+
+    def close(self) -> None:
+        """Wait for the queued tiles, then finalize the mosaics (with overviews)"""
+        self._queue.put(None)
+        self._thread.join()
+
+        for mosaic in self._mosaics.values():
+            try:
+                mosaic.close()
+            except Exception as e:
+                logger.warning("unable to finalize %s: %s" % (mosaic.path, e))
+        self._mosaics.clear()
@@ -0,0 +1,109 @@
+import logging
+from typing import Tuple
+
+import numpy as np
+from scipy import ndimage
+
+logger = logging.getLogger(__name__)
+
+surface_kinds = ("slope", "rough", "holes", "edges")
+
+
+def synthetic_surface(kind: str, rows: int, cols: int, seed: int = 0, dtype=np.float32,
+                      depth: float = -30.0) -> np.ndarray:
+    """Create a seeded synthetic DTM (negative depths, NaN for the void nodes)
+
+    - slope: a smooth tilted plane
+    - rough: a tilted plane with a rough seafloor
+    - holes: a rough seafloor with void disks
+    - edges: a rough seafloor within a swath with ragged edges
+    """
+    if kind not in surface_kinds:
+        raise RuntimeError("unknown surface kind: %s" % kind)
+
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:rows, 0:cols]
+    surface = depth + 0.02 * xs - 0.01 * ys
+
+    if kind != "slope":
+        surface += ndimage.gaussian_filter(rng.normal(0.0, 1.0, (rows, cols)), sigma=3.0) * 4.0
+        surface += rng.normal(0.0, 0.03, (rows, cols))
+
+    if kind == "holes":
+        nr_holes = max(1, (rows * cols) // 2500)
+        centers_r = rng.integers(0, rows, nr_holes)
+        centers_c = rng.integers(0, cols, nr_holes)
+        radii = rng.uniform(1.5, 6.0, nr_holes)
+        for r, c, radius in zip(centers_r, centers_c, radii):
+            r0, r1 = max(0, int(r - radius)), min(rows, int(r + radius) + 1)
+            c0, c1 = max(0, int(c - radius)), min(cols, int(c + radius) + 1)
+            disk = (ys[r0:r1, c0:c1] - r) ** 2 + (xs[r0:r1, c0:c1] - c) ** 2 <= radius ** 2
+            surface[r0:r1, c0:c1][disk] = np.nan
+
+    elif kind == "edges":
+        # the swath limits are random walks along the columns
+        top = rows * 0.15 + np.cumsum(rng.normal(0.0, 1.0, cols))
+        bottom = rows * 0.85 + np.cumsum(rng.normal(0.0, 1.0, cols))
+        surface[(ys < top[np.newaxis, :]) | (ys > bottom[np.newaxis, :])] = np.nan
+
+    return surface.astype(dtype)
+
+
+def inject_spikes(surface: np.ndarray, nr_spikes: int, height: float, seed: int = 0,
+                  spacing: int = 8) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Add spikes of the passed height (alternating shoal and deep) at isolated nodes with valid neighbors
+
+    Return the spiked surface and the rows and columns of the spikes.
+    """
+    rng = np.random.default_rng(seed)
+
+    # candidates on a lattice, so that the spikes do not interact
+    half = spacing // 2
+    cand_r, cand_c = np.mgrid[half:surface.shape[0] - half:spacing, half:surface.shape[1] - half:spacing]
+    cand_r = cand_r.ravel()
+    cand_c = cand_c.ravel()
+
+    # only nodes with a fully valid neighborhood
+    valid = ndimage.binary_erosion(np.isfinite(surface), structure=np.ones((5, 5), dtype=bool))
+    keep = valid[cand_r, cand_c]
+    cand_r = cand_r[keep]
+    cand_c = cand_c[keep]
+
+    if nr_spikes > len(cand_r):
+        logger.info("only %d spikes can be injected (instead of %d)" % (len(cand_r), nr_spikes))
+        nr_spikes = len(cand_r)
+
+    selected = np.sort(rng.choice(len(cand_r), size=nr_spikes, replace=False))
+    spike_r = cand_r[selected]
+    spike_c = cand_c[selected]
+    signs = np.where(np.arange(nr_spikes) % 2 == 0, 1.0, -1.0)
+
+    spiked = surface.copy()
+    spiked[spike_r, spike_c] += (signs * height).astype(surface.dtype)
+    return spiked, spike_r, spike_c
+
+
+def score_flags(flagged: np.ndarray, spike_r: np.ndarray, spike_c: np.ndarray, tolerance: int = 1) -> dict:
+    """Score the flagged nodes against the injected spikes
+
+    A spike is detected when its node is flagged. A flagged node is a false positive when farther than
+    the tolerance (in nodes) from all the spikes.
+    """
+    flagged = flagged.astype(bool)
+
+    truth = np.zeros(flagged.shape, dtype=bool)
+    truth[spike_r, spike_c] = True
+    if tolerance > 0:
+        near_truth = ndimage.binary_dilation(truth, structure=np.ones((3, 3), dtype=bool), iterations=tolerance)
+    else:
+        near_truth = truth
+
+    detected = int(np.count_nonzero(flagged[spike_r, spike_c]))
+    nr_spikes = len(spike_r)
+    return {
+        'spikes': nr_spikes,
+        'detected': detected,
+        'recall': detected / nr_spikes if nr_spikes > 0 else float('nan'),
+        'flagged': int(np.count_nonzero(flagged)),
+        'false_positives': int(np.count_nonzero(flagged & ~near_truth)),
+    }
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+
+from hyo2.qc.survey.fliers.halo_tiles import DepthTile
+
+logger = logging.getLogger(__name__)
+
+
+class TileCache:
+    """Cache of the flags found in each tile, keyed by a fingerprint of the depths and of the check parameters
+
+    Each entry is a small .npz file (named by its fingerprint) with the flagged nodes and the tile proxies.
+    The entries that are not used by a run are removed by prune().
+    """
+
+    version = 1  # type: int
+    # the results that are restored from the cache (flag_grid is stored as flagged nodes)
+    scalar_keys = ('cur_height', 'cur_curv_th', 'median', 'nmad', 'std_gauss_curv', 'dtm_mean', 'dtm_std', 'dtm_mad')
+
+    def __init__(self, cache_folder: str, params: dict) -> None:
+        if not os.path.exists(cache_folder):
+            os.makedirs(cache_folder)
+        self.cache_folder = cache_folder  # type: str
+        self._params = json.dumps(params, sort_keys=True)  # type: str
+        self._used = set()  # type: set
+        self.hits = 0  # type: int
+        self.misses = 0  # type: int
+
+    def fingerprint(self, tile: DepthTile) -> str:
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(("%d|%s|%s|%s|%s|%s" % (self.version, self._params, tile.values.shape, tile.values.dtype,
+                                              tile.transform, (tile.core.start, tile.core.stop))).encode('utf-8'))
+        hasher.update(np.ascontiguousarray(tile.values).data)
+        return hasher.hexdigest()
+
+    def _entry_path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_folder, "%s.npz" % fingerprint)
+
+    def read(self, fingerprint: str, shape: tuple) -> Optional[dict]:
+        """Return the cached results for the fingerprint (None if missing)"""
+        self._used.add(fingerprint)
+
+        entry_path = self._entry_path(fingerprint)
+        if not os.path.exists(entry_path):
+            self.misses += 1
+            return None
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as npz:
+                flag_grid = np.zeros(shape, dtype=np.uint8)
+                flag_grid[npz['rows'], npz['cols']] = npz['bits']
+                results = json.loads(str(npz['scalars']))
+
+        except Exception as e:
+            logger.info("unable to read the cached tile %s: %s" % (fingerprint, e))
+            self.misses += 1
+            return None
+
+        results['flag_grid'] = flag_grid
+        self.hits += 1
+        return results
+
+    def write(self, fingerprint: str, results: dict) -> None:
+        self._used.add(fingerprint)
+        if len(results) == 0:
+            return
+
+        rows, cols = results['flag_grid'].nonzero()
+        scalars = dict()
+        for key in self.scalar_keys:
+            value = results[key]
+            scalars[key] = None if value is None else float(value)
+
+        entry_path = self._entry_path(fingerprint)
+        tmp_path = entry_path + ".tmp.npz"
+        try:
+            np.savez(tmp_path, rows=rows.astype(np.uint32), cols=cols.astype(np.uint32),
+                     bits=results['flag_grid'][rows, cols], scalars=np.array(json.dumps(scalars)))
+            os.replace(tmp_path, entry_path)
+
+        except Exception as e:
+            logger.info("unable to cache the tile %s: %s" % (fingerprint, e))
+
+    def prune(self) -> None:
+        """Remove the entries that were not used since the cache creation"""
+        nr_removed = 0
+        for name in os.listdir(self.cache_folder):
+            if os.path.splitext(name)[0] in self._used:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_folder, name))
+                nr_removed += 1
+            except OSError as e:
+                logger.info("unable to remove %s: %s" % (name, e))
+
+        logger.debug("tile cache -> hits: %d, misses: %d, removed: %d" % (self.hits, self.misses, nr_removed))
@@ -8,7 +8,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 import cython
-from libc.math cimport isnan
+from libc.math cimport fabs, isnan
 
 #IHO S-44 TVU QC Calculations
 # noinspection PyUnresolvedReferences
@@ -525,4 +525,293 @@ cpdef calc_tvu_qc_c_ff(float[:, :] bathy, float[:, :] product_uncertainty, float
                 # logger.debug("is nan: %d %d" % (r, c)))
 
             else:
-                tvu_qc[r, c] = pr_unc_value / (2.0 + (0.05 * bathy_value))
\ No newline at end of file
+                tvu_qc[r, c] = pr_unc_value / (2.0 + (0.05 * bathy_value))
+
+
+# FUSED TVU QC AND CATZOC RATIOS
+# noinspection PyUnresolvedReferences
+@cython.cdivision(False)
+@cython.cpow(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+#@cython.profile(True)
+cpdef calc_tvu_ratios_dd(double[:, :] depth, double[:, :] product_uncertainty, double pu_nodata,
+                         bint calc_tvu_qc, bint calc_a1, bint calc_a2b, bint calc_c,
+                         double[:, :] ratios, np.int64_t[:] counts):
+    """Single pass on the depths (as elevations) and the product uncertainty for the selected TVU ratios
+
+    The valid absolute ratios are packed in the rows of ratios (0: TVU QC, 1: CATZOC A1, 2: CATZOC A2/B, 3: CATZOC
+    C; 4: the depths of the TVU QC ratios), with their numbers in counts.
+    """
+
+    cdef int rows = depth.shape[0]
+    cdef int cols = depth.shape[1]
+
+    cdef int r, c
+    cdef double bathy_value
+    cdef double pr_unc_value
+    cdef double ratio
+    cdef np.int64_t nr_tvu_qc = 0
+    cdef np.int64_t nr_a1 = 0
+    cdef np.int64_t nr_a2b = 0
+    cdef np.int64_t nr_c = 0
+
+    for r in range(rows):
+
+        for c in range(cols):
+
+            bathy_value = -depth[r, c]
+            pr_unc_value = product_uncertainty[r, c]
+
+            if isnan(bathy_value) or (pr_unc_value == pu_nodata):
+                continue
+
+            if calc_tvu_qc:
+                if bathy_value <= 100.0:
+                    ratio = pr_unc_value / ((0.25 + (0.013 * bathy_value) ** 2) ** 0.5)
+                else:
+                    ratio = pr_unc_value / ((1. + (0.023 * bathy_value) ** 2) ** 0.5)
+                if not isnan(ratio):
+                    ratios[0, nr_tvu_qc] = fabs(ratio)
+                    ratios[4, nr_tvu_qc] = bathy_value
+                    nr_tvu_qc += 1
+
+            if calc_a1:
+                ratio = pr_unc_value / (0.5 + (0.01 * bathy_value))
+                if not isnan(ratio):
+                    ratios[1, nr_a1] = fabs(ratio)
+                    nr_a1 += 1
+
+            if calc_a2b:
+                ratio = pr_unc_value / (1.0 + (0.02 * bathy_value))
+                if not isnan(ratio):
+                    ratios[2, nr_a2b] = fabs(ratio)
+                    nr_a2b += 1
+
+            if calc_c:
+                ratio = pr_unc_value / (2.0 + (0.05 * bathy_value))
+                if not isnan(ratio):
+                    ratios[3, nr_c] = fabs(ratio)
+                    nr_c += 1
+
+    counts[0] = nr_tvu_qc
+    counts[1] = nr_a1
+    counts[2] = nr_a2b
+    counts[3] = nr_c
+
+
+# noinspection PyUnresolvedReferences
+@cython.cdivision(False)
+@cython.cpow(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+#@cython.profile(True)
+cpdef calc_tvu_ratios_df(double[:, :] depth, float[:, :] product_uncertainty, float pu_nodata,
+                         bint calc_tvu_qc, bint calc_a1, bint calc_a2b, bint calc_c,
+                         double[:, :] ratios, np.int64_t[:] counts):
+    """Single pass on the depths (as elevations) and the product uncertainty for the selected TVU ratios
+
+    The valid absolute ratios are packed in the rows of ratios (0: TVU QC, 1: CATZOC A1, 2: CATZOC A2/B, 3: CATZOC
+    C; 4: the depths of the TVU QC ratios), with their numbers in counts.
+    """
+
+    cdef int rows = depth.shape[0]
+    cdef int cols = depth.shape[1]
+
+    cdef int r, c
+    cdef double bathy_value
+    cdef float pr_unc_value
+    cdef double ratio
+    cdef np.int64_t nr_tvu_qc = 0
+    cdef np.int64_t nr_a1 = 0
+    cdef np.int64_t nr_a2b = 0
+    cdef np.int64_t nr_c = 0
+
+    for r in range(rows):
+
+        for c in range(cols):
+
+            bathy_value = -depth[r, c]
+            pr_unc_value = product_uncertainty[r, c]
+
+            if isnan(bathy_value) or (pr_unc_value == pu_nodata):
+                continue
+
+            if calc_tvu_qc:
+                if bathy_value <= 100.0:
+                    ratio = pr_unc_value / ((0.25 + (0.013 * bathy_value) ** 2) ** 0.5)
+                else:
+                    ratio = pr_unc_value / ((1. + (0.023 * bathy_value) ** 2) ** 0.5)
+                if not isnan(ratio):
+                    ratios[0, nr_tvu_qc] = fabs(ratio)
+                    ratios[4, nr_tvu_qc] = bathy_value
+                    nr_tvu_qc += 1
+
+            if calc_a1:
+                ratio = pr_unc_value / (0.5 + (0.01 * bathy_value))
+                if not isnan(ratio):
+                    ratios[1, nr_a1] = fabs(ratio)
+                    nr_a1 += 1
+
+            if calc_a2b:
+                ratio = pr_unc_value / (1.0 + (0.02 * bathy_value))
+                if not isnan(ratio):
+                    ratios[2, nr_a2b] = fabs(ratio)
+                    nr_a2b += 1
+
+            if calc_c:
+                ratio = pr_unc_value / (2.0 + (0.05 * bathy_value))
+                if not isnan(ratio):
+                    ratios[3, nr_c] = fabs(ratio)
+                    nr_c += 1
+
+    counts[0] = nr_tvu_qc
+    counts[1] = nr_a1
+    counts[2] = nr_a2b
+    counts[3] = nr_c
+
+
+# noinspection PyUnresolvedReferences
+@cython.cdivision(False)
+@cython.cpow(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+#@cython.profile(True)
+cpdef calc_tvu_ratios_fd(float[:, :] depth, double[:, :] product_uncertainty, double pu_nodata,
+                         bint calc_tvu_qc, bint calc_a1, bint calc_a2b, bint calc_c,
+                         float[:, :] ratios, np.int64_t[:] counts):
+    """Single pass on the depths (as elevations) and the product uncertainty for the selected TVU ratios
+
+    The valid absolute ratios are packed in the rows of ratios (0: TVU QC, 1: CATZOC A1, 2: CATZOC A2/B, 3: CATZOC
+    C; 4: the depths of the TVU QC ratios), with their numbers in counts.
+    """
+
+    cdef int rows = depth.shape[0]
+    cdef int cols = depth.shape[1]
+
+    cdef int r, c
+    cdef float bathy_value
+    cdef double pr_unc_value
+    cdef float ratio
+    cdef np.int64_t nr_tvu_qc = 0
+    cdef np.int64_t nr_a1 = 0
+    cdef np.int64_t nr_a2b = 0
+    cdef np.int64_t nr_c = 0
+
+    for r in range(rows):
+
+        for c in range(cols):
+
+            bathy_value = -depth[r, c]
+            pr_unc_value = product_uncertainty[r, c]
+
+            if isnan(bathy_value) or (pr_unc_value == pu_nodata):
+                continue
+
+            if calc_tvu_qc:
+                if bathy_value <= 100.0:
+                    ratio = pr_unc_value / ((0.25 + (0.013 * bathy_value) ** 2) ** 0.5)
+                else:
+                    ratio = pr_unc_value / ((1. + (0.023 * bathy_value) ** 2) ** 0.5)
+                if not isnan(ratio):
+                    ratios[0, nr_tvu_qc] = fabs(ratio)
+                    ratios[4, nr_tvu_qc] = bathy_value
+                    nr_tvu_qc += 1
+
+            if calc_a1:
+                ratio = pr_unc_value / (0.5 + (0.01 * bathy_value))
+                if not isnan(ratio):
+                    ratios[1, nr_a1] = fabs(ratio)
+                    nr_a1 += 1
+
+            if calc_a2b:
+                ratio = pr_unc_value / (1.0 + (0.02 * bathy_value))
+                if not isnan(ratio):
+                    ratios[2, nr_a2b] = fabs(ratio)
+                    nr_a2b += 1
+
+            if calc_c:
+                ratio = pr_unc_value / (2.0 + (0.05 * bathy_value))
+                if not isnan(ratio):
+                    ratios[3, nr_c] = fabs(ratio)
+                    nr_c += 1
+
+    counts[0] = nr_tvu_qc
+    counts[1] = nr_a1
+    counts[2] = nr_a2b
+    counts[3] = nr_c
+
+
+# noinspection PyUnresolvedReferences
+@cython.cdivision(False)
+@cython.cpow(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+#@cython.profile(True)
+cpdef calc_tvu_ratios_ff(float[:, :] depth, float[:, :] product_uncertainty, float pu_nodata,
+                         bint calc_tvu_qc, bint calc_a1, bint calc_a2b, bint calc_c,
+                         float[:, :] ratios, np.int64_t[:] counts):
+    """Single pass on the depths (as elevations) and the product uncertainty for the selected TVU ratios
+
+    The valid absolute ratios are packed in the rows of ratios (0: TVU QC, 1: CATZOC A1, 2: CATZOC A2/B, 3: CATZOC
+    C; 4: the depths of the TVU QC ratios), with their numbers in counts.
+    """
+
+    cdef int rows = depth.shape[0]
+    cdef int cols = depth.shape[1]
+
+    cdef int r, c
+    cdef float bathy_value
+    cdef float pr_unc_value
+    cdef float ratio
+    cdef np.int64_t nr_tvu_qc = 0
+    cdef np.int64_t nr_a1 = 0
+    cdef np.int64_t nr_a2b = 0
+    cdef np.int64_t nr_c = 0
+
+    for r in range(rows):
+
+        for c in range(cols):
+
+            bathy_value = -depth[r, c]
+            pr_unc_value = product_uncertainty[r, c]
+
+            if isnan(bathy_value) or (pr_unc_value == pu_nodata):
+                continue
+
+            if calc_tvu_qc:
+                if bathy_value <= 100.0:
+                    ratio = pr_unc_value / ((0.25 + (0.013 * bathy_value) ** 2) ** 0.5)
+                else:
+                    ratio = pr_unc_value / ((1. + (0.023 * bathy_value) ** 2) ** 0.5)
+                if not isnan(ratio):
+                    ratios[0, nr_tvu_qc] = fabs(ratio)
+                    ratios[4, nr_tvu_qc] = bathy_value
+                    nr_tvu_qc += 1
+
+            if calc_a1:
+                ratio = pr_unc_value / (0.5 + (0.01 * bathy_value))
+                if not isnan(ratio):
+                    ratios[1, nr_a1] = fabs(ratio)
+                    nr_a1 += 1
+
+            if calc_a2b:
+                ratio = pr_unc_value / (1.0 + (0.02 * bathy_value))
+                if not isnan(ratio):
+                    ratios[2, nr_a2b] = fabs(ratio)
+                    nr_a2b += 1
+
+            if calc_c:
+                ratio = pr_unc_value / (2.0 + (0.05 * bathy_value))
+                if not isnan(ratio):
+                    ratios[3, nr_c] = fabs(ratio)
+                    nr_c += 1
+
+    counts[0] = nr_tvu_qc
+    counts[1] = nr_a1
+    counts[2] = nr_a2b
+    counts[3] = nr_c
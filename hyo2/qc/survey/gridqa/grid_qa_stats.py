@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from hyo2.qc.survey.gridqa.histogram import GridQAHistogram, GridQAHistogram2D
+
+logger = logging.getLogger(__name__)
+
+
+class GridQAStats:
+    """Statistics accumulated by the Grid QA, persisted as a pair of .npz (arrays) and .json (values) files
+
+    The histograms can be re-rendered or aggregated (e.g., for a survey-level summary) without reading the grids.
+    """
+
+    version = 1
+    ext = ".GQv6.stats"
+
+    def __init__(self, basename: str = str(), is_vr: bool = False) -> None:
+        self.basename = basename  # type: str
+        self.is_vr = is_vr  # type: bool
+        self.settings = dict()  # type: dict
+        self.hists = dict()  # type: dict  # name -> GridQAHistogram
+        self.hists_2d = dict()  # type: dict  # name -> GridQAHistogram2D
+        self.infos = dict()  # type: dict  # name -> dict with the grid info attributes
+
+    def __repr__(self):
+        msg = "<GridQAStats>\n"
+
+        msg += " <basename: %s>\n" % self.basename
+        msg += " <is_vr: %s>\n" % self.is_vr
+        msg += " <hists: %s>\n" % ", ".join(self.hists.keys())
+        msg += " <hists_2d: %s>\n" % ", ".join(self.hists_2d.keys())
+
+        return msg
+
+    @classmethod
+    def _split_path(cls, path: str) -> str:
+        """Return the path without the .npz/.json extension"""
+        root, ext = os.path.splitext(path)
+        if ext.lower() in (".npz", ".json"):
+            return root
+        return path
+
+    @classmethod
+    def _to_json(cls, value):
+        if isinstance(value, dict):
+            return dict((key, cls._to_json(item)) for key, item in value.items())
+        if isinstance(value, (list, tuple)):
+            return [cls._to_json(item) for item in value]
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def save(self, path: str) -> str:
+        """Write the .npz and .json files, returning the path of the .json file"""
+        root = self._split_path(path)
+
+        arrays = dict()
+        values = {
+            'version': self.version,
+            'basename': self.basename,
+            'is_vr': self.is_vr,
+            'settings': self.settings,
+            'hists': dict(),
+            'hists_2d': dict(),
+            'infos': self.infos,
+        }
+        for group, hists in (('hists', self.hists), ('hists_2d', self.hists_2d)):
+            for name, hist in hists.items():
+                state = hist.state()
+                for key in list(state.keys()):
+                    if isinstance(state[key], np.ndarray):
+                        arrays["%s.%s.%s" % (group, name, key)] = state.pop(key)
+                values[group][name] = state
+
+        np.savez_compressed(root + ".npz", **arrays)
+        json_path = root + ".json"
+        with open(json_path, "w") as fod:
+            json.dump(self._to_json(values), fod, indent=2)
+        logger.debug("saved Grid QA stats: %s" % json_path)
+        return json_path
+
+    @classmethod
+    def load(cls, path: str) -> 'GridQAStats':
+        root = cls._split_path(path)
+
+        json_path = root + ".json"
+        npz_path = root + ".npz"
+        if not os.path.exists(json_path) or not os.path.exists(npz_path):
+            raise RuntimeError("unable to locate the Grid QA stats: %s" % root)
+
+        with open(json_path) as fid:
+            values = json.load(fid)
+        if values.get('version') != cls.version:
+            raise RuntimeError("unsupported Grid QA stats version: %s" % values.get('version'))
+
+        stats = cls(basename=values['basename'], is_vr=values['is_vr'])
+        stats.settings = values['settings']
+        stats.infos = values['infos']
+        with np.load(npz_path) as arrays:
+            for group, hist_class in (('hists', GridQAHistogram), ('hists_2d', GridQAHistogram2D)):
+                for name, state in values[group].items():
+                    prefix = "%s.%s." % (group, name)
+                    for key in arrays.files:
+                        if key.startswith(prefix):
+                            state[key[len(prefix):]] = arrays[key]
+                    getattr(stats, group)[name] = hist_class.from_state(state)
+        return stats
+
+    def merge(self, other: 'GridQAStats') -> 'GridQAStats':
+        """Add the statistics of another grid
+
+        Histograms with different bin widths are merged with the coarser one. Only the labels of the grid infos are
+        kept, since the other values have to be calculated again from the merged histograms.
+        """
+        self.is_vr = self.is_vr or other.is_vr
+
+        for name, hist in other.hists.items():
+            if name not in self.hists:
+                self.hists[name] = GridQAHistogram.from_state(hist.state())
+                continue
+            mul = min(self.hists[name].mul, hist.mul)
+            if self.hists[name].mul != mul:
+                self.hists[name] = self.hists[name].rebin(mul)
+            if hist.mul != mul:
+                hist = hist.rebin(mul)
+            self.hists[name].merge(hist)
+
+        for name, hist_2d in other.hists_2d.items():
+            if name not in self.hists_2d:
+                self.hists_2d[name] = GridQAHistogram2D(bins=hist_2d.bins, log_x=hist_2d.log_x)
+            self.hists_2d[name].merge(hist_2d)
+
+        for name, info in other.infos.items():
+            if name not in self.infos:
+                self.infos[name] = dict(info)
+        for info in self.infos.values():
+            info['basename'] = self.basename
+            for key in ('pct_of_passed_nodes', 'mode', 'p2_5', 'q1', 'median', 'q3', 'p97_5'):
+                info[key] = None
+
+        for key, value in other.settings.items():
+            if isinstance(value, bool):
+                self.settings[key] = self.settings.get(key, False) or value
+            else:
+                self.settings.setdefault(key, value)
+
+        return self
+
+    @classmethod
+    def aggregate(cls, paths: List[str], basename: Optional[str] = None) -> 'GridQAStats':
+        """Merge the stats files of several grids (e.g., of a whole survey)"""
+        if len(paths) == 0:
+            raise RuntimeError("no Grid QA stats to aggregate")
+
+        stats = cls(basename=basename if basename is not None else str())
+        for path in paths:
+            stats.merge(cls.load(path))
+        return stats
+
+    def summary(self) -> dict:
+        """Return the node counts and the pass rates of each histogram"""
+        summary = dict()
+        for name, hist in self.hists.items():
+            if hist.nr_of_nodes == 0:
+                continue
+            item = {
+                'nr_of_nodes': int(hist.nr_of_nodes),
+                'min': float(hist.min),
+                'max': float(hist.max),
+                'median': float(hist.bins[np.searchsorted(np.cumsum(hist.counts) / hist.counts.sum(), 0.5)]),
+            }
+            if (hist.pass_min is not None) or (hist.pass_max is not None):
+                item['nr_of_passed_nodes'] = int(hist.nr_of_passed_nodes)
+                item['pct_of_passed_nodes'] = hist.nr_of_passed_nodes / float(hist.nr_of_nodes)
+            summary[name] = item
+        return summary
@@ -1,17 +1,14 @@
 import os
 import sys
-from collections import OrderedDict, defaultdict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
 
-import matplotlib
 import numpy as np
 # noinspection PyProtectedMember
 from hyo2.grids._grids import FLOAT as GRIDS_FLOAT, DOUBLE as GRIDS_DOUBLE, \
     UINT32 as GRIDS_UINT32, UINT64 as GRIDS_UINT64, INT32 as GRIDS_INT32, INT64 as GRIDS_INT64
 
-matplotlib.use('Qt5Agg')
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FormatStrFormatter, ScalarFormatter
-
 import warnings
 
 warnings.simplefilter(action="ignore", category=RuntimeWarning)
@@ -19,10 +16,10 @@ warnings.simplefilter(action="ignore", category=RuntimeWarning)
 import logging
 
 from hyo2.qc.survey.gridqa.base_qa import BaseGridQA, qa_algos
-from hyo2.qc.survey.gridqa.grid_qa_calc import calc_tvu_qc_dd, calc_tvu_qc_df, calc_tvu_qc_fd, calc_tvu_qc_ff, \
-    calc_tvu_qc_a1_dd, calc_tvu_qc_a1_df, calc_tvu_qc_a1_fd, calc_tvu_qc_a1_ff, \
-    calc_tvu_qc_a2b_dd, calc_tvu_qc_a2b_df, calc_tvu_qc_a2b_fd, calc_tvu_qc_a2b_ff, \
-    calc_tvu_qc_c_dd, calc_tvu_qc_c_df, calc_tvu_qc_c_fd, calc_tvu_qc_c_ff
+from hyo2.qc.survey.gridqa.grid_qa_stats import GridQAStats
+from hyo2.qc.survey.gridqa.histogram import GridQAHistogram, GridQAHistogram2D
+from hyo2.qc.survey.gridqa.grid_qa_calc import calc_tvu_ratios_dd, calc_tvu_ratios_df, calc_tvu_ratios_fd, \
+    calc_tvu_ratios_ff
 from hyo2.abc.lib.helper import Helper
 
 logger = logging.getLogger(__name__)
@@ -86,18 +83,39 @@ class GridInfoV6:
         return msg
 
 
+class GridQATile:
+    """Layers of a grid tile as plain arrays, so that the tile can be passed to a worker process"""
+
+    def __init__(self):
+        self.bathy_values = None  # type: Optional[np.ndarray]
+        self.density_values = None  # type: Optional[np.ndarray]
+        self.tvu_qc_values = None  # type: Optional[np.ndarray]  # only if read from the TVU QC layer
+        self.pct_od_values = None  # type: Optional[np.ndarray]
+        self.pct_cc_values = None  # type: Optional[np.ndarray]
+        # depth and product uncertainty layers (with no-data values) used to calculate the TVU ratios
+        self.depth = None  # type: Optional[np.ndarray]
+        self.uncertainty = None  # type: Optional[np.ndarray]
+        self.uncertainty_nodata = None
+
+
 class GridQAV6(BaseGridQA):
 
+    ratios_block_size = 1 << 20  # nodes in each block of the fused TVU ratios
+    hist_names = ('bathy', 'density', 'tvu_qc', 'pct_od', 'pct_cc', 'catzoc_a1', 'catzoc_a2b', 'catzoc_c')
+
     def __init__(self, grids, force_tvu_qc,
                  has_depth, has_product_uncertainty, has_density, has_tvu_qc, output_folder,
                  object_detection=True, full_coverage=True, hist_depth=True, hist_density=True, hist_tvu_qc=True,
                  hist_pct_res=True, hist_catzoc_a1=True, hist_catzoc_a2b=True, hist_catzoc_c=True,
-                 depth_vs_density=True, depth_vs_tvu_qc=True, progress=None):
+                 depth_vs_density=True, depth_vs_tvu_qc=True, workers=1, save_stats=True, progress=None):
         super().__init__(grids=grids)
         self.type = qa_algos["GRID_QA_v6"]
         self.force_tvu_qc = force_tvu_qc
         self.objection_detection = object_detection
         self.full_coverage = full_coverage
+        if workers < 1:
+            raise RuntimeError("invalid number of workers: %s" % workers)
+        self.workers = workers
         self.progress = progress
 
         self.has_depth = has_depth
@@ -105,6 +123,9 @@ class GridQAV6(BaseGridQA):
         self.has_density = has_density
         self.has_tvu_qc = has_tvu_qc
 
+        self.save_stats = save_stats
+        self.stats_path = None  # type: Optional[str]
+
         self.output_folder = output_folder
         if not os.path.exists(self.output_folder):
             os.makedirs(self.output_folder)
@@ -132,15 +153,6 @@ class GridQAV6(BaseGridQA):
         self.catzoc_a2b_first = True
         self.catzoc_c_first = True
 
-        self.bathy_values = None
-        self.density_values = None
-        self.tvu_qc_values = None
-        self.pct_od_values = None
-        self.pct_cc_values = None
-        self.catzoc_a1_values = None
-        self.catzoc_a2b_values = None
-        self.catzoc_c_values = None
-
         self.bathy_mul = 1
         self.density_mul = 1
         self.tvu_qc_mul = 100
@@ -150,14 +162,14 @@ class GridQAV6(BaseGridQA):
         self.catzoc_a2b_mul = 100
         self.catzoc_c_mul = 100
 
-        self.bathy_dict = None
-        self.density_dict = None
-        self.tvu_qc_dict = None
-        self.pct_od_dict = None
-        self.pct_cc_dict = None
-        self.catzoc_a1_dict = None
-        self.catzoc_a2b_dict = None
-        self.catzoc_c_dict = None
+        self.bathy_hist = None
+        self.density_hist = None
+        self.tvu_qc_hist = None
+        self.pct_od_hist = None
+        self.pct_cc_hist = None
+        self.catzoc_a1_hist = None
+        self.catzoc_a2b_hist = None
+        self.catzoc_c_hist = None
 
         self.bathy_info = None
         self.density_info = None
@@ -170,6 +182,10 @@ class GridQAV6(BaseGridQA):
 
         self.tvu_qc_recalculated = False
 
+        # set at the end of the run, so that the results can be also rendered from the saved stats
+        self.grid_basename = str()
+        self.grid_is_vr = False
+
         self.density_fig = None
         self.density_ax = None
         self.tvu_qc_fig = None
@@ -184,6 +200,18 @@ class GridQAV6(BaseGridQA):
         self.catzoc_a2b_ax = None
         self.catzoc_c_fig = None
         self.catzoc_c_ax = None
+        self.density_hist_2d = None
+        self.tvu_qc_hist_2d = None
+
+    def __getstate__(self) -> dict:
+        # only the settings are passed to the worker processes (e.g., the grids cannot be pickled)
+        state = self.__dict__.copy()
+        state['grids'] = None
+        state['progress'] = None
+        for key in list(state.keys()):
+            if key.endswith('_fig') or key.endswith('_ax') or key.endswith('_hist') or key.endswith('_hist_2d'):
+                state[key] = None
+        return state
 
     def run(self):
         logger.info("parameters for Grid QA: force-tvu-qc=%s, has_depth=%s, "
@@ -198,16 +226,8 @@ class GridQAV6(BaseGridQA):
             logger.critical("unable to identify the depth layer")
             return False
 
-        success = True
-
-        self.bathy_dict = defaultdict(int)
-        self.density_dict = defaultdict(int)
-        self.tvu_qc_dict = defaultdict(int)
-        self.pct_od_dict = defaultdict(int)
-        self.pct_cc_dict = defaultdict(int)
-        self.catzoc_a1_dict = defaultdict(int)
-        self.catzoc_a2b_dict = defaultdict(int)
-        self.catzoc_c_dict = defaultdict(int)
+        for name, hist in self._new_histograms(bathy_mul=self.bathy_mul).items():
+            setattr(self, "%s_hist" % name, hist)
 
         self._init_infos()
         if self._depth_vs_density:
@@ -226,30 +246,38 @@ class GridQAV6(BaseGridQA):
             layers.append(self.grids.tvu_qc_layer_name())
         logger.debug("selected layers: %s" % (layers,))
 
-        while self.grids.read_next_tile(layers=layers):
+        if self.workers > 1:
+            self._run_parallel(layers=layers)
+        else:
+            while self.grids.read_next_tile(layers=layers):
+                self._update_progress()
+
+                # logger.debug("new tile")
+                tile = self._prepare_tile()
+                if tile is not None:
+                    self._reduce_tile(tile, self._map_tile(tile, bathy_mul=self.bathy_mul))
+                self.grids.clear_tiles()
 
-            if self.progress is not None:
-                if self.progress.value < 50:
-                    self.progress.add(quantum=10)
-                elif self.progress.value < 75:
-                    self.progress.add(quantum=1)
-                elif self.progress.value < 90:
-                    self.progress.add(quantum=0.1)
-                elif self.progress.value <= 99:
-                    self.progress.add(quantum=0.0001)
+                # self._memory_info()
 
-            # logger.debug("new tile")
-            self._run_slice()
-            self.grids.clear_tiles()
+        self._update_infos()
+        self.grid_basename = self.grids.current_basename
+        self.grid_is_vr = self.grids.is_vr()
 
-            # self._memory_info()
+        success = self.render()
+        if self.save_stats:
+            self.stats_path = self.write_stats()
+        return success
+
+    def render(self) -> bool:
+        """Calculate the statistics of the accumulated histograms, and save the plots as png"""
+        success = True
 
         # bathy
-        self.bathy_dict = OrderedDict(sorted(self.bathy_dict.items(), key=lambda t: t[0]))
-        bathy_counts = np.array(list(self.bathy_dict.values()))
+        bathy_counts = self.bathy_hist.counts
         bathy_density = bathy_counts / bathy_counts.sum()
         bathy_cumsum = np.cumsum(bathy_density)
-        bathy_bins = np.array(list(self.bathy_dict.keys())) / self.bathy_mul
+        bathy_bins = self.bathy_hist.bins
         self.bathy_info.mode = bathy_bins[bathy_counts.argmax()]
         # noinspection PyTypeChecker
         self.bathy_info.p2_5 = bathy_bins[np.searchsorted(bathy_cumsum, 0.025)]
@@ -261,11 +289,11 @@ class GridQAV6(BaseGridQA):
         self.bathy_info.q3 = bathy_bins[np.searchsorted(bathy_cumsum, 0.75)]
         # noinspection PyTypeChecker
         self.bathy_info.p97_5 = bathy_bins[np.searchsorted(bathy_cumsum, 0.975)]
-        # print("bathy: %s" % self.bathy_dict)
+        # print("bathy: %s" % self.bathy_hist.counts)
         # print("bathy: %s" % self.bathy_info)
         # save the histogram as png
         if self._hist_depth:
-            bathy_png_file = "%s.GQv6.depth.png" % os.path.splitext(self.grids.current_basename)[0]
+            bathy_png_file = "%s.GQv6.depth.png" % os.path.splitext(self.grid_basename)[0]
             bathy_png_path = os.path.join(self.output_folder, bathy_png_file)
             bathy_png_path = Helper.truncate_too_long(bathy_png_path, left_truncation=True)
             GridQAV6.plot_hysto(layer_name="Depth", bins=bathy_bins, density=bathy_density,
@@ -273,12 +301,10 @@ class GridQAV6(BaseGridQA):
 
         # density
         if self.has_density:
-            self.density_dict = OrderedDict(sorted(self.density_dict.items(), key=lambda t: t[0]))
-            # logger.debug("density dict: %s" % (self.density_dict, ))
-            density_counts = np.array(list(self.density_dict.values()))
+            density_counts = self.density_hist.counts
             density_density = density_counts / density_counts.sum()
             density_cumsum = np.cumsum(density_density)
-            density_bins = np.array(list(self.density_dict.keys())) / self.density_mul
+            density_bins = self.density_hist.bins
 
             if len(density_counts) > 0:
 
@@ -303,11 +329,11 @@ class GridQAV6(BaseGridQA):
                                    % (self.density_info.pct_of_passed_nodes * 100.0))
                     success = False
                 self.density_info.fail_left = 5
-                # print("density: %s" % self.density_dict)
+                # print("density: %s" % self.density_hist.counts)
                 # print("density: %s" % self.density_info)
                 # save the histogram as png
                 if self._hist_density:
-                    density_png_file = "%s.GQv6.density.png" % os.path.splitext(self.grids.current_basename)[0]
+                    density_png_file = "%s.GQv6.density.png" % os.path.splitext(self.grid_basename)[0]
                     density_png_path = os.path.join(self.output_folder, density_png_file)
                     density_png_path = Helper.truncate_too_long(density_png_path, left_truncation=True)
                     GridQAV6.plot_hysto(layer_name="Density", bins=density_bins, density=density_density,
@@ -316,19 +342,16 @@ class GridQAV6(BaseGridQA):
                 # save the depth vs. density plot as png
                 if self._depth_vs_density:
                     self._finish_plot_depth_vs_density()
-                # delete the density array
-                self.density_values = None
 
         # tvu qc
         if (self.has_tvu_qc and not self.force_tvu_qc) or self.has_product_uncertainty:
 
-            if len(self.tvu_qc_dict.values()) > 0:
+            if len(self.tvu_qc_hist) > 0:
 
-                self.tvu_qc_dict = OrderedDict(sorted(self.tvu_qc_dict.items(), key=lambda t: t[0]))
-                tvu_qc_counts = np.array(list(self.tvu_qc_dict.values()))
+                tvu_qc_counts = self.tvu_qc_hist.counts
                 tvu_qc_density = tvu_qc_counts / tvu_qc_counts.sum()
                 tvu_qc_cumsum = np.cumsum(tvu_qc_density)
-                tvu_qc_bins = np.array(list(self.tvu_qc_dict.keys())) / self.tvu_qc_mul
+                tvu_qc_bins = self.tvu_qc_hist.bins
                 self.tvu_qc_info.mode = tvu_qc_bins[tvu_qc_counts.argmax()]
                 # noinspection PyTypeChecker
                 self.tvu_qc_info.p2_5 = tvu_qc_bins[np.searchsorted(tvu_qc_cumsum, 0.025)]
@@ -350,11 +373,11 @@ class GridQAV6(BaseGridQA):
                                    % (self.tvu_qc_info.pct_of_passed_nodes * 100.0))
                     success = False
                 self.tvu_qc_info.fail_right = 1
-                # print("tvu qc: %s" % self.tvu_qc_dict)
+                # print("tvu qc: %s" % self.tvu_qc_hist.counts)
                 # print("tvu qc: %s" % self.tvu_qc_info)
                 # save the histogram as png
                 if self._hist_tvu_qc:
-                    tvu_qc_png_file = "%s.GQv6.tvu_qc.png" % os.path.splitext(self.grids.current_basename)[0]
+                    tvu_qc_png_file = "%s.GQv6.tvu_qc.png" % os.path.splitext(self.grid_basename)[0]
                     tvu_qc_png_path = os.path.join(self.output_folder, tvu_qc_png_file)
                     tvu_qc_png_path = Helper.truncate_too_long(tvu_qc_png_path, left_truncation=True)
                     GridQAV6.plot_hysto(layer_name="TVU QC", bins=tvu_qc_bins, density=tvu_qc_density,
@@ -363,21 +386,16 @@ class GridQAV6(BaseGridQA):
                 # save the depth vs. tvu qc plot as png
                 if self._depth_vs_tvu_qc:
                     self._finish_plot_depth_vs_tvu_qc()
-                # delete the array
-                self.tvu_qc_values = None
-                # del self.grids.tvu_qc
 
         # res pct
-        if self.grids.is_vr():
+        if self.grid_is_vr:
 
             # - PCT OD
             if self.objection_detection:
-                self.pct_od_dict = OrderedDict(sorted(self.pct_od_dict.items(), key=lambda t: t[0]))
-                # logger.debug("%s" % dict(self.pct_od_dict))
-                pct_od_counts = np.array(list(self.pct_od_dict.values()))
+                pct_od_counts = self.pct_od_hist.counts
                 pct_od_density = pct_od_counts / pct_od_counts.sum()
                 pct_od_cumsum = np.cumsum(pct_od_density)
-                pct_od_bins = np.array(list(self.pct_od_dict.keys())) / self.pct_od_mul
+                pct_od_bins = self.pct_od_hist.bins
                 self.pct_od_info.mode = pct_od_bins[pct_od_counts.argmax()]
                 # noinspection PyTypeChecker
                 self.pct_od_info.p2_5 = pct_od_bins[np.searchsorted(pct_od_cumsum, 0.025)]
@@ -399,27 +417,23 @@ class GridQAV6(BaseGridQA):
                                    % (self.pct_od_info.pct_of_passed_nodes * 100.0))
                     success = False
                 self.pct_od_info.fail_right = 1
-                # print("pct od: %s" % self.pct_od_dict)
+                # print("pct od: %s" % self.pct_od_hist.counts)
                 # print("pct od: %s" % self.pct_od_info)
                 # save the histogram as png
                 if self._hist_pct_res:
-                    pct_od_png_file = "%s.GQv6.pct_res.obj_det.png" % os.path.splitext(self.grids.current_basename)[0]
+                    pct_od_png_file = "%s.GQv6.pct_res.obj_det.png" % os.path.splitext(self.grid_basename)[0]
                     pct_od_png_path = os.path.join(self.output_folder, pct_od_png_file)
                     pct_od_png_path = Helper.truncate_too_long(pct_od_png_path, left_truncation=True)
                     GridQAV6.plot_hysto(layer_name="RES OD", bins=pct_od_bins, density=pct_od_density,
                                         bin_width=0.1, grid_info=self.pct_od_info,
                                         png_path=pct_od_png_path)
-                # delete the array
-                self.pct_od_values = None
 
             # - PCT CC
             if self.full_coverage:
-                self.pct_cc_dict = OrderedDict(sorted(self.pct_cc_dict.items(), key=lambda t: t[0]))
-                # logger.debug("%s" % dict(self.pct_cc_dict))
-                pct_cc_counts = np.array(list(self.pct_cc_dict.values()))
+                pct_cc_counts = self.pct_cc_hist.counts
                 pct_cc_density = pct_cc_counts / pct_cc_counts.sum()
                 pct_cc_cumsum = np.cumsum(pct_cc_density)
-                pct_cc_bins = np.array(list(self.pct_cc_dict.keys())) / self.pct_cc_mul
+                pct_cc_bins = self.pct_cc_hist.bins
                 self.pct_cc_info.mode = pct_cc_bins[pct_cc_counts.argmax()]
                 # noinspection PyTypeChecker
                 self.pct_cc_info.p2_5 = pct_cc_bins[np.searchsorted(pct_cc_cumsum, 0.025)]
@@ -441,29 +455,26 @@ class GridQAV6(BaseGridQA):
                                    % (self.pct_cc_info.pct_of_passed_nodes * 100.0))
                     success = False
                 self.pct_cc_info.fail_right = 1
-                # print("pct od: %s" % self.pct_cc_dict)
+                # print("pct od: %s" % self.pct_cc_hist.counts)
                 # print("pct od: %s" % self.pct_cc_info)
                 # save the histogram as png
                 if self._hist_pct_res:
-                    pct_cc_png_file = "%s.GQv6.pct_res.full_cov.png" % os.path.splitext(self.grids.current_basename)[0]
+                    pct_cc_png_file = "%s.GQv6.pct_res.full_cov.png" % os.path.splitext(self.grid_basename)[0]
                     pct_cc_png_path = os.path.join(self.output_folder, pct_cc_png_file)
                     pct_cc_png_path = Helper.truncate_too_long(pct_cc_png_path, left_truncation=True)
                     GridQAV6.plot_hysto(layer_name="RES FC", bins=pct_cc_bins, density=pct_cc_density,
                                         bin_width=0.1, grid_info=self.pct_cc_info,
                                         png_path=pct_cc_png_path)
-                # delete the array
-                self.pct_cc_values = None
 
         # catzoc a1
         if self.has_product_uncertainty and self._hist_catzoc_a1:
 
-            if len(self.catzoc_a1_dict.values()) > 0:
+            if len(self.catzoc_a1_hist) > 0:
 
-                self.catzoc_a1_dict = OrderedDict(sorted(self.catzoc_a1_dict.items(), key=lambda t: t[0]))
-                catzoc_a1_counts = np.array(list(self.catzoc_a1_dict.values()))
+                catzoc_a1_counts = self.catzoc_a1_hist.counts
                 catzoc_a1_density = catzoc_a1_counts / catzoc_a1_counts.sum()
                 catzoc_a1_cumsum = np.cumsum(catzoc_a1_density)
-                catzoc_a1_bins = np.array(list(self.catzoc_a1_dict.keys())) / self.catzoc_a1_mul
+                catzoc_a1_bins = self.catzoc_a1_hist.bins
                 self.catzoc_a1_info.mode = catzoc_a1_bins[catzoc_a1_counts.argmax()]
                 # noinspection PyTypeChecker
                 self.catzoc_a1_info.p2_5 = catzoc_a1_bins[np.searchsorted(catzoc_a1_cumsum, 0.025)]
@@ -486,11 +497,11 @@ class GridQAV6(BaseGridQA):
                                    % (self.catzoc_a1_info.pct_of_passed_nodes * 100.0))
                     success = False
                 self.catzoc_a1_info.fail_right = 1
-                # print("catzoc a1: %s" % self.catzoc_a1_dict)
+                # print("catzoc a1: %s" % self.catzoc_a1_hist.counts)
                 # print("catzoc a1: %s" % self.catzoc_a1_info)
                 # save the histogram as png
                 if self._hist_catzoc_a1:
-                    catzoca1_png_file = "%s.GQv6.tvu_catzoc_a1.png" % os.path.splitext(self.grids.current_basename)[
+                    catzoca1_png_file = "%s.GQv6.tvu_catzoc_a1.png" % os.path.splitext(self.grid_basename)[
                         0]
                     catzoca1_png_path = os.path.join(self.output_folder, catzoca1_png_file)
                     catzoca1_png_path = Helper.truncate_too_long(catzoca1_png_path, left_truncation=True)
@@ -501,13 +512,12 @@ class GridQAV6(BaseGridQA):
         # catzoc a2 / b (a2b)
         if self.has_product_uncertainty and self._hist_catzoc_a2b:
 
-            if len(self.catzoc_a2b_dict.values()) > 0:
+            if len(self.catzoc_a2b_hist) > 0:
 
-                self.catzoc_a2b_dict = OrderedDict(sorted(self.catzoc_a2b_dict.items(), key=lambda t: t[0]))
-                catzoc_a2b_counts = np.array(list(self.catzoc_a2b_dict.values()))
+                catzoc_a2b_counts = self.catzoc_a2b_hist.counts
                 catzoc_a2b_density = catzoc_a2b_counts / catzoc_a2b_counts.sum()
                 catzoc_a2b_cumsum = np.cumsum(catzoc_a2b_density)
-                catzoc_a2b_bins = np.array(list(self.catzoc_a2b_dict.keys())) / self.catzoc_a2b_mul
+                catzoc_a2b_bins = self.catzoc_a2b_hist.bins
                 self.catzoc_a2b_info.mode = catzoc_a2b_bins[catzoc_a2b_counts.argmax()]
                 # noinspection PyTypeChecker
                 self.catzoc_a2b_info.p2_5 = catzoc_a2b_bins[np.searchsorted(catzoc_a2b_cumsum, 0.025)]
@@ -530,12 +540,12 @@ class GridQAV6(BaseGridQA):
                                    % (self.catzoc_a2b_info.pct_of_passed_nodes * 100.0))
                     success = False
                 self.catzoc_a2b_info.fail_right = 1
-                # print("catzoc a2b: %s" % self.catzoc_a2b_dict)
+                # print("catzoc a2b: %s" % self.catzoc_a2b_hist.counts)
                 # print("catzoc a2b: %s" % self.catzoc_a2b_info)
                 # save the histogram as png
                 if self._hist_catzoc_a2b:
                     catzoca2b_png_file = "%s.GQv6.tvu_catzoc_a2b.png" % \
-                                         os.path.splitext(self.grids.current_basename)[0]
+                                         os.path.splitext(self.grid_basename)[0]
                     catzoca2b_png_path = os.path.join(self.output_folder, catzoca2b_png_file)
                     catzoca2b_png_path = Helper.truncate_too_long(catzoca2b_png_path, left_truncation=True)
                     GridQAV6.plot_hysto(layer_name="TVU CATZOC A2 / B", bins=catzoc_a2b_bins,
@@ -546,13 +556,12 @@ class GridQAV6(BaseGridQA):
         # catzoc c
         if self.has_product_uncertainty and self._hist_catzoc_c:
 
-            if len(self.catzoc_c_dict.values()) > 0:
+            if len(self.catzoc_c_hist) > 0:
 
-                self.catzoc_c_dict = OrderedDict(sorted(self.catzoc_c_dict.items(), key=lambda t: t[0]))
-                catzoc_c_counts = np.array(list(self.catzoc_c_dict.values()))
+                catzoc_c_counts = self.catzoc_c_hist.counts
                 catzoc_c_density = catzoc_c_counts / catzoc_c_counts.sum()
                 catzoc_c_cumsum = np.cumsum(catzoc_c_density)
-                catzoc_c_bins = np.array(list(self.catzoc_c_dict.keys())) / self.catzoc_c_mul
+                catzoc_c_bins = self.catzoc_c_hist.bins
                 self.catzoc_c_info.mode = catzoc_c_bins[catzoc_c_counts.argmax()]
                 # noinspection PyTypeChecker
                 self.catzoc_c_info.p2_5 = catzoc_c_bins[np.searchsorted(catzoc_c_cumsum, 0.025)]
@@ -575,11 +584,11 @@ class GridQAV6(BaseGridQA):
                                    % (self.catzoc_c_info.pct_of_passed_nodes * 100.0))
                     success = False
                 self.catzoc_c_info.fail_right = 1
-                # print("catzoc c: %s" % self.catzoc_c_dict)
+                # print("catzoc c: %s" % self.catzoc_c_hist.counts)
                 # print("catzoc c: %s" % self.catzoc_c_info)
                 # save the histogram as png
                 if self._hist_catzoc_c:
-                    catzocc_png_file = "%s.GQv6.tvu_catzoc_c.png" % os.path.splitext(self.grids.current_basename)[0]
+                    catzocc_png_file = "%s.GQv6.tvu_catzoc_c.png" % os.path.splitext(self.grid_basename)[0]
                     catzocc_png_path = os.path.join(self.output_folder, catzocc_png_file)
                     catzocc_png_path = Helper.truncate_too_long(catzocc_png_path, left_truncation=True)
                     GridQAV6.plot_hysto(layer_name="TVU CATZOC C", bins=catzoc_c_bins, density=catzoc_c_density,
@@ -588,143 +597,66 @@ class GridQAV6(BaseGridQA):
 
         return success
 
-    def _run_slice(self):
-
-        self._create_arrays()
-        if len(self.bathy_values) == 0:
-            logger.warning("missing depth values!")
+    def _update_progress(self):
+        if self.progress is None:
             return
 
-        # bathy
-        self.bathy_info.nr_of_nodes += len(self.bathy_values)
-        if np.min(self.bathy_values) < self.bathy_info.min:
-            self.bathy_info.min = np.min(self.bathy_values)
-        if np.max(self.bathy_values) > self.bathy_info.max:
-            self.bathy_info.max = np.max(self.bathy_values)
+        if self.progress.value < 50:
+            self.progress.add(quantum=10)
+        elif self.progress.value < 75:
+            self.progress.add(quantum=1)
+        elif self.progress.value < 90:
+            self.progress.add(quantum=0.1)
+        elif self.progress.value <= 99:
+            self.progress.add(quantum=0.0001)
+
+    def _run_parallel(self, layers: list):
+        """Calculate the partial histograms on a pool of worker processes, then merge them in the tiles order"""
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_qa_worker,
+                                 initargs=(self,)) as executor:
+            while self.grids.read_next_tile(layers=layers):
+                self._update_progress()
+
+                tile = self._prepare_tile()
+                self.grids.clear_tiles()
+                if tile is None:
+                    continue
+                pending.append((tile, executor.submit(_grid_qa_tile, tile, self.bathy_mul)))
+
+                # limit the number of tiles kept in memory
+                if len(pending) >= 2 * self.workers:
+                    tile, future = pending.popleft()
+                    self._reduce_tile(tile, future.result())
+
+            while len(pending) > 0:
+                tile, future = pending.popleft()
+                self._reduce_tile(tile, future.result())
+
+    def _prepare_tile(self) -> Optional[GridQATile]:
+        """Read the current tile, and set the depth binning with the first one"""
+        tile = self._read_tile()
+        if tile is None:
+            return None
+
         if self.bathy_first:
             self.bathy_first = False
-            if (self.bathy_info.max - self.bathy_info.min) < 50:
+            if (np.max(tile.bathy_values) - np.min(tile.bathy_values)) < 50:
                 self.bathy_mul = 10
-        # self.bathy_dict = populate_bathy_dict(self.bathy_values, self.bathy_dict, self.bathy_mul)
-        for depth in self.bathy_values:
-            depth_key = int(round(depth * self.bathy_mul))
-            # print(depth_key)
-            self.bathy_dict[depth_key] += 1
-
-        # density
-        if self.has_density:
-            if len(self.density_values) > 0:
-                self.density_info.nr_of_nodes += len(self.density_values)
-                self.density_info.nr_of_passed_nodes += np.greater_equal(self.density_values, 5).sum()
-                if np.min(self.density_values) < self.density_info.min:
-                    self.density_info.min = np.min(self.density_values)
-                if np.max(self.density_values) > self.density_info.max:
-                    self.density_info.max = np.max(self.density_values)
-
-                for density in self.density_values:
-                    density_key = density
-                    self.density_dict[density_key] += 1
-
-                if self._depth_vs_density:
-                    self._update_plot_depth_vs_density()
-
-        # tvu qc
-        if (self.has_tvu_qc and not self.force_tvu_qc) or self.has_product_uncertainty:
-            if len(self.tvu_qc_values) > 0:
-                self.tvu_qc_info.nr_of_nodes += len(self.tvu_qc_values)
-                self.tvu_qc_info.nr_of_passed_nodes += np.less_equal(self.tvu_qc_values, 1).sum()
-                if np.min(self.tvu_qc_values) < self.tvu_qc_info.min:
-                    self.tvu_qc_info.min = np.min(self.tvu_qc_values)
-                if np.max(self.tvu_qc_values) > self.tvu_qc_info.max:
-                    self.tvu_qc_info.max = np.max(self.tvu_qc_values)
-
-                for tvu_qc in self.tvu_qc_values:
-                    tvu_qc_key = int(round(tvu_qc * self.tvu_qc_mul))
-                    self.tvu_qc_dict[tvu_qc_key] += 1
-
-                if self._depth_vs_tvu_qc:
-                    self._update_plot_depth_vs_tvu_qc()
-
-        # res pct
-        if self.grids.is_vr():
-
-            # - pct od
-            if self.objection_detection:
-                if len(self.pct_od_values) > 0:
-
-                    # logger.debug("populating pct od dict")
-                    self.pct_od_info.nr_of_nodes += len(self.pct_od_values)
-                    self.pct_od_info.nr_of_passed_nodes += np.less_equal(self.pct_od_values, 1).sum()
-                    if np.min(self.pct_od_values) < self.pct_od_info.min:
-                        self.pct_od_info.min = np.min(self.pct_od_values)
-                    if np.max(self.pct_od_values) > self.pct_od_info.max:
-                        self.pct_od_info.max = np.max(self.pct_od_values)
-
-                    for pct_od in self.pct_od_values:
-                        # logger.debug("- value: %s" % pct_od)
-                        pct_od_key = round(pct_od * self.pct_od_mul)
-                        if np.isfinite(pct_od_key):
-                            self.pct_od_dict[int(pct_od_key)] += 1
-
-            # - pct cc
-            if self.full_coverage:
-                if len(self.pct_cc_values) > 0:
-
-                    # logger.debug("populating pct od dict")
-                    self.pct_cc_info.nr_of_nodes += len(self.pct_cc_values)
-                    self.pct_cc_info.nr_of_passed_nodes += np.less_equal(self.pct_cc_values, 1).sum()
-                    if np.min(self.pct_cc_values) < self.pct_cc_info.min:
-                        self.pct_cc_info.min = np.min(self.pct_cc_values)
-                    if np.max(self.pct_cc_values) > self.pct_cc_info.max:
-                        self.pct_cc_info.max = np.max(self.pct_cc_values)
-
-                    for pct_cc in self.pct_cc_values:
-                        # logger.debug("- value: %s" % pct_cc)
-                        pct_cc_key = round(pct_cc * self.pct_cc_mul)
-                        if np.isfinite(pct_cc_key):
-                            self.pct_cc_dict[int(pct_cc_key)] += 1
-
-        # catzoc a1
-        if self.has_product_uncertainty and self._hist_catzoc_a1:
-            if len(self.catzoc_a1_values) > 0:
-                self.catzoc_a1_info.nr_of_nodes += len(self.catzoc_a1_values)
-                self.catzoc_a1_info.nr_of_passed_nodes += np.less_equal(self.catzoc_a1_values, 1).sum()
-                if np.min(self.catzoc_a1_values) < self.catzoc_a1_info.min:
-                    self.catzoc_a1_info.min = np.min(self.catzoc_a1_values)
-                if np.max(self.catzoc_a1_values) > self.catzoc_a1_info.max:
-                    self.catzoc_a1_info.max = np.max(self.catzoc_a1_values)
-
-                for catzoc_a1 in self.catzoc_a1_values:
-                    catzoc_a1_key = int(round(catzoc_a1 * self.catzoc_a1_mul))
-                    self.catzoc_a1_dict[catzoc_a1_key] += 1
-
-        # catzoc a2 / catzoc b (a2b)
-        if self.has_product_uncertainty and self._hist_catzoc_a2b:
-            if len(self.catzoc_a2b_values) > 0:
-                self.catzoc_a2b_info.nr_of_nodes += len(self.catzoc_a2b_values)
-                self.catzoc_a2b_info.nr_of_passed_nodes += np.less_equal(self.catzoc_a2b_values, 1).sum()
-                if np.min(self.catzoc_a2b_values) < self.catzoc_a2b_info.min:
-                    self.catzoc_a2b_info.min = np.min(self.catzoc_a2b_values)
-                if np.max(self.catzoc_a2b_values) > self.catzoc_a2b_info.max:
-                    self.catzoc_a2b_info.max = np.max(self.catzoc_a2b_values)
-
-                for catzoc_a2b in self.catzoc_a2b_values:
-                    catzoc_a2b_key = int(round(catzoc_a2b * self.catzoc_a2b_mul))
-                    self.catzoc_a2b_dict[catzoc_a2b_key] += 1
-
-        # catzoc c
-        if self.has_product_uncertainty and self._hist_catzoc_c:
-            if len(self.catzoc_c_values) > 0:
-                self.catzoc_c_info.nr_of_nodes += len(self.catzoc_c_values)
-                self.catzoc_c_info.nr_of_passed_nodes += np.less_equal(self.catzoc_c_values, 1).sum()
-                if np.min(self.catzoc_c_values) < self.catzoc_c_info.min:
-                    self.catzoc_c_info.min = np.min(self.catzoc_c_values)
-                if np.max(self.catzoc_c_values) > self.catzoc_c_info.max:
-                    self.catzoc_c_info.max = np.max(self.catzoc_c_values)
-
-                for catzoc_c in self.catzoc_c_values:
-                    catzoc_c_key = int(round(catzoc_c * self.catzoc_c_mul))
-                    self.catzoc_c_dict[catzoc_c_key] += 1
+                self.bathy_hist.mul = self.bathy_mul
+        return tile
+
+    def _new_histograms(self, bathy_mul: int) -> dict:
+        return {
+            'bathy': GridQAHistogram(mul=bathy_mul),
+            'density': GridQAHistogram(mul=self.density_mul, pass_min=5),
+            'tvu_qc': GridQAHistogram(mul=self.tvu_qc_mul, pass_max=1),
+            'pct_od': GridQAHistogram(mul=self.pct_od_mul, pass_max=1),
+            'pct_cc': GridQAHistogram(mul=self.pct_cc_mul, pass_max=1),
+            'catzoc_a1': GridQAHistogram(mul=self.catzoc_a1_mul, pass_max=1),
+            'catzoc_a2b': GridQAHistogram(mul=self.catzoc_a2b_mul, pass_max=1),
+            'catzoc_c': GridQAHistogram(mul=self.catzoc_c_mul, pass_max=1),
+        }
 
     def _init_infos(self):
 
@@ -778,10 +710,100 @@ class GridQAV6(BaseGridQA):
             self.pct_cc_info.histo_y_label = "Percentage of nodes in each resolution group"
             self.pct_cc_info.basename = self.grids.current_basename
 
-    def _create_arrays(self):
-        """Take care to populate the various arrays"""
+    def _update_infos(self):
+        """Copy the node statistics of the histograms to the grid infos"""
+        self.bathy_hist.update_info(self.bathy_info)
+        self.density_hist.update_info(self.density_info)
+        self.tvu_qc_hist.update_info(self.tvu_qc_info)
+        if self.objection_detection:
+            self.pct_od_hist.update_info(self.pct_od_info)
+        if self.full_coverage:
+            self.pct_cc_hist.update_info(self.pct_cc_info)
+        self.catzoc_a1_hist.update_info(self.catzoc_a1_info)
+        self.catzoc_a2b_hist.update_info(self.catzoc_a2b_info)
+        self.catzoc_c_hist.update_info(self.catzoc_c_info)
+
+    # stats
+
+    def stats(self) -> GridQAStats:
+        """Collect the accumulated histograms and grid infos"""
+        stats = GridQAStats(basename=self.grid_basename, is_vr=self.grid_is_vr)
+        stats.settings = {
+            'force_tvu_qc': self.force_tvu_qc,
+            'has_depth': self.has_depth,
+            'has_product_uncertainty': self.has_product_uncertainty,
+            'has_density': self.has_density,
+            'has_tvu_qc': self.has_tvu_qc,
+            'object_detection': self.objection_detection,
+            'full_coverage': self.full_coverage,
+            'hist_depth': self._hist_depth,
+            'hist_density': self._hist_density,
+            'hist_tvu_qc': self._hist_tvu_qc,
+            'hist_pct_res': self._hist_pct_res,
+            'hist_catzoc_a1': self._hist_catzoc_a1,
+            'hist_catzoc_a2b': self._hist_catzoc_a2b,
+            'hist_catzoc_c': self._hist_catzoc_c,
+            'depth_vs_density': self._depth_vs_density,
+            'depth_vs_tvu_qc': self._depth_vs_tvu_qc,
+        }
+        for name in self.hist_names:
+            hist = getattr(self, "%s_hist" % name)
+            if hist is not None:
+                stats.hists[name] = hist
+            info = getattr(self, "%s_info" % name)
+            if info is not None:
+                stats.infos[name] = dict(vars(info))
+        for name in ('density', 'tvu_qc'):
+            hist_2d = getattr(self, "%s_hist_2d" % name)
+            if hist_2d is not None:
+                stats.hists_2d[name] = hist_2d
+        return stats
+
+    def write_stats(self, path: Optional[str] = None) -> str:
+        """Save the stats next to the png files (by default), returning the path of the .json file"""
+        if path is None:
+            path = os.path.join(self.output_folder, "%s%s.json" % (os.path.splitext(self.grid_basename)[0],
+                                                                   GridQAStats.ext))
+            path = Helper.truncate_too_long(path, left_truncation=True)
+        return self.stats().save(path)
+
+    @classmethod
+    def from_stats(cls, stats, output_folder: Optional[str] = None) -> 'GridQAV6':
+        """Create a Grid QA from saved (or aggregated) stats, so that the plots can be rendered without the grid
+
+        Usage example:
+            qa = GridQAV6.from_stats("H12345_MB_1m.GQv6.stats.json")
+            qa.render()
+        """
+        if not isinstance(stats, GridQAStats):
+            if output_folder is None:
+                output_folder = os.path.dirname(os.path.abspath(stats))
+            stats = GridQAStats.load(stats)
+        if output_folder is None:
+            raise RuntimeError("missing output folder to render the stats of %s" % stats.basename)
+
+        qa = cls(grids=None, output_folder=output_folder, save_stats=False, **stats.settings)
+        qa.grid_basename = stats.basename
+        qa.grid_is_vr = stats.is_vr
+        for name, hist in stats.hists.items():
+            setattr(qa, "%s_hist" % name, hist)
+            setattr(qa, "%s_mul" % name, hist.mul)
+        for name, values in stats.infos.items():
+            info = GridInfoV6()
+            info.__dict__.update(values)
+            setattr(qa, "%s_info" % name, info)
+        for name, hist_2d in stats.hists_2d.items():
+            setattr(qa, "%s_hist_2d" % name, hist_2d)
+        qa._update_infos()
+        return qa
+
+    def _read_tile(self) -> Optional[GridQATile]:
+        """Extract the layers of the current tile as plain arrays (None if without depth values)"""
 
         tile = self.grids.tiles[0]
+        qa_tile = GridQATile()
+        # the arrays passed to the worker processes are pickled after the release of the tile
+        copy = self.workers > 1
         # logger.debug("types: %s" % (list(tile.types),))
 
         # - depth layer
@@ -791,17 +813,23 @@ class GridQAV6(BaseGridQA):
         # logger.debug("depth layer: %s [idx: %s]" % (self.grids.grid_data_type(depth_type), depth_idx))
 
         if depth_type == GRIDS_DOUBLE:
-            self.bathy_values = -tile.doubles[depth_idx][tile.doubles[depth_idx] != tile.doubles_nodata[depth_idx]]
+            depth = tile.doubles[depth_idx]
+            qa_tile.bathy_values = -depth[depth != tile.doubles_nodata[depth_idx]]
 
         elif depth_type == GRIDS_FLOAT:
-            self.bathy_values = -tile.floats[depth_idx][tile.floats[depth_idx] != tile.floats_nodata[depth_idx]]
+            depth = tile.floats[depth_idx]
+            qa_tile.bathy_values = -depth[depth != tile.floats_nodata[depth_idx]]
 
         elif depth_type == "KLUSTER_FLOAT32":
-            self.bathy_values = tile.layers[depth_idx][~np.isnan(tile.layers[depth_idx])]
+            depth = tile.layers[depth_idx]
+            qa_tile.bathy_values = depth[~np.isnan(depth)]
 
         else:
             raise RuntimeError("Unsupported data type for bathy: %s" % depth_type)
-        logger.debug('depth values: %s [%s]' % (self.bathy_values.shape, self.bathy_values.dtype))
+        logger.debug('depth values: %s [%s]' % (qa_tile.bathy_values.shape, qa_tile.bathy_values.dtype))
+        if len(qa_tile.bathy_values) == 0:
+            logger.warning("missing depth values!")
+            return None
 
         # - density layer
 
@@ -811,228 +839,77 @@ class GridQAV6(BaseGridQA):
             # logger.debug("density layer: %s [idx: %s]" % (self.grids.grid_data_type(density_type), density_idx))
 
             if density_type == GRIDS_UINT32:
-                self.density_values = \
+                qa_tile.density_values = \
                     tile.uint32s[density_idx][tile.uint32s[density_idx] != tile.uint32s_nodata[density_idx]]
-                if len(self.density_values) == 0:
-                    logger.info("No density values")
             elif density_type == GRIDS_UINT64:
-                self.density_values = \
+                qa_tile.density_values = \
                     tile.uint64s[density_idx][tile.uint64s[density_idx] != tile.uint64s_nodata[density_idx]]
-                if len(self.density_values) == 0:
-                    logger.info("No density values")
             elif density_type == GRIDS_INT32:
-                self.density_values = \
+                qa_tile.density_values = \
                     tile.int32s[density_idx][tile.int32s[density_idx] != tile.int32s_nodata[density_idx]]
-                if len(self.density_values) == 0:
-                    logger.info("No density values")
             elif density_type == GRIDS_INT64:
-                self.density_values = \
+                qa_tile.density_values = \
                     tile.int64s[density_idx][tile.int64s[density_idx] != tile.int64s_nodata[density_idx]]
-                if len(self.density_values) == 0:
-                    logger.info("No density values")
             elif density_type == "KLUSTER_INTEGER32":
-                self.density_values = tile.layers[density_idx][~np.isnan(tile.layers[depth_idx])]
-                if len(self.density_values) == 0:
-                    logger.info("No density values")
+                qa_tile.density_values = tile.layers[density_idx][~np.isnan(tile.layers[depth_idx])]
             else:
                 raise RuntimeError("Unsupported data type for density: %s" % density_type)
-            # logger.debug('density values: %s' % len(self.density_values))
-
-        # tvu qc
-
-        if (self.has_tvu_qc and not self.force_tvu_qc) or self.has_product_uncertainty:
-
-            # calculate the TVU QC layer
-            if self.has_tvu_qc and not self.force_tvu_qc:
-
-                tvu_qc_type = tile.type(self.grids.tvu_qc_layer_name())
-                tvu_qc_idx = tile.band_index(self.grids.tvu_qc_layer_name())
-                # logger.debug("tvu qc layer: %s [idx: %s]" % (self.grids.grid_data_type(tvu_qc_type), tvu_qc_idx))
-                if tvu_qc_type == GRIDS_DOUBLE:
-                    self.tvu_qc_values = \
-                        tile.doubles[tvu_qc_idx][tile.doubles[tvu_qc_idx] != tile.doubles_nodata[tvu_qc_idx]]
-                    if len(self.tvu_qc_values) == 0:
-                        logger.info("No TVU QC values")
-                elif tvu_qc_type == GRIDS_FLOAT:
-                    self.tvu_qc_values = \
-                        tile.floats[tvu_qc_idx][tile.floats[tvu_qc_idx] != tile.floats_nodata[tvu_qc_idx]]
-                    if len(self.tvu_qc_values) == 0:
-                        logger.info("No TVU QC values")
-                else:
-                    raise RuntimeError("Unsupported data type for TVU QC")
-
-            elif self.has_product_uncertainty:
-
-                # logger.info("recalculating TVU QC")
-                uncertainty_type = tile.type(self.grids.product_uncertainty_layer_name())
-                uncertainty_idx = tile.band_index(self.grids.product_uncertainty_layer_name())
-                # logger.debug("uncertainty layer: %s [idx: %s]
-                #  % (self.grids.grid_data_type(uncertainty_type), uncertainty_idx))
-
-                if uncertainty_type == GRIDS_DOUBLE:
-                    if depth_type == GRIDS_DOUBLE:
-                        self.grids.tvu_qc = np.empty_like(tile.doubles[depth_idx])
-                        calc_tvu_qc_dd(-tile.doubles[depth_idx],
-                                       tile.doubles[uncertainty_idx],
-                                       tile.doubles_nodata[uncertainty_idx],
-                                       self.grids.tvu_qc)
-
-                    else:  # float
-                        self.grids.tvu_qc = np.empty_like(tile.floats[depth_idx])
-                        calc_tvu_qc_fd(-tile.floats[depth_idx],
-                                       tile.doubles[uncertainty_idx],
-                                       tile.doubles_nodata[uncertainty_idx],
-                                       self.grids.tvu_qc)
-
-                elif uncertainty_type == GRIDS_FLOAT:
-                    if depth_type == GRIDS_DOUBLE:
-                        self.grids.tvu_qc = np.empty_like(tile.doubles[depth_idx])
-                        calc_tvu_qc_df(-tile.doubles[depth_idx],
-                                       tile.floats[uncertainty_idx],
-                                       tile.floats_nodata[uncertainty_idx],
-                                       self.grids.tvu_qc)
-
-                    else:  # float
-                        self.grids.tvu_qc = np.empty_like(tile.floats[depth_idx])
-                        calc_tvu_qc_ff(-tile.floats[depth_idx],
-                                       tile.floats[uncertainty_idx],
-                                       tile.floats_nodata[uncertainty_idx],
-                                       self.grids.tvu_qc)
-
-                elif uncertainty_type == "KLUSTER_FLOAT32":
-                    self.grids.tvu_qc = np.empty_like(tile.layers[depth_idx])
-                    calc_tvu_qc_ff(-tile.layers[depth_idx],
-                                   tile.layers[uncertainty_idx],
-                                   np.nan,
-                                   self.grids.tvu_qc)
-
-                else:
-                    raise RuntimeError("Unsupported data type for uncertainty: %s" % uncertainty_type)
-                # logger.debug(self.grids.tvu_qc)
-
-                self.tvu_qc_values = np.fabs(self.grids.tvu_qc[~np.isnan(self.grids.tvu_qc)])
-                self.grids.tvu_qc = None
-                # logger.debug("%s" % (self.tvu_qc_values.shape, ))
-                self.tvu_qc_recalculated = True
-                self.tvu_qc_info.histo_x_label = "Node uncertainty as a fraction of allowable IHO TVU (computed)"
-
+            if len(qa_tile.density_values) == 0:
+                logger.info("No density values")
+            # logger.debug('density values: %s' % len(qa_tile.density_values))
+
+        # - tvu qc layer
+
+        if self.has_tvu_qc and not self.force_tvu_qc:
+
+            tvu_qc_type = tile.type(self.grids.tvu_qc_layer_name())
+            tvu_qc_idx = tile.band_index(self.grids.tvu_qc_layer_name())
+            # logger.debug("tvu qc layer: %s [idx: %s]" % (self.grids.grid_data_type(tvu_qc_type), tvu_qc_idx))
+            if tvu_qc_type == GRIDS_DOUBLE:
+                qa_tile.tvu_qc_values = \
+                    tile.doubles[tvu_qc_idx][tile.doubles[tvu_qc_idx] != tile.doubles_nodata[tvu_qc_idx]]
+            elif tvu_qc_type == GRIDS_FLOAT:
+                qa_tile.tvu_qc_values = \
+                    tile.floats[tvu_qc_idx][tile.floats[tvu_qc_idx] != tile.floats_nodata[tvu_qc_idx]]
             else:
-                raise RuntimeError("invalid case for TVU QC calculation")
+                raise RuntimeError("Unsupported data type for TVU QC")
+            if len(qa_tile.tvu_qc_values) == 0:
+                logger.info("No TVU QC values")
 
-            # logger.debug('tvu qc values: %s' % len(self.tvu_qc_values))
+        # - product uncertainty layer (to calculate the TVU QC and CATZOC ratios)
 
-        # catzoc
-        if self.has_product_uncertainty and self._hist_catzoc_a1 or self._hist_catzoc_a2b or self._hist_catzoc_c:
+        recalc_tvu_qc = not (self.has_tvu_qc and not self.force_tvu_qc)
+        if self.has_product_uncertainty and \
+                (recalc_tvu_qc or self._hist_catzoc_a1 or self._hist_catzoc_a2b or self._hist_catzoc_c):
 
-            # logger.info("recalculating TVU QC")
             uncertainty_type = tile.type(self.grids.product_uncertainty_layer_name())
             uncertainty_idx = tile.band_index(self.grids.product_uncertainty_layer_name())
             # logger.debug("uncertainty layer: %s [idx: %s]
             #  % (self.grids.grid_data_type(uncertainty_type), uncertainty_idx))
 
             if uncertainty_type == GRIDS_DOUBLE:
-                if depth_type == GRIDS_DOUBLE:
-                    self.grids.tvu_qc_a1 = np.empty_like(tile.doubles[depth_idx])
-                    calc_tvu_qc_a1_dd(-tile.doubles[depth_idx],
-                                      tile.doubles[uncertainty_idx],
-                                      tile.doubles_nodata[uncertainty_idx],
-                                      self.grids.tvu_qc_a1)
-                    self.grids.tvu_qc_a2b = np.empty_like(tile.doubles[depth_idx])
-                    calc_tvu_qc_a2b_dd(-tile.doubles[depth_idx],
-                                       tile.doubles[uncertainty_idx],
-                                       tile.doubles_nodata[uncertainty_idx],
-                                       self.grids.tvu_qc_a2b)
-                    self.grids.tvu_qc_c = np.empty_like(tile.doubles[depth_idx])
-                    calc_tvu_qc_c_dd(-tile.doubles[depth_idx],
-                                     tile.doubles[uncertainty_idx],
-                                     tile.doubles_nodata[uncertainty_idx],
-                                     self.grids.tvu_qc_c)
-
-                else:  # float
-                    self.grids.tvu_qc_a1 = np.empty_like(tile.floats[depth_idx])
-                    calc_tvu_qc_a1_fd(-tile.floats[depth_idx],
-                                      tile.doubles[uncertainty_idx],
-                                      tile.doubles_nodata[uncertainty_idx],
-                                      self.grids.tvu_qc_a1)
-                    self.grids.tvu_qc_a2b = np.empty_like(tile.floats[depth_idx])
-                    calc_tvu_qc_a2b_fd(-tile.floats[depth_idx],
-                                       tile.doubles[uncertainty_idx],
-                                       tile.doubles_nodata[uncertainty_idx],
-                                       self.grids.tvu_qc_a2b)
-                    self.grids.tvu_qc_c = np.empty_like(tile.floats[depth_idx])
-                    calc_tvu_qc_c_fd(-tile.floats[depth_idx],
-                                     tile.doubles[uncertainty_idx],
-                                     tile.doubles_nodata[uncertainty_idx],
-                                     self.grids.tvu_qc_c)
-
+                qa_tile.uncertainty = tile.doubles[uncertainty_idx]
+                qa_tile.uncertainty_nodata = tile.doubles_nodata[uncertainty_idx]
             elif uncertainty_type == GRIDS_FLOAT:
-                if depth_type == GRIDS_DOUBLE:
-                    self.grids.tvu_qc_a1 = np.empty_like(tile.doubles[depth_idx])
-                    calc_tvu_qc_a1_df(-tile.doubles[depth_idx],
-                                      tile.floats[uncertainty_idx],
-                                      tile.floats_nodata[uncertainty_idx],
-                                      self.grids.tvu_qc_a1)
-                    self.grids.tvu_qc_a2b = np.empty_like(tile.doubles[depth_idx])
-                    calc_tvu_qc_a2b_df(-tile.doubles[depth_idx],
-                                       tile.floats[uncertainty_idx],
-                                       tile.floats_nodata[uncertainty_idx],
-                                       self.grids.tvu_qc_a2b)
-                    self.grids.tvu_qc_c = np.empty_like(tile.doubles[depth_idx])
-                    calc_tvu_qc_c_df(-tile.doubles[depth_idx],
-                                     tile.floats[uncertainty_idx],
-                                     tile.floats_nodata[uncertainty_idx],
-                                     self.grids.tvu_qc_c)
-
-                else:  # float
-                    self.grids.tvu_qc_a1 = np.empty_like(tile.floats[depth_idx])
-                    calc_tvu_qc_a1_ff(-tile.floats[depth_idx],
-                                      tile.floats[uncertainty_idx],
-                                      tile.floats_nodata[uncertainty_idx],
-                                      self.grids.tvu_qc_a1)
-                    self.grids.tvu_qc_a2b = np.empty_like(tile.floats[depth_idx])
-                    calc_tvu_qc_a2b_ff(-tile.floats[depth_idx],
-                                       tile.floats[uncertainty_idx],
-                                       tile.floats_nodata[uncertainty_idx],
-                                       self.grids.tvu_qc_a2b)
-                    self.grids.tvu_qc_c = np.empty_like(tile.floats[depth_idx])
-                    calc_tvu_qc_c_ff(-tile.floats[depth_idx],
-                                     tile.floats[uncertainty_idx],
-                                     tile.floats_nodata[uncertainty_idx],
-                                     self.grids.tvu_qc_c)
-
+                qa_tile.uncertainty = tile.floats[uncertainty_idx]
+                qa_tile.uncertainty_nodata = tile.floats_nodata[uncertainty_idx]
             elif uncertainty_type == "KLUSTER_FLOAT32":
-                self.grids.tvu_qc_a1 = np.empty_like(tile.layers[depth_idx])
-                calc_tvu_qc_a1_ff(-tile.layers[depth_idx],
-                                  tile.layers[uncertainty_idx],
-                                  np.nan,
-                                  self.grids.tvu_qc_a1)
-                self.grids.tvu_qc_a2b = np.empty_like(tile.layers[depth_idx])
-                calc_tvu_qc_a2b_ff(-tile.layers[depth_idx],
-                                   tile.layers[uncertainty_idx],
-                                   np.nan,
-                                   self.grids.tvu_qc_a2b)
-                self.grids.tvu_qc_c = np.empty_like(tile.layers[depth_idx])
-                calc_tvu_qc_c_ff(-tile.layers[depth_idx],
-                                 tile.layers[uncertainty_idx],
-                                 np.nan,
-                                 self.grids.tvu_qc_c)
-
+                qa_tile.uncertainty = tile.layers[uncertainty_idx]
+                qa_tile.uncertainty_nodata = np.nan
             else:
                 raise RuntimeError("Unsupported data type for uncertainty: %s" % uncertainty_type)
-            # logger.debug(self.grids.tvu_qc)
+            qa_tile.depth = depth
 
-            self.catzoc_a1_values = np.fabs(self.grids.tvu_qc_a1[~np.isnan(self.grids.tvu_qc_a1)])
-            self.catzoc_a2b_values = np.fabs(self.grids.tvu_qc_a2b[~np.isnan(self.grids.tvu_qc_a2b)])
-            self.catzoc_c_values = np.fabs(self.grids.tvu_qc_c[~np.isnan(self.grids.tvu_qc_c)])
-            self.grids.tvu_qc_a1 = None
-            self.grids.tvu_qc_a2b = None
-            self.grids.tvu_qc_c = None
+            if copy:
+                qa_tile.depth = np.array(qa_tile.depth)
+                qa_tile.uncertainty = np.array(qa_tile.uncertainty)
 
-            # self.tvu_qc_recalculated = True
-            # self.tvu_qc_info.histo_x_label = "Node uncertainty as a fraction of allowable IHO TVU (computed)"
+            if recalc_tvu_qc:
+                self.tvu_qc_recalculated = True
+                self.tvu_qc_info.histo_x_label = "Node uncertainty as a fraction of allowable IHO TVU (computed)"
 
         if not self.grids.is_vr():
-            return
+            return qa_tile
 
         # Resolution percentage layers
         pct_success = tile.calculate_pct_of_allowable_resolution(self.grids.depth_layer_name())
@@ -1046,13 +923,13 @@ class GridQAV6(BaseGridQA):
             # logger.debug("pct od layer: %s [idx: %s]" % (self.grids.grid_data_type(pct_od_type), pct_od_idx))
 
             if pct_od_type == GRIDS_FLOAT:
-                self.pct_od_values = \
+                qa_tile.pct_od_values = \
                     tile.floats[pct_od_idx][tile.floats[pct_od_idx] != tile.floats_nodata[pct_od_idx]]
-                if len(self.pct_od_values) == 0:
+                if len(qa_tile.pct_od_values) == 0:
                     logger.info("No pct od values")
             else:
                 raise RuntimeError("Unsupported data type for density")
-            # logger.debug('pct od values: %s' % len(self.pct_od_values))
+            # logger.debug('pct od values: %s' % len(qa_tile.pct_od_values))
 
         # - complete coverage
         if self.full_coverage:
@@ -1062,16 +939,106 @@ class GridQAV6(BaseGridQA):
             # logger.debug("pct cc layer: %s [idx: %s]" % (self.grids.grid_data_type(pct_cc_type), pct_cc_idx))
 
             if pct_cc_type == GRIDS_FLOAT:
-                self.pct_cc_values = \
+                qa_tile.pct_cc_values = \
                     tile.floats[pct_cc_idx][tile.floats[pct_cc_idx] != tile.floats_nodata[pct_cc_idx]]
-                if len(self.pct_cc_values) == 0:
+                if len(qa_tile.pct_cc_values) == 0:
                     logger.info("No pct cc values")
             else:
                 raise RuntimeError("Unsupported data type for density")
-            # logger.debug('pct cc values: %s' % len(self.pct_cc_values))
+            # logger.debug('pct cc values: %s' % len(qa_tile.pct_cc_values))
+
+        return qa_tile
+
+    def _add_tvu_ratios(self, tile: GridQATile, hists: dict, calc_tvu_qc: bool) -> Optional[tuple]:
+        """Add the TVU QC and CATZOC ratios of the tile to the histograms, with a single pass on the layers
+
+        The ratios are calculated by blocks of rows, so that no full-size array is created. If the depth vs. TVU QC
+        plot is enabled, the depths and the TVU QC ratios are returned.
+        """
+        if tile.depth.dtype == np.float64:
+            calc = calc_tvu_ratios_dd if tile.uncertainty.dtype == np.float64 else calc_tvu_ratios_df
+        else:
+            calc = calc_tvu_ratios_fd if tile.uncertainty.dtype == np.float64 else calc_tvu_ratios_ff
+
+        targets = [hists['tvu_qc'] if calc_tvu_qc else None,
+                   hists['catzoc_a1'] if self._hist_catzoc_a1 else None,
+                   hists['catzoc_a2b'] if self._hist_catzoc_a2b else None,
+                   hists['catzoc_c'] if self._hist_catzoc_c else None]
+        active = [target is not None for target in targets]
+        plot_tvu_qc = calc_tvu_qc and self._depth_vs_tvu_qc
+
+        rows, cols = tile.depth.shape
+        block_rows = max(1, self.ratios_block_size // max(1, cols))
+        ratios = np.empty((5, min(rows, block_rows) * cols), dtype=tile.depth.dtype)
+        counts = np.zeros(4, dtype=np.int64)
+        plot_blocks = list()
+        for r0 in range(0, rows, block_rows):
+            calc(tile.depth[r0:r0 + block_rows], tile.uncertainty[r0:r0 + block_rows], tile.uncertainty_nodata,
+                 active[0], active[1], active[2], active[3], ratios, counts)
+            for idx, target in enumerate(targets):
+                if target is not None:
+                    target.add(ratios[idx, :counts[idx]])
+            if plot_tvu_qc:
+                plot_blocks.append(ratios[[4, 0], :counts[0]])
+
+        if not plot_tvu_qc:
+            return None
+        plot_values = np.concatenate(plot_blocks, axis=1)
+        return plot_values[0], plot_values[1]
+
+    def _map_tile(self, tile: GridQATile, bathy_mul: int) -> dict:
+        """Calculate the partial histograms of a tile (the TVU ratios are calculated from the uncertainty)"""
+        hists = self._new_histograms(bathy_mul=bathy_mul)
+        partial = {'hists': hists, 'depth_vs_tvu_qc': None}
+
+        # bathy
+        hists['bathy'].add(tile.bathy_values)
+
+        # density
+        if self.has_density:
+            hists['density'].add(tile.density_values)
+
+        # tvu qc (from the layer)
+        if tile.tvu_qc_values is not None:
+            hists['tvu_qc'].add(tile.tvu_qc_values)
+            if self._depth_vs_tvu_qc:
+                partial['depth_vs_tvu_qc'] = (tile.bathy_values, tile.tvu_qc_values)
+
+        # res pct
+        if tile.pct_od_values is not None:
+            hists['pct_od'].add(tile.pct_od_values)
+        if tile.pct_cc_values is not None:
+            hists['pct_cc'].add(tile.pct_cc_values)
+
+        # tvu qc (if not from the layer) and catzoc a1, a2 / b (a2b), c
+        if tile.uncertainty is not None:
+            depth_vs_tvu_qc = self._add_tvu_ratios(tile=tile, hists=hists, calc_tvu_qc=tile.tvu_qc_values is None)
+            if depth_vs_tvu_qc is not None:
+                partial['depth_vs_tvu_qc'] = depth_vs_tvu_qc
+
+        return partial
+
+    def _reduce_tile(self, tile: GridQATile, partial: dict) -> None:
+        """Merge the partial histograms of a tile, and add its nodes to the depth-vs plots"""
+        for name, hist in partial['hists'].items():
+            getattr(self, "%s_hist" % name).merge(hist)
+
+        if self.has_density and self._depth_vs_density and (len(tile.density_values) > 0):
+            self._update_plot_depth_vs_density(bathy_values=tile.bathy_values, density_values=tile.density_values)
+
+        if (partial['depth_vs_tvu_qc'] is not None) and (len(partial['depth_vs_tvu_qc'][1]) > 0):
+            self._update_plot_depth_vs_tvu_qc(bathy_values=partial['depth_vs_tvu_qc'][0],
+                                              tvu_qc_values=partial['depth_vs_tvu_qc'][1])
 
     # plotting
 
+    @classmethod
+    def _new_figure(cls):
+        """Create a figure without pyplot, so that no GUI backend is required (e.g., for batch jobs)"""
+        # matplotlib is only loaded when a plot is saved
+        from matplotlib.figure import Figure
+        return Figure()
+
     @classmethod
     def plot_hysto(cls, layer_name, bins, density, bin_width, grid_info, png_path, hist_color=None):
         logger.debug("saving %s histogram as %s" % (layer_name, png_path))
@@ -1109,7 +1076,7 @@ class GridQAV6(BaseGridQA):
             sub_title_3 = 'Percentiles: 2.5%%=%.0f, Q1=%.0f, median=%.0f, Q3=%.0f, 97.5%%=%.0f' \
                           % (grid_info.p2_5, grid_info.q1, grid_info.median, grid_info.q3, grid_info.p97_5)
 
-        fig = plt.figure()
+        fig = cls._new_figure()
         ax = fig.add_axes([0.1, 0.1, 0.81, 0.68])  # leaving room for title & subtitle
 
         hist_color = (.17, .55, .75) if hist_color is None else hist_color
@@ -1145,31 +1112,47 @@ class GridQAV6(BaseGridQA):
         ax.set_ylabel(grid_info.histo_y_label)
 
         str_fmt = '%.1f%%' if ax.get_ylim()[-1] < 10 else '%.0f%%'
+        from matplotlib.ticker import FormatStrFormatter
         ax.yaxis.set_major_formatter(FormatStrFormatter(str_fmt))
 
         fig.savefig(png_path, dpi=144, format='png')
-        plt.close()
 
-    def _init_plot_depth_vs_density(self):
-        self.density_fig = plt.figure()
-        self.density_ax = self.density_fig.add_axes([0.1, 0.1, 0.8, 0.74])
+    @classmethod
+    def _plot_hist_2d(cls, ax, hist_2d: GridQAHistogram2D) -> None:
+        """Draw the bins with passed (blue) and failed (red) nodes"""
+        if hist_2d.nr_of_nodes == 0:
+            return
 
-    def _update_plot_depth_vs_density(self):
+        from matplotlib.colors import ListedColormap
 
-        other_indices = self.density_values.argsort()
-        other_len = len(self.density_values)
+        for counts, color in ((hist_2d.passed, 'b'), (hist_2d.failed, 'r')):
+            if counts.sum() == 0:
+                continue
+            ax.pcolormesh(hist_2d.x_edges, hist_2d.y_edges, np.ma.masked_equal(counts.T, 0),
+                          cmap=ListedColormap([color]), alpha=0.5, shading='flat')
 
-        d_idx0 = self.density_values[other_indices].searchsorted(5, 'left')
-        pass_slice, fail_slice = slice(d_idx0, other_len), slice(0, d_idx0)
+    def _init_plot_depth_vs_density(self):
+        self.density_hist_2d = GridQAHistogram2D(log_x=True)
+
+    def _update_plot_depth_vs_density(self, bathy_values: np.ndarray, density_values: np.ndarray):
+
+        if len(bathy_values) != len(density_values):
+            logger.warning("skipping depth vs. density for mismatching layers: %d, %d"
+                           % (len(bathy_values), len(density_values)))
+            return
 
-        self.density_ax.plot(self.density_values[other_indices][pass_slice],
-                             self.bathy_values[other_indices][pass_slice], 'b+', alpha=0.5)
-        self.density_ax.plot(self.density_values[other_indices][fail_slice],
-                             self.bathy_values[other_indices][fail_slice], 'r+', alpha=0.5)
+        self.density_hist_2d.add(x=density_values.astype(np.float64), y=bathy_values,
+                                 passed=np.greater_equal(density_values, 5))
 
     def _finish_plot_depth_vs_density(self):
 
+        self.density_fig = self._new_figure()
+        self.density_ax = self.density_fig.add_axes([0.1, 0.1, 0.8, 0.74])
+
+        self._plot_hist_2d(ax=self.density_ax, hist_2d=self.density_hist_2d)
+
         if self.density_info.nr_of_nodes > 1000:
+            from matplotlib.ticker import ScalarFormatter
             self.density_ax.set_xscale('log')
             self.density_ax.get_xaxis().set_major_formatter(ScalarFormatter())
 
@@ -1181,7 +1164,7 @@ class GridQAV6(BaseGridQA):
                               fontsize=12, ha='center')
         self.density_ax.set_ylabel('Depth')
 
-        png_file = "%s.GQv6.depth_vs_density.png" % os.path.splitext(self.grids.current_basename)[0]
+        png_file = "%s.GQv6.depth_vs_density.png" % os.path.splitext(self.grid_basename)[0]
         png_path = os.path.join(self.output_folder, png_file)
         png_path = Helper.truncate_too_long(png_path, left_truncation=True)
 
@@ -1190,31 +1173,23 @@ class GridQAV6(BaseGridQA):
         self.density_fig.savefig(png_path, dpi=144, format='png')
 
     def _init_plot_depth_vs_tvu_qc(self):
-        self.tvu_qc_fig = plt.figure()
-        self.tvu_qc_ax = self.tvu_qc_fig.add_axes([0.1, 0.1, 0.8, 0.74])
-
-    def _update_plot_depth_vs_tvu_qc(self):
+        self.tvu_qc_hist_2d = GridQAHistogram2D()
 
-        other_indices = self.tvu_qc_values.argsort()
-        other_len = len(self.tvu_qc_values)
+    def _update_plot_depth_vs_tvu_qc(self, bathy_values: np.ndarray, tvu_qc_values: np.ndarray):
 
-        d_idx0 = self.tvu_qc_values[other_indices].searchsorted(1, 'right')
-        pass_slice, fail_slice = slice(0, d_idx0), slice(d_idx0, other_len)
-
-        try:
-            self.tvu_qc_ax.plot(self.tvu_qc_values[other_indices][pass_slice],
-                                self.bathy_values[other_indices][pass_slice], 'b+', alpha=0.5)
-        except IndexError as e:
-            logger.error("index issue while plotting pass slide, %s" % (e,))
+        if len(bathy_values) != len(tvu_qc_values):
+            logger.warning("skipping depth vs. TVU QC for mismatching layers: %d, %d"
+                           % (len(bathy_values), len(tvu_qc_values)))
+            return
 
-        try:
-            self.tvu_qc_ax.plot(self.tvu_qc_values[other_indices][fail_slice],
-                                self.bathy_values[other_indices][fail_slice], 'r+', alpha=0.5)
-        except IndexError as e:
-            logger.error("index issue while plotting fail slice, %s" % (e,))
+        self.tvu_qc_hist_2d.add(x=tvu_qc_values, y=bathy_values, passed=np.less_equal(tvu_qc_values, 1))
 
     def _finish_plot_depth_vs_tvu_qc(self):
 
+        self.tvu_qc_fig = self._new_figure()
+        self.tvu_qc_ax = self.tvu_qc_fig.add_axes([0.1, 0.1, 0.8, 0.74])
+
+        self._plot_hist_2d(ax=self.tvu_qc_ax, hist_2d=self.tvu_qc_hist_2d)
         self.tvu_qc_ax.grid()
         self.tvu_qc_ax.set_xlim((round(self.tvu_qc_info.min / 0.1) * 0.1, self.tvu_qc_ax.get_xlim()[-1]))
         self.tvu_qc_ax.set_ylim(self.tvu_qc_ax.get_ylim()[::-1])
@@ -1223,7 +1198,7 @@ class GridQAV6(BaseGridQA):
                              fontsize=12, ha='center')
         self.tvu_qc_ax.set_ylabel('Depth')
 
-        png_file = "%s.GQv6.depth_vs_tvu_qc.png" % os.path.splitext(self.grids.current_basename)[0]
+        png_file = "%s.GQv6.depth_vs_tvu_qc.png" % os.path.splitext(self.grid_basename)[0]
         png_path = os.path.join(self.output_folder, png_file)
         png_path = Helper.truncate_too_long(png_path, left_truncation=True)
 
@@ -1245,3 +1220,17 @@ class GridQAV6(BaseGridQA):
             out_path = Helper.truncate_too_long(png_path.replace('.png', '.zoom_on_good_data.png'),
                                                 left_truncation=True)
             self.tvu_qc_fig.savefig(out_path, dpi=144, format='png')
+
+
+# ### WORKER PROCESSES ###
+
+_tile_qa = None  # type: Optional[GridQAV6]
+
+
+def _init_qa_worker(qa: GridQAV6) -> None:
+    global _tile_qa
+    _tile_qa = qa
+
+
+def _grid_qa_tile(tile: GridQATile, bathy_mul: int) -> dict:
+    return _tile_qa._map_tile(tile, bathy_mul=bathy_mul)
@@ -0,0 +1,270 @@
+import logging
+import sys
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class GridQAHistogram:
+    """Fixed-binning histogram accumulator with the node statistics used by the Grid QA
+
+    Each value is binned on the integer key round(value * mul). The histograms of different tiles can be
+    merged in any order.
+    """
+
+    max_dense_span = 1 << 20  # type: int  # larger key spans are counted with a sort
+
+    def __init__(self, mul: int = 1, pass_min: Optional[float] = None, pass_max: Optional[float] = None) -> None:
+        self.mul = mul  # type: int
+        self.pass_min = pass_min  # type: Optional[float]
+        self.pass_max = pass_max  # type: Optional[float]
+
+        self.keys = np.zeros(0, dtype=np.int64)  # type: np.ndarray
+        self.counts = np.zeros(0, dtype=np.int64)  # type: np.ndarray
+
+        self.nr_of_nodes = 0
+        self.nr_of_passed_nodes = 0
+        self.min = sys.maxsize
+        self.max = -sys.maxsize - 1
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def bins(self) -> np.ndarray:
+        return self.keys / self.mul
+
+    def add(self, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+
+        self.nr_of_nodes += len(values)
+        if self.pass_min is not None:
+            self.nr_of_passed_nodes += np.greater_equal(values, self.pass_min).sum()
+        if self.pass_max is not None:
+            self.nr_of_passed_nodes += np.less_equal(values, self.pass_max).sum()
+        v_min = np.min(values)
+        if v_min < self.min:
+            self.min = v_min
+        v_max = np.max(values)
+        if v_max > self.max:
+            self.max = v_max
+
+        if np.issubdtype(values.dtype, np.integer):
+            keys = values.astype(np.int64) * self.mul
+        else:
+            keys = np.rint(values * self.mul)
+            keys = keys[np.isfinite(keys)].astype(np.int64)
+        if len(keys) == 0:
+            return
+
+        k_min = keys.min()
+        if (keys.max() - k_min) < self.max_dense_span:
+            counts = np.bincount(keys - k_min)
+            nz = np.flatnonzero(counts)
+            self._add_counts(nz + k_min, counts[nz])
+        else:
+            self._add_counts(*np.unique(keys, return_counts=True))
+
+    def _add_counts(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        if len(self.keys) == 0:
+            self.keys = keys.astype(np.int64)
+            self.counts = counts.astype(np.int64)
+            return
+
+        self.keys, inverse = np.unique(np.concatenate((self.keys, keys)), return_inverse=True)
+        merged = np.zeros(len(self.keys), dtype=np.int64)
+        np.add.at(merged, inverse, np.concatenate((self.counts, counts)))
+        self.counts = merged
+
+    def merge(self, other: 'GridQAHistogram') -> 'GridQAHistogram':
+        if other.mul != self.mul:
+            raise RuntimeError("unable to merge histograms with different multipliers: %s, %s"
+                               % (self.mul, other.mul))
+
+        self.nr_of_nodes += other.nr_of_nodes
+        self.nr_of_passed_nodes += other.nr_of_passed_nodes
+        if other.min < self.min:
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+        if len(other.keys) > 0:
+            self._add_counts(other.keys, other.counts)
+        return self
+
+    def rebin(self, mul: int) -> 'GridQAHistogram':
+        """Return a copy of the histogram binned with the passed (coarser) multiplier"""
+        hist = GridQAHistogram(mul=mul, pass_min=self.pass_min, pass_max=self.pass_max)
+        hist.nr_of_nodes = self.nr_of_nodes
+        hist.nr_of_passed_nodes = self.nr_of_passed_nodes
+        hist.min = self.min
+        hist.max = self.max
+        if len(self.keys) > 0:
+            keys, inverse = np.unique(np.rint(self.keys * (mul / self.mul)).astype(np.int64), return_inverse=True)
+            counts = np.zeros(len(keys), dtype=np.int64)
+            np.add.at(counts, inverse, self.counts)
+            hist.keys = keys
+            hist.counts = counts
+        return hist
+
+    def update_info(self, info) -> None:
+        """Copy the node statistics to the passed grid info"""
+        info.nr_of_nodes = self.nr_of_nodes
+        info.nr_of_passed_nodes = self.nr_of_passed_nodes
+        info.min = self.min
+        info.max = self.max
+
+    def state(self) -> dict:
+        return {
+            'mul': self.mul,
+            'pass_min': self.pass_min,
+            'pass_max': self.pass_max,
+            'keys': self.keys,
+            'counts': self.counts,
+            'nr_of_nodes': self.nr_of_nodes,
+            'nr_of_passed_nodes': self.nr_of_passed_nodes,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'GridQAHistogram':
+        hist = cls(mul=state['mul'], pass_min=state['pass_min'], pass_max=state['pass_max'])
+        hist.keys = np.asarray(state['keys'], dtype=np.int64)
+        hist.counts = np.asarray(state['counts'], dtype=np.int64)
+        hist.nr_of_nodes = state['nr_of_nodes']
+        hist.nr_of_passed_nodes = state['nr_of_passed_nodes']
+        hist.min = state['min']
+        hist.max = state['max']
+        return hist
+
+
+class GridQAHistogram2D:
+    """Fixed-size 2D histogram of the (x, y) node values, split in passed and failed nodes
+
+    The bin ranges start from the first values, and are extended (doubling the bin widths) to include the following
+    ones, so that the memory does not depend on the number of nodes. With log_x, the x values are binned on log10.
+    """
+
+    def __init__(self, bins: tuple = (512, 512), log_x: bool = False) -> None:
+        self.bins = bins  # type: tuple
+        self.log_x = log_x  # type: bool
+        self.counts = np.zeros((2, bins[0], bins[1]), dtype=np.int64)  # type: np.ndarray  # passed, failed
+        self._origin = [None, None]  # type: list
+        self._width = [None, None]  # type: list
+
+    @property
+    def nr_of_nodes(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def passed(self) -> np.ndarray:
+        return self.counts[0]
+
+    @property
+    def failed(self) -> np.ndarray:
+        return self.counts[1]
+
+    def _edges(self, axis: int) -> Optional[np.ndarray]:
+        if self._origin[axis] is None:
+            return None
+        return self._origin[axis] + self._width[axis] * np.arange(self.bins[axis] + 1)
+
+    @property
+    def x_edges(self) -> Optional[np.ndarray]:
+        edges = self._edges(0)
+        if self.log_x and (edges is not None):
+            return np.power(10.0, edges)
+        return edges
+
+    @property
+    def y_edges(self) -> Optional[np.ndarray]:
+        return self._edges(1)
+
+    def _fit_axis(self, axis: int, v_min: float, v_max: float) -> None:
+        nr_bins = self.bins[axis]
+        if self._origin[axis] is None:
+            span = v_max - v_min
+            if span <= 0.0:
+                span = max(abs(v_min) * 1e-3, 1e-3)
+            self._origin[axis] = v_min
+            self._width[axis] = span * 1.001 / nr_bins
+            return
+
+        while (v_min < self._origin[axis]) or (v_max >= self._origin[axis] + nr_bins * self._width[axis]):
+            # merge the bins in pairs, extending the range toward the values
+            offset = 0
+            if v_min < self._origin[axis]:
+                self._origin[axis] -= nr_bins * self._width[axis]
+                offset = nr_bins
+            self._width[axis] *= 2.0
+
+            merged = np.zeros_like(self.counts)
+            index = [slice(None), slice(None), slice(None)]
+            index[axis + 1] = (np.arange(nr_bins) + offset) // 2
+            np.add.at(merged, tuple(index), self.counts)
+            self.counts = merged
+
+    def add(self, x: np.ndarray, y: np.ndarray, passed: np.ndarray, weights: Optional[np.ndarray] = None) -> None:
+        if self.log_x:
+            # the values below 0.5 (e.g., zero) are counted with 0.5
+            x = np.log10(np.maximum(x, 0.5))
+        valid = np.isfinite(x) & np.isfinite(y)
+        if not np.any(valid):
+            return
+        x = x[valid]
+        y = y[valid]
+        passed = passed[valid]
+        if weights is None:
+            weights = np.ones(len(x), dtype=np.int64)
+        else:
+            weights = weights[valid]
+
+        self._fit_axis(0, np.min(x), np.max(x))
+        self._fit_axis(1, np.min(y), np.max(y))
+
+        ix = np.clip(((x - self._origin[0]) / self._width[0]).astype(np.int64), 0, self.bins[0] - 1)
+        iy = np.clip(((y - self._origin[1]) / self._width[1]).astype(np.int64), 0, self.bins[1] - 1)
+        flat = ix * self.bins[1] + iy
+        size = self.bins[0] * self.bins[1]
+        for idx, selected in enumerate((passed, ~passed)):
+            counts = np.bincount(flat[selected], weights=weights[selected], minlength=size)
+            self.counts[idx] += np.rint(counts).astype(np.int64).reshape(self.bins)
+
+    def merge(self, other: 'GridQAHistogram2D') -> 'GridQAHistogram2D':
+        """Add the bins of another histogram (re-binned on their centers)"""
+        if other.log_x != self.log_x:
+            raise RuntimeError("unable to merge histograms with different x scales")
+        if other.nr_of_nodes == 0:
+            return self
+
+        centers = [other._origin[axis] + other._width[axis] * (np.arange(other.bins[axis]) + 0.5)
+                   for axis in (0, 1)]
+        for counts, passed in ((other.passed, True), (other.failed, False)):
+            ix, iy = np.nonzero(counts)
+            if len(ix) == 0:
+                continue
+            x = centers[0][ix]
+            if self.log_x:
+                x = np.power(10.0, x)
+            self.add(x=x, y=centers[1][iy], passed=np.full(len(ix), passed), weights=counts[ix, iy])
+        return self
+
+    def state(self) -> dict:
+        return {
+            'bins': list(self.bins),
+            'log_x': self.log_x,
+            'origin': list(self._origin),
+            'width': list(self._width),
+            'counts': self.counts,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'GridQAHistogram2D':
+        hist = cls(bins=tuple(state['bins']), log_x=state['log_x'])
+        hist._origin = list(state['origin'])
+        hist._width = list(state['width'])
+        hist.counts = np.asarray(state['counts'], dtype=np.int64)
+        return hist
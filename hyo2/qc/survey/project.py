@@ -2,8 +2,8 @@ import logging
 import os
 import time
 import traceback
-from collections import defaultdict
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
 
 import numpy as np
 from hyo2.abc.lib.gdal_aux import GdalAux
@@ -15,14 +15,19 @@ from hyo2.grids import _grids
 # noinspection PyProtectedMember
 from hyo2.grids._grids import FLOAT as GRIDS_FLOAT, DOUBLE as GRIDS_DOUBLE
 from hyo2.grids.grids_manager import layer_types
+from hyo2.qc import __version__ as lib_version
 from hyo2.qc.common.project import BaseProject
 from hyo2.qc.common.writers.kml_writer import KmlWriter
 from hyo2.qc.common.writers.s57_writer import S57Writer
 from hyo2.qc.common.writers.shp_writer import ShpWriter
 from hyo2.qc.survey.bag_checks.bag_checks_v2 import BagChecksV2
+from hyo2.qc.survey.bag_checks.bag_session import BagSession
+from hyo2.qc.survey.bag_checks.bag_stats import LayerStats
 from hyo2.qc.survey.designated.base_designated import designated_algos
 from hyo2.qc.survey.designated.designated_scan_v2 import DesignatedScanV2
 from hyo2.qc.survey.fliers.find_fliers_v9 import FindFliersV9
+from hyo2.qc.survey.fliers.find_fliers_v9_sweep import FindFliersV9Sweep
+from hyo2.qc.survey.gridqa.grid_qa_stats import GridQAStats
 from hyo2.qc.survey.gridqa.grid_qa_v6 import GridQAV6
 from hyo2.qc.survey.sbdare.base_sbdare import sbdare_algos
 from hyo2.qc.survey.sbdare.sbdare_export_v5 import SbdareExportV5
@@ -48,6 +53,7 @@ class SurveyProject(BaseProject):
 
         # find fliers
         self._fliers = None
+        self._fliers_sweep = list()
         # find fliers outputs
         self.file_fliers_svp = str()
         self.file_fliers_s57 = str()
@@ -66,6 +72,8 @@ class SurveyProject(BaseProject):
 
         # grid qa
         self._qa = None
+        self._qa_survey = None  # type: Optional[GridQAStats]
+        self._qa_survey_results = list()  # type: List[tuple]
 
         # bag checks
         self._bc = None  # type: Optional[BagChecksV2]
@@ -103,6 +111,7 @@ class SurveyProject(BaseProject):
 
         # find fliers
         self._fliers = None
+        self._fliers_sweep = list()
         # find fliers outputs
         self.file_fliers_svp = str()
         self.file_fliers_s57 = str()
@@ -115,6 +124,8 @@ class SurveyProject(BaseProject):
 
         # grid qa
         self._qa = None
+        self._qa_survey = None  # type: Optional[GridQAStats]
+        self._qa_survey_results = list()  # type: List[tuple]
 
         # scan features
         self._scan = None
@@ -158,7 +169,7 @@ class SurveyProject(BaseProject):
     def number_of_fliers(self):
         if not self._fliers:
             return 0
-        return len(self._fliers.flagged_fliers)
+        return len(self._fliers.fliers)
 
     def make_fliers_output_folder(self) -> str:
         # make up the output folder (creating it if it does not exist)
@@ -178,10 +189,10 @@ class SurveyProject(BaseProject):
     def flier_finder_v9(self, height: Optional[float],
                         check_laplacian: bool = False, check_curv: bool = True, check_adjacent: bool = True,
                         check_slivers: bool = True, check_isolated: bool = True, check_edges: bool = False,
-                        check_margins: bool = True,
+                        check_margins: bool = True, halo: int = 0, workers: int = 1, tile_cache: bool = False,
                         filter_fff: bool = False, filter_designated: bool = False,
                         export_bathy: bool = False, export_proxies: bool = False,
-                        export_heights: bool = False, export_curvatures: bool = False,
+                        export_heights: bool = False, export_curvatures: bool = False, export_flags: bool = False,
                         progress_bar: Optional[AbstractProgress] = None):
         """Look for fliers using the passed parameters and the loaded grids"""
         if not self.has_grid():
@@ -200,12 +211,16 @@ class SurveyProject(BaseProject):
                                         check_isolated=check_isolated,
                                         check_edges=check_edges,
                                         check_margins=check_margins,
+                                        halo=halo,
+                                        workers=workers,
+                                        tile_cache=tile_cache,
                                         filter_fff=filter_fff,
                                         filter_designated=filter_designated,
                                         save_bathy=export_bathy,
                                         save_proxies=export_proxies,
                                         save_heights=export_heights,
                                         save_curvatures=export_curvatures,
+                                        save_flags=export_flags,
                                         output_folder=self.make_fliers_output_folder(),
                                         progress_bar=progress_bar)
 
@@ -218,6 +233,61 @@ class SurveyProject(BaseProject):
             self._fliers = None
             raise e
 
+    def flier_finder_v9_sweep(self, configs: List[dict], halo: int = 0, workers: int = 1, tile_cache: bool = False,
+                              export_bathy: bool = False, export_proxies: bool = False,
+                              export_heights: bool = False, export_curvatures: bool = False, export_flags: bool = False,
+                              progress_bar: Optional[AbstractProgress] = None):
+        """Look for fliers with each of the passed configurations, reading the loaded grid once
+
+        Each configuration is a dict with height, checks and filters (see parse_sweep_config).
+        """
+        if not self.has_grid():
+            logger.warning("first load some grids")
+            return
+
+        try:
+            self._gr.select_layers_in_current = [self._gr.depth_layer_name(), ]
+
+            output_folder = self.make_fliers_output_folder()
+            self._fliers_sweep = [FindFliersV9(grids=self._gr,
+                                               halo=halo,
+                                               workers=workers,
+                                               tile_cache=tile_cache,
+                                               save_bathy=export_bathy,
+                                               save_proxies=export_proxies,
+                                               save_heights=export_heights,
+                                               save_curvatures=export_curvatures,
+                                               save_flags=export_flags,
+                                               output_folder=output_folder,
+                                               progress_bar=progress_bar,
+                                               **config) for config in configs]
+
+            start_time = time.time()
+            FindFliersV9Sweep(finders=self._fliers_sweep).run()
+            logger.info("find fliers v9 sweep (%d configurations) -> execution time: %.3f s"
+                        % (len(self._fliers_sweep), time.time() - start_time))
+
+        except Exception as e:
+            traceback.print_exc()
+            self._fliers_sweep = list()
+            raise e
+
+    def flier_finder_v9_sweep_apply_filters(self, distance=1.0, delta_z=0.01) -> None:
+        """Apply the filters selected by each configuration of the last sweep"""
+        for fliers in self._fliers_sweep:
+            self._fliers = fliers
+            if fliers.filter_fff or fliers.filter_designated:
+                self.flier_finder_v9_apply_filters(distance=distance, delta_z=delta_z)
+
+    def save_fliers_sweep(self) -> int:
+        """Save the fliers of each configuration of the last sweep, returning the number of saved results"""
+        nr_saved = 0
+        for fliers in self._fliers_sweep:
+            self._fliers = fliers
+            if self.save_fliers():
+                nr_saved += 1
+        return nr_saved
+
     def find_fliers_v9_apply_filters(self, distance=1.0, delta_z=0.01) -> None:
         self.flier_finder_v9_apply_filters(distance=distance, delta_z=delta_z)
 
@@ -232,7 +302,8 @@ class SurveyProject(BaseProject):
 
             start_time = time.time()
 
-            self._fliers.apply_filters(s57_list=self.s57_list, distance=distance, delta_z=delta_z)
+            self._fliers.apply_filters(s57_list=self.s57_list, distance=distance, delta_z=delta_z,
+                                      s57_cache=self._s57_cache)
 
             logger.info("find fliers v8 filters -> execution time: %.3f s" % (time.time() - start_time))
 
@@ -257,13 +328,13 @@ class SurveyProject(BaseProject):
         s57_file1 = os.path.join(output_folder, "%s.blue_notes.000" % basename)
         s57_file2 = os.path.join(output_folder, "%s.soundings.000" % basename)
 
-        # converting floats to strings (required by blue notes)
-        fliers_for_blue_notes = list()
+        fliers = self._fliers.fliers
+        # converting checks to strings (required by blue notes)
+        fliers_for_blue_notes = [[lon, lat, "%d" % ck] for lon, lat, ck
+                                 in zip(fliers['lon'].tolist(), fliers['lat'].tolist(), fliers['check'].tolist())]
 
-        algos_dict = defaultdict(int)
-        for flagged_flier in self._fliers.flagged_fliers:
-            fliers_for_blue_notes.append([flagged_flier[0], flagged_flier[1], "%.0f" % flagged_flier[2]])
-            algos_dict[flagged_flier[2]] += 1
+        checks, counts = np.unique(fliers['check'], return_counts=True)
+        algos_dict = dict(zip(checks.tolist(), counts.tolist()))
         S57Writer.write_bluenotes(feature_list=fliers_for_blue_notes, path=s57_file1, list_of_list=False)
         logger.debug("flagged per algo: %s" % algos_dict)
         if plot_algos_dict:
@@ -271,17 +342,29 @@ class SurveyProject(BaseProject):
             plt.bar(algos_dict.keys(), algos_dict.values(), 1.0, color='g')
             plt.show()
 
-        S57Writer.write_soundings(feature_list=self._fliers.flagged_fliers, path=s57_file2)
+        # the writers expect a list of [long, lat, check]
+        flagged_fliers = self._fliers.flagged_fliers
+        S57Writer.write_soundings(feature_list=flagged_fliers, path=s57_file2)
         self.file_fliers_s57 = s57_file2
 
+        if self._fliers.save_flags:
+            # noinspection PyBroadException
+            try:
+                tif_file = os.path.join(output_folder, "%s.flags.tif" % basename)
+                self._fliers.save_flags_as_geotiff(geotiff_path=tif_file)
+
+            except Exception:
+                traceback.print_exc()
+                logger.info("issue in writing flags raster")
+
         # noinspection PyBroadException
         try:
             out_file = s57_file2[:-4]
             if self.output_kml:
-                KmlWriter().write_soundings(feature_list=self._fliers.flagged_fliers, path=out_file)
+                KmlWriter().write_soundings(feature_list=flagged_fliers, path=out_file)
 
             if self.output_shp:
-                ShpWriter().write_soundings(feature_list=self._fliers.flagged_fliers, path=out_file)
+                ShpWriter().write_soundings(feature_list=flagged_fliers, path=out_file)
 
         except Exception:
             traceback.print_exc()
@@ -529,9 +612,13 @@ class SurveyProject(BaseProject):
     def grid_qa_v6(self, force_tvu_qc=True, calc_object_detection=True, calc_full_coverage=True,
                    hist_depth=True, hist_density=True, hist_tvu_qc=True, hist_pct_res=True,
                    hist_catzoc_a1=True, hist_catzoc_a2b=True, hist_catzoc_c=True,
-                   depth_vs_density=False, depth_vs_tvu_qc=False,
+                   depth_vs_density=False, depth_vs_tvu_qc=False, workers=1, save_stats=True,
                    progress_bar=None):
-        """Calculate grid QA using the passed parameters and the loaded grids"""
+        """Calculate grid QA using the passed parameters and the loaded grids
+
+        With more than one worker, the tiles are processed by a pool of worker processes. With save_stats, the
+        accumulated statistics are also saved next to the plots (see GridQAV6.from_stats).
+        """
         if not self.has_grid():
             logger.warning("first load some grids")
             return False
@@ -574,7 +661,7 @@ class SurveyProject(BaseProject):
                                 hist_tvu_qc=hist_tvu_qc, hist_pct_res=hist_pct_res, hist_catzoc_a1=hist_catzoc_a1,
                                 hist_catzoc_a2b=hist_catzoc_a2b, hist_catzoc_c=hist_catzoc_c,
                                 depth_vs_density=depth_vs_density, depth_vs_tvu_qc=depth_vs_tvu_qc,
-                                progress=progress_bar)
+                                workers=workers, save_stats=save_stats, progress=progress_bar)
 
             start_time = time.time()
             passed = self._qa.run()
@@ -587,6 +674,91 @@ class SurveyProject(BaseProject):
             self._qa = None
             raise e
 
+    def grid_qa_v6_survey(self, workers: int = 1, **kwargs) -> bool:
+        """Calculate grid QA for each grid in the list, and merge the statistics in survey-wide results
+
+        With more than one worker, the grids are processed by a pool of worker processes. Each grid has the same
+        outputs of grid_qa_v6 (with the passed keyword arguments), while the survey-wide plots and stats are named
+        after the survey label. The merged stats are available as grid_qa_survey_stats.
+        """
+        if len(self.grid_list) == 0:
+            logger.warning("first add some grids")
+            return False
+        if workers < 1:
+            raise RuntimeError("invalid number of workers: %s" % workers)
+
+        start_time = time.time()
+        grid_list = list(self.grid_list)
+        self._qa_survey = None
+        self._qa_survey_results = list()
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_grid_qa_v6_grid, grid_path, self.output_folder, self.output_project_folder,
+                                           self.output_subfolders, kwargs) for grid_path in grid_list]
+                results = [future.result() for future in futures]
+        else:
+            results = [self._grid_qa_v6_grid(grid_path=grid_path, kwargs=kwargs) for grid_path in grid_list]
+
+        self.clear_survey_label()
+        self.survey_label = self.make_survey_label_from_path(grid_list[0])
+        survey_stats = GridQAStats(basename="%s_survey" % self.survey_label)
+        for grid_path, (passed, stats) in zip(grid_list, results):
+            self._qa_survey_results.append((grid_path, passed))
+            if stats is not None:
+                survey_stats.merge(stats)
+        if len(survey_stats.hists) == 0:
+            logger.warning("no Grid QA results to merge")
+            return False
+        self._qa_survey = survey_stats
+
+        qa = GridQAV6.from_stats(survey_stats, output_folder=self.gridqa_output_folder)
+        passed = qa.render()
+        qa.write_stats()
+
+        for name, item in survey_stats.summary().items():
+            if 'pct_of_passed_nodes' in item:
+                logger.info("%s: %.1f%% of all the nodes pass (%s of %s)"
+                            % (name, item['pct_of_passed_nodes'] * 100.0, '{:,}'.format(item['nr_of_passed_nodes']),
+                               '{:,}'.format(item['nr_of_nodes'])))
+        logger.info("Grid QA v6 survey (%d grids) -> execution time: %.3f s"
+                    % (len(grid_list), time.time() - start_time))
+
+        return passed
+
+    def _grid_qa_v6_grid(self, grid_path: str, kwargs: dict) -> tuple:
+        """Calculate grid QA for a grid in the list, returning if passed and the stats (None if failed)"""
+        self.clear_survey_label()
+        self._qa = None
+        try:
+            self.set_cur_grid(path=grid_path)
+            self.open_to_read_cur_grid()
+
+            # as in the GUI, the first TVU QC layer is used
+            tvu_qc_layers = self.cur_grid_tvu_qc_layers()
+            if len(tvu_qc_layers) > 0:
+                self.set_cur_grid_tvu_qc_name(tvu_qc_layers[0])
+
+            passed = self.grid_qa_v6(**kwargs)
+            self.close_cur_grid()
+
+        except Exception as e:
+            logger.warning("unable to calculate grid QA for %s: %s" % (grid_path, e))
+            return False, None
+
+        if self._qa is None:
+            return False, None
+        return passed, self._qa.stats()
+
+    @property
+    def grid_qa_survey_stats(self) -> Optional[GridQAStats]:
+        return self._qa_survey
+
+    @property
+    def grid_qa_survey_results(self) -> List[tuple]:
+        """List of (grid path, passed) of the last survey-wide grid QA"""
+        return self._qa_survey_results
+
     def open_gridqa_output_folder(self):
         logger.info("open %s" % self.gridqa_output_folder)
         Helper.explore_folder(self.gridqa_output_folder)
@@ -613,8 +785,11 @@ class SurveyProject(BaseProject):
     def bag_checks_v2(self, use_nooa_nbs_profile: bool = False, check_structure: bool = False,
                       check_metadata: bool = False, check_elevation: bool = False,
                       check_uncertainty: bool = False, check_tracking_list: bool = False,
-                      check_gdal_compatibility: bool = False, open_output_folder: bool = True):
-        """Check the input BAG files"""
+                      check_gdal_compatibility: bool = False, open_output_folder: bool = True, workers: int = 1):
+        """Check the input BAG files (with workers > 1, the files are checked in a process pool)
+
+        With use_result_cache, the results of the files that are unchanged since an earlier run are reused.
+        """
 
         if not self.has_bag_grid():
             raise RuntimeError("At least one BAG file is required")
@@ -630,7 +805,9 @@ class SurveyProject(BaseProject):
                                check_tracking_list=check_tracking_list,
                                check_gdal_compatibility=check_gdal_compatibility,
                                progress=self.progress,
-                               open_output_folder=open_output_folder)
+                               open_output_folder=open_output_folder,
+                               workers=workers,
+                               result_cache=self.result_cache)
 
         self._bc.run()
 
@@ -1543,7 +1720,30 @@ class SurveyProject(BaseProject):
     # _______________________________________________________________________________
     # ############################## AUXILIARY METHODS ##############################
 
+    def _cached_retrieval(self, path: str, tool: str, func: Callable):
+        """Retrieve a value from a grid file, using the result cache for the unchanged files"""
+        if self.result_cache is None:
+            return func(path)
+
+        options = {'lib_version': lib_version}
+        cached = self.result_cache.read(path=path, tool=tool, options=options)
+        if cached is not None:
+            return cached['value']
+
+        value = func(path)
+        self.result_cache.write(path=path, tool=tool, options=options, result={'value': value})
+        return value
+
     def retrieve_min_depth_tvu(self, path):
+        return self._cached_retrieval(path=path, tool="min_depth_tvu", func=self._retrieve_min_depth_tvu)
+
+    def retrieve_max_uncert(self, path):
+        return self._cached_retrieval(path=path, tool="max_uncert", func=self._retrieve_max_uncert)
+
+    def retrieve_min_uncert(self, path):
+        return self._cached_retrieval(path=path, tool="min_uncert", func=self._retrieve_min_uncert)
+
+    def _retrieve_min_depth_tvu(self, path):
         self.open_grid(path=path)
 
         min_depth = None
@@ -1596,7 +1796,25 @@ class SurveyProject(BaseProject):
 
         return tvu
 
-    def retrieve_max_uncert(self, path):
+    @classmethod
+    def _bag_uncertainty_stats(cls, path: str) -> Optional[LayerStats]:
+        """Streamed uncertainty statistics of a BAG (of the refinements for a VR BAG), None for other formats"""
+        if os.path.splitext(path)[-1].lower() != ".bag":
+            return None
+        with BagSession(path) as session:
+            if not session.is_bag():
+                return None
+            return session.layer_stats(vr=session.is_vr())[1]
+
+    def _retrieve_max_uncert(self, path):
+        uncert_stats = self._bag_uncertainty_stats(path)
+        if uncert_stats is not None:
+            logger.debug("uncertainty: %s" % (uncert_stats,))
+            if uncert_stats.count == 0:
+                logger.warning("unable to retrieve the maximum uncertainty")
+                return None
+            return uncert_stats.max
+
         self.open_grid(path=path)
 
         max_uncert = None
@@ -1645,7 +1863,15 @@ class SurveyProject(BaseProject):
         else:
             return max_uncert
 
-    def retrieve_min_uncert(self, path):
+    def _retrieve_min_uncert(self, path):
+        uncert_stats = self._bag_uncertainty_stats(path)
+        if uncert_stats is not None:
+            logger.debug("uncertainty: %s" % (uncert_stats,))
+            if uncert_stats.count == 0:
+                logger.warning("unable to retrieve the minumum uncertainty")
+                return None
+            return uncert_stats.min
+
         self.open_grid(path=path)
 
         min_uncert = None
@@ -1698,3 +1924,14 @@ class SurveyProject(BaseProject):
         msg = super().__repr__()
         msg += "  <active profile: %s>\n" % Helper.first_match(self.project_profiles, self.active_profile)
         return msg
+
+
+# ### WORKER PROCESSES ###
+
+def _grid_qa_v6_grid(grid_path: str, output_folder: str, output_project_folder: bool, output_subfolders: bool,
+                     kwargs: dict) -> tuple:
+    prj = SurveyProject(output_folder=output_folder)
+    prj.output_project_folder = output_project_folder
+    prj.output_subfolders = output_subfolders
+    prj.add_to_grid_list(grid_path)
+    return prj._grid_qa_v6_grid(grid_path=grid_path, kwargs=kwargs)
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from hyo2.qc.common.result_cache import ResultCache
+
+
+class TestQC2CommonResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_folder = tempfile.TemporaryDirectory()
+        self.cache_folder = os.path.join(self.tmp_folder.name, "cache")
+        self.path = os.path.join(self.tmp_folder.name, "H12345_1m.bag")
+        with open(self.path, 'wb') as fid:
+            fid.write(b"\x00" * 4096)
+        self.options = {'noaa_nbs_profile': True, 'sections': ['structure', 'metadata']}
+
+    def tearDown(self):
+        self.tmp_folder.cleanup()
+
+    def test_memory_cache(self):
+        cache = ResultCache()
+        self.assertIsNone(cache.read(path=self.path, tool="BCv2", options=self.options))
+        cache.write(path=self.path, tool="BCv2", options=self.options, result={'success': True})
+        self.assertEqual(cache.read(path=self.path, tool="BCv2", options=self.options), {'success': True})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_disk_cache(self):
+        ResultCache(cache_folder=self.cache_folder).write(path=self.path, tool="max_uncert", options={},
+                                                          result={'value': 1.5})
+        self.assertEqual(len(os.listdir(self.cache_folder)), 1)
+
+        cache = ResultCache(cache_folder=self.cache_folder)
+        self.assertEqual(cache.read(path=self.path, tool="max_uncert", options={}), {'value': 1.5})
+        self.assertIsNone(cache.read(path=self.path, tool="min_uncert", options={}))
+
+    def test_options(self):
+        cache = ResultCache(cache_folder=self.cache_folder)
+        cache.write(path=self.path, tool="BCv2", options=self.options, result={'success': True})
+        options = dict(self.options)
+        options['noaa_nbs_profile'] = False
+        self.assertIsNone(cache.read(path=self.path, tool="BCv2", options=options))
+
+    def _change_content(self):
+        # same size and modification time, but different content
+        stat = os.stat(self.path)
+        with open(self.path, 'r+b') as fid:
+            first = fid.read(1)
+            fid.seek(0)
+            fid.write(bytes([first[0] ^ 0xff]))
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def test_changed_file(self):
+        cache = ResultCache(cache_folder=self.cache_folder)
+        cache.write(path=self.path, tool="BCv2", options=self.options, result={'success': True})
+        with open(self.path, 'ab') as fid:
+            fid.write(b"\x00")
+        self.assertIsNone(cache.read(path=self.path, tool="BCv2", options=self.options))
+
+    def test_partial_hash(self):
+        for partial_hash in (False, True):
+            cache = ResultCache(cache_folder=self.cache_folder, partial_hash=partial_hash)
+            cache.write(path=self.path, tool="BCv2", options=self.options, result={'success': True})
+            self._change_content()
+            cached = cache.read(path=self.path, tool="BCv2", options=self.options)
+            if partial_hash:
+                self.assertIsNone(cached)
+            else:
+                self.assertIsNotNone(cached)
+
+    def test_clear(self):
+        cache = ResultCache(cache_folder=self.cache_folder)
+        cache.write(path=self.path, tool="BCv2", options=self.options, result={'success': True})
+        cache.write(path=self.path, tool="max_uncert", options={}, result={'value': 1.5})
+        self.assertEqual(len(os.listdir(self.cache_folder)), 2)
+
+        cache.clear()
+        self.assertEqual(len(os.listdir(self.cache_folder)), 0)
+        self.assertIsNone(cache.read(path=self.path, tool="BCv2", options=self.options))
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2CommonResultCache))
+    return s
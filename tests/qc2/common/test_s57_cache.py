@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from hyo2.enc.lib.s57.s57 import S57
+from hyo2.qc.common import testing
+from hyo2.qc.common.s57_cache import S57Cache
+
+
+class TestQC2CommonS57Cache(unittest.TestCase):
+
+    def setUp(self):
+        self.s57_path = testing.input_test_files(".000")[-1]
+        s57 = S57()
+        s57.set_input_filename(self.s57_path)
+        s57.read()
+        self.parsed = s57.input_s57file
+
+    def test_memory_cache(self):
+        cache = S57Cache()
+        self.assertIs(cache.read(self.s57_path), cache.read(self.s57_path))
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_folder:
+            S57Cache(cache_folder=cache_folder).read(self.s57_path)
+            self.assertEqual(len(os.listdir(cache_folder)), 1)
+
+            cached = S57Cache(cache_folder=cache_folder).read(self.s57_path)
+            self.assertEqual(len(cached.rec10s), len(self.parsed.rec10s))
+            for ft, cached_ft in zip(self.parsed.rec10s, cached.rec10s):
+                self.assertEqual(ft.acronym, cached_ft.acronym)
+                self.assertEqual([(attr.acronym, attr.value) for attr in ft.attributes],
+                                 [(attr.acronym, attr.value) for attr in cached_ft.attributes])
+                self.assertEqual([(float(geo.x), float(geo.y)) for geo in ft.geo2s],
+                                 [(geo.x, geo.y) for geo in cached_ft.geo2s])
+                self.assertEqual([(float(geo.x), float(geo.y), float(geo.z)) for geo in ft.geo3s],
+                                 [(geo.x, geo.y, geo.z) for geo in cached_ft.geo3s])
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2CommonS57Cache))
+    return s
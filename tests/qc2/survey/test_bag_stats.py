@@ -0,0 +1,90 @@
+import unittest
+
+import numpy as np
+
+from hyo2.qc.survey.bag_checks.bag_stats import LayerStats, bag_no_data, bag_elevation_path, bag_uncertainty_path, \
+    bag_varres_refinements_path, calc_bag_stats, calc_vr_bag_stats
+
+
+class _Dataset(np.ndarray):
+    """Array with the chunks attribute of an HDF5 dataset"""
+    chunks = None
+
+
+def _dataset(values: np.ndarray, chunks: tuple = None) -> _Dataset:
+    ds = values.view(_Dataset)
+    ds.chunks = chunks
+    return ds
+
+
+class TestQC2SurveyBagStats(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(23)
+        self.elevation = -rng.uniform(-2.0, 50.0, (37, 23)).astype(np.float32)
+        self.elevation[3:7, 4:9] = bag_no_data
+        self.elevation[30, 0] = np.nan
+        self.uncertainty = rng.uniform(0.1, 3.0, (37, 23)).astype(np.float32)
+        self.uncertainty[self.elevation == bag_no_data] = bag_no_data
+        self.uncertainty[11, 11] = -0.5
+
+    @staticmethod
+    def _valid(values: np.ndarray) -> np.ndarray:
+        return values[~np.isnan(values) & (values != bag_no_data)]
+
+    def test_layer_stats(self):
+        stats = LayerStats(threshold=2.0)
+        self.assertTrue(np.isnan(stats.min))
+        stats.add(np.array([np.nan, bag_no_data], dtype=np.float32), no_data=bag_no_data)
+        self.assertTrue(np.isnan(stats.max))
+        stats.add(np.array([1.0, -1.0, 0.0, 3.0, np.nan]), no_data=bag_no_data)
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.nan_count, 3)
+        self.assertEqual(stats.non_positive_count, 2)
+        self.assertEqual(stats.above_threshold_count, 1)
+        self.assertEqual(stats.min_max(), (-1.0, 3.0))
+
+    def test_sr_stats(self):
+        bf = {
+            bag_elevation_path: _dataset(self.elevation, chunks=(4, 23)),
+            bag_uncertainty_path: _dataset(self.uncertainty, chunks=(4, 23)),
+        }
+        for block_nodes in (1, 100, 1 << 22):
+            depth, uncertainty = calc_bag_stats(bf, uncertainty_threshold=2.0, block_nodes=block_nodes)
+
+            valid_depth = -self._valid(self.elevation)
+            self.assertEqual(depth.min_max(), (valid_depth.min(), valid_depth.max()))
+            self.assertEqual(depth.count, valid_depth.size)
+            self.assertEqual(depth.nan_count, self.elevation.size - valid_depth.size)
+            self.assertEqual(depth.non_positive_count, np.count_nonzero(valid_depth <= 0.0))
+
+            valid_uncertainty = self._valid(self.uncertainty)
+            self.assertEqual(uncertainty.min_max(), (valid_uncertainty.min(), valid_uncertainty.max()))
+            self.assertEqual(uncertainty.non_positive_count, 1)
+            self.assertEqual(uncertainty.above_threshold_count, np.count_nonzero(valid_uncertainty > 2.0))
+
+    def test_missing_layer(self):
+        bf = {bag_elevation_path: _dataset(self.elevation)}
+        depth, uncertainty = calc_bag_stats(bf, block_nodes=50)
+        self.assertEqual(depth.count, self._valid(self.elevation).size)
+        self.assertEqual(uncertainty.count, 0)
+        self.assertTrue(np.isnan(uncertainty.max))
+
+    def test_vr_stats(self):
+        refinements = np.zeros((1, self.elevation.size), dtype=[('depth', 'f4'), ('depth_uncrt', 'f4')])
+        refinements['depth'] = self.elevation.reshape(1, -1)
+        refinements['depth_uncrt'] = self.uncertainty.reshape(1, -1)
+        bf = {bag_varres_refinements_path: _dataset(refinements, chunks=(1, 10))}
+        depth, uncertainty = calc_vr_bag_stats(bf, block_nodes=25)
+
+        valid_depth = -self._valid(self.elevation)
+        self.assertEqual(depth.min_max(), (valid_depth.min(), valid_depth.max()))
+        valid_uncertainty = self._valid(self.uncertainty)
+        self.assertEqual(uncertainty.min_max(), (valid_uncertainty.min(), valid_uncertainty.max()))
+        self.assertEqual(uncertainty.nan_count, self.uncertainty.size - valid_uncertainty.size)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2SurveyBagStats))
+    return s
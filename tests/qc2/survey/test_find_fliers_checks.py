@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+from scipy import ndimage
+
+from hyo2.qc.survey.fliers import find_fliers_checks
+
+
+class TestQC2SurveyFindFliersChecks(unittest.TestCase):
+
+    @staticmethod
+    def _dtm(dtype, rows: int = 40, cols: int = 30, seed: int = 0) -> tuple:
+        rng = np.random.default_rng(seed)
+        bathy = (-20.0 + rng.normal(0.0, 0.3, (rows, cols))).astype(dtype)
+        spikes = rng.random((rows, cols)) < 0.02
+        bathy[spikes] -= rng.normal(0.0, 5.0, spikes.sum()).astype(dtype)
+        bathy[rng.random((rows, cols)) > 0.9] = np.nan
+
+        gy, gx = np.gradient(bathy)
+        gxy, gxx = np.gradient(gx)
+        gyy, _ = np.gradient(gy)
+        gauss_curv = ((gxx * gyy - (gxy ** 2)) / (1 + (gx ** 2) + (gy ** 2)) ** 2).astype(dtype)
+        return bathy, gauss_curv
+
+    def _check_fused(self, kind: str, dtype) -> None:
+        height = 1.0
+        curv_th = 0.5
+        for seed in range(10):
+            bathy, gauss_curv = self._dtm(dtype=dtype, seed=seed)
+
+            expected = np.zeros(bathy.shape, dtype=np.uint8)
+            getattr(find_fliers_checks, "check_laplacian_operator_%s" % kind)(
+                ndimage.laplace(bathy), expected, -4. * height)
+            getattr(find_fliers_checks, "check_gaussian_curvature_%s" % kind)(gauss_curv, expected, curv_th)
+            getattr(find_fliers_checks, "check_adjacent_cells_%s" % kind)(bathy, expected, height, 0.75, 0.8)
+
+            flags = np.zeros(bathy.shape, dtype=np.uint8)
+            getattr(find_fliers_checks, "check_fused_%s" % kind)(bathy, gauss_curv, flags, True, -4. * height,
+                                                                 True, curv_th, True, height, 0.75, 0.8)
+            np.testing.assert_array_equal(flags, expected)
+
+    def test_fused_double(self):
+        self._check_fused(kind="double", dtype=np.float64)
+
+    def test_fused_float(self):
+        self._check_fused(kind="float", dtype=np.float32)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2SurveyFindFliersChecks))
+    return s
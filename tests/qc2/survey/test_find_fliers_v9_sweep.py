@@ -0,0 +1,36 @@
+import unittest
+
+from hyo2.qc.survey.fliers.find_fliers_v9_sweep import parse_sweep_config
+
+
+class TestQC2SurveyFindFliersV9Sweep(unittest.TestCase):
+
+    def test_parse_height_checks_filters(self):
+        config = parse_sweep_config("1.5:1235:2")
+        self.assertEqual(config['height'], 1.5)
+        self.assertTrue(config['check_laplacian'])
+        self.assertTrue(config['check_curv'])
+        self.assertTrue(config['check_adjacent'])
+        self.assertFalse(config['check_slivers'])
+        self.assertTrue(config['check_isolated'])
+        self.assertFalse(config['check_edges'])
+        self.assertFalse(config['check_margins'])
+        self.assertFalse(config['filter_fff'])
+        self.assertTrue(config['filter_designated'])
+
+    def test_parse_auto_height(self):
+        config = parse_sweep_config("auto:23")
+        self.assertIsNone(config['height'])
+        self.assertFalse(config['filter_fff'])
+        self.assertFalse(config['filter_designated'])
+
+    def test_parse_invalid(self):
+        for config in ["1.0", "-1.0:1:", "1.0:8:", "1.0:1:3", "one:1:"]:
+            with self.assertRaises(RuntimeError):
+                parse_sweep_config(config)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2SurveyFindFliersV9Sweep))
+    return s
@@ -0,0 +1,101 @@
+import unittest
+from collections import defaultdict
+
+import numpy as np
+
+from hyo2.qc.survey.gridqa.histogram import GridQAHistogram, GridQAHistogram2D
+
+
+def _dict_histogram(values: np.ndarray, mul: int) -> tuple:
+    """Reference binning, as done node by node"""
+    hist = defaultdict(int)
+    for value in values[np.isfinite(values)]:
+        hist[int(round(value * mul))] += 1
+    keys = sorted(hist.keys())
+    return np.array(keys) / mul, np.array([hist[k] for k in keys])
+
+
+class TestQC2SurveyGridQAHistogram(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.values = rng.gamma(2.0, 0.4, 5000).astype(np.float32)
+        self.values[::97] = np.nan
+        self.values[5] = 0.125  # a tie, rounded to even
+
+    def test_same_bins(self):
+        hist = GridQAHistogram(mul=100, pass_max=1)
+        hist.add(self.values)
+        bins, counts = _dict_histogram(self.values, mul=100)
+        np.testing.assert_array_equal(hist.bins, bins)
+        np.testing.assert_array_equal(hist.counts, counts)
+        self.assertEqual(hist.nr_of_nodes, len(self.values))
+        self.assertEqual(hist.nr_of_passed_nodes, np.less_equal(self.values, 1).sum())
+
+    def test_integer_values(self):
+        values = np.array([3, 5, 5, 12, 3, 5], dtype=np.uint32)
+        hist = GridQAHistogram(mul=1, pass_min=5)
+        hist.add(values)
+        np.testing.assert_array_equal(hist.bins, [3, 5, 12])
+        np.testing.assert_array_equal(hist.counts, [2, 3, 1])
+        self.assertEqual(hist.nr_of_passed_nodes, 4)
+        self.assertEqual(hist.min, 3)
+        self.assertEqual(hist.max, 12)
+
+    def test_merge_in_any_order(self):
+        whole = GridQAHistogram(mul=10, pass_max=1)
+        whole.add(self.values)
+
+        tiles = list()
+        for chunk in np.array_split(self.values, 7):
+            tile = GridQAHistogram(mul=10, pass_max=1)
+            tile.add(chunk)
+            tiles.append(tile)
+
+        merged = GridQAHistogram(mul=10, pass_max=1)
+        for idx in (3, 0, 6, 2, 5, 1, 4):
+            merged.merge(tiles[idx])
+
+        np.testing.assert_array_equal(merged.keys, whole.keys)
+        np.testing.assert_array_equal(merged.counts, whole.counts)
+        self.assertEqual(merged.nr_of_nodes, whole.nr_of_nodes)
+        self.assertEqual(merged.nr_of_passed_nodes, whole.nr_of_passed_nodes)
+
+        with self.assertRaises(RuntimeError):
+            merged.merge(GridQAHistogram(mul=100))
+
+    def test_sparse_keys(self):
+        values = np.array([0.0, 1.0e5, 1.0e5, -3.0e4])
+        hist = GridQAHistogram(mul=100)
+        hist.add(values)
+        np.testing.assert_array_equal(hist.bins, [-3.0e4, 0.0, 1.0e5])
+        np.testing.assert_array_equal(hist.counts, [1, 1, 2])
+
+    def test_histogram_2d(self):
+        rng = np.random.default_rng(3)
+        hist = GridQAHistogram2D(bins=(64, 32))
+        all_x = list()
+        for idx in range(10):
+            x = rng.normal(idx, 1.0 + idx, 1000)
+            y = rng.normal(-3.0 * idx, 2.0, 1000)
+            hist.add(x=x, y=y, passed=np.less_equal(x, 1))
+            all_x.append(x)
+        x = np.concatenate(all_x)
+
+        self.assertEqual(hist.counts.shape, (2, 64, 32))
+        self.assertEqual(hist.nr_of_nodes, len(x))
+        self.assertEqual(hist.passed.sum(), np.count_nonzero(x <= 1))
+        self.assertLessEqual(hist.x_edges[0], x.min())
+        self.assertGreater(hist.x_edges[-1], x.max())
+
+        log_hist = GridQAHistogram2D(bins=(16, 16), log_x=True)
+        log_hist.add(x=np.array([0.0, 1.0, 10.0, 1000.0]), y=np.array([1.0, 2.0, 3.0, 4.0]),
+                     passed=np.array([False, False, True, True]))
+        self.assertAlmostEqual(log_hist.x_edges[0], 0.5)
+        self.assertEqual(log_hist.failed.sum(), 2)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2SurveyGridQAHistogram))
+    return s
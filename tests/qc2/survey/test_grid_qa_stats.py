@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from hyo2.qc.survey.gridqa.grid_qa_stats import GridQAStats
+from hyo2.qc.survey.gridqa.histogram import GridQAHistogram, GridQAHistogram2D
+
+
+def _stats(basename: str, seed: int, bathy_mul: int) -> GridQAStats:
+    rng = np.random.default_rng(seed)
+    stats = GridQAStats(basename=basename)
+    stats.settings = {'has_density': True, 'depth_vs_tvu_qc': seed > 0}
+
+    depths = rng.uniform(10.0, 40.0, 2000)
+    tvu_qc = rng.gamma(2.0, 0.3, 2000)
+    stats.hists['bathy'] = GridQAHistogram(mul=bathy_mul)
+    stats.hists['bathy'].add(depths)
+    stats.hists['tvu_qc'] = GridQAHistogram(mul=100, pass_max=1)
+    stats.hists['tvu_qc'].add(tvu_qc)
+    stats.hists_2d['tvu_qc'] = GridQAHistogram2D(bins=(32, 16))
+    stats.hists_2d['tvu_qc'].add(x=tvu_qc, y=depths, passed=np.less_equal(tvu_qc, 1))
+    stats.infos['tvu_qc'] = {'title': "Uncertainty Standards - NOAA HSSD", 'basename': basename, 'mode': 0.4}
+    return stats
+
+
+class TestQC2SurveyGridQAStats(unittest.TestCase):
+
+    def test_save_and_load(self):
+        stats = _stats(basename="H00000_MB_1m.bag", seed=0, bathy_mul=10)
+        with tempfile.TemporaryDirectory() as folder:
+            json_path = stats.save(os.path.join(folder, "H00000_MB_1m" + GridQAStats.ext))
+            self.assertTrue(os.path.exists(json_path.replace(".json", ".npz")))
+            loaded = GridQAStats.load(json_path)
+
+            with open(json_path) as fid:
+                values = json.load(fid)
+            values['version'] = GridQAStats.version + 1
+            with open(json_path, "w") as fod:
+                json.dump(values, fod)
+            with self.assertRaises(RuntimeError):
+                GridQAStats.load(json_path)
+
+        self.assertEqual(loaded.basename, stats.basename)
+        self.assertEqual(loaded.settings, stats.settings)
+        self.assertEqual(loaded.infos, stats.infos)
+        for name, hist in stats.hists.items():
+            np.testing.assert_array_equal(loaded.hists[name].keys, hist.keys)
+            np.testing.assert_array_equal(loaded.hists[name].counts, hist.counts)
+            self.assertEqual(loaded.hists[name].nr_of_passed_nodes, hist.nr_of_passed_nodes)
+            self.assertEqual(loaded.hists[name].max, hist.max)
+        np.testing.assert_array_equal(loaded.hists_2d['tvu_qc'].counts, stats.hists_2d['tvu_qc'].counts)
+        np.testing.assert_array_equal(loaded.hists_2d['tvu_qc'].x_edges, stats.hists_2d['tvu_qc'].x_edges)
+
+    def test_merge(self):
+        first = _stats(basename="H00000_MB_1m.bag", seed=1, bathy_mul=10)
+        second = _stats(basename="H00000_MB_4m.bag", seed=2, bathy_mul=1)
+        nr_of_passed_nodes = first.hists['tvu_qc'].nr_of_passed_nodes + second.hists['tvu_qc'].nr_of_passed_nodes
+
+        merged = GridQAStats(basename="H00000").merge(first).merge(second)
+        self.assertEqual(merged.hists['bathy'].mul, 1)
+        self.assertEqual(merged.hists['bathy'].counts.sum(), 4000)
+        self.assertEqual(merged.hists['tvu_qc'].nr_of_passed_nodes, nr_of_passed_nodes)
+        self.assertEqual(merged.hists_2d['tvu_qc'].nr_of_nodes, 4000)
+        self.assertIsNone(merged.infos['tvu_qc']['mode'])
+        self.assertTrue(merged.settings['depth_vs_tvu_qc'])
+
+        summary = merged.summary()
+        self.assertEqual(summary['bathy']['nr_of_nodes'], 4000)
+        self.assertNotIn('pct_of_passed_nodes', summary['bathy'])
+        self.assertAlmostEqual(summary['tvu_qc']['pct_of_passed_nodes'], nr_of_passed_nodes / 4000.0)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2SurveyGridQAStats))
+    return s
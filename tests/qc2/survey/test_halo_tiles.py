@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from hyo2.qc.survey.fliers.halo_tiles import DepthTile, HaloTiles
+
+
+class TestQC2SurveyHaloTiles(unittest.TestCase):
+
+    @staticmethod
+    def _tiles(nr_tiles: int = 3, rows: int = 4, cols: int = 5) -> list:
+        tiles = list()
+        for i in range(nr_tiles):
+            values = np.arange(rows * cols, dtype=np.float32).reshape(rows, cols) + i * rows * cols
+            tiles.append(DepthTile(values=values, is_double=False,
+                                   transform=[100.0, 2.0, 0.0, 200.0 + i * rows * 2.0, 0.0, 2.0], hrs="EPSG:32619"))
+        return tiles
+
+    def test_no_halo(self):
+        tiles = self._tiles()
+        output = list(HaloTiles(read_tile=iter(tiles + [None, ]).__next__, halo=0))
+        self.assertEqual(len(output), 3)
+        self.assertTrue(all(out is tile for out, tile in zip(output, tiles)))
+
+    def test_halo(self):
+        tiles = self._tiles()
+        full = np.vstack([tile.values for tile in tiles])
+        output = list(HaloTiles(read_tile=iter(tiles + [None, ]).__next__, halo=2))
+        self.assertEqual([out.rows for out in output], [6, 8, 6])
+        self.assertEqual([(out.core.start, out.core.stop) for out in output], [(0, 4), (2, 6), (2, 6)])
+        np.testing.assert_array_equal(output[1].values, full[2:10])
+        self.assertEqual(output[1].core_transform, tiles[1].transform)
+
+    def test_not_contiguous_tiles(self):
+        tiles = self._tiles()
+        tiles[2].transform[3] += 100.0
+        output = list(HaloTiles(read_tile=iter(tiles + [None, ]).__next__, halo=2))
+        self.assertEqual([out.rows for out in output], [6, 6, 4])
+
+    def test_invalid_halo(self):
+        with self.assertRaises(RuntimeError):
+            HaloTiles(read_tile=lambda: None, halo=-1)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2SurveyHaloTiles))
+    return s
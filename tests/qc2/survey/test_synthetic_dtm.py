@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from hyo2.qc.survey.fliers.synthetic_dtm import inject_spikes, score_flags, surface_kinds, synthetic_surface
+
+
+class TestQC2SurveySyntheticDtm(unittest.TestCase):
+
+    def test_seeded_surfaces(self):
+        for kind in surface_kinds:
+            surface = synthetic_surface(kind=kind, rows=64, cols=80, seed=3)
+            self.assertEqual(surface.shape, (64, 80))
+            self.assertEqual(surface.dtype, np.float32)
+            np.testing.assert_array_equal(surface, synthetic_surface(kind=kind, rows=64, cols=80, seed=3))
+            if kind in ("holes", "edges"):
+                self.assertTrue(np.isnan(surface).any())
+
+        with self.assertRaises(RuntimeError):
+            synthetic_surface(kind="unknown", rows=8, cols=8)
+
+    def test_inject_spikes(self):
+        surface = synthetic_surface(kind="holes", rows=128, cols=128, seed=1, dtype=np.float64)
+        spiked, spike_r, spike_c = inject_spikes(surface, nr_spikes=20, height=2.0, seed=2)
+        self.assertEqual(len(spike_r), 20)
+        np.testing.assert_allclose(np.abs(spiked[spike_r, spike_c] - surface[spike_r, spike_c]), 2.0)
+
+        changed = np.isfinite(surface) & (spiked != surface)
+        self.assertEqual(np.count_nonzero(changed), 20)
+
+    def test_score_flags(self):
+        flagged = np.zeros((32, 32), dtype=np.uint8)
+        spike_r = np.array([8, 16, 24])
+        spike_c = np.array([8, 16, 24])
+        flagged[8, 8] = 1
+        flagged[16, 17] = 4  # next to a spike, but not on it
+        flagged[2, 28] = 2
+
+        score = score_flags(flagged, spike_r, spike_c)
+        self.assertEqual(score['detected'], 1)
+        self.assertAlmostEqual(score['recall'], 1.0 / 3.0)
+        self.assertEqual(score['flagged'], 3)
+        self.assertEqual(score['false_positives'], 1)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2SurveySyntheticDtm))
+    return s
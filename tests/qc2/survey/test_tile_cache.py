@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from hyo2.qc.survey.fliers.halo_tiles import DepthTile
+from hyo2.qc.survey.fliers.tile_cache import TileCache
+
+
+def _tile(values: np.ndarray) -> DepthTile:
+    return DepthTile(values=values, is_double=False, transform=[0.0, 1.0, 0.0, 0.0, 0.0, 1.0], hrs="EPSG:32619")
+
+
+def _results(shape: tuple) -> dict:
+    flag_grid = np.zeros(shape, dtype=np.uint8)
+    flag_grid[1, 2] = 2
+    flag_grid[3, 0] = 5
+    results = {key: 1.5 for key in TileCache.scalar_keys}
+    results['cur_height'] = None
+    results['flag_grid'] = flag_grid
+    return results
+
+
+class TestQC2SurveyTileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.arange(20, dtype=np.float32).reshape(4, 5)
+        self.values[2, 2] = np.nan
+
+    def test_fingerprint(self):
+        with tempfile.TemporaryDirectory() as cache_folder:
+            cache = TileCache(cache_folder=cache_folder, params={'height': 1.0})
+            fingerprint = cache.fingerprint(_tile(self.values))
+            self.assertEqual(fingerprint, cache.fingerprint(_tile(self.values.copy())))
+
+            changed = self.values.copy()
+            changed[0, 0] += 0.01
+            self.assertNotEqual(fingerprint, cache.fingerprint(_tile(changed)))
+
+            other = TileCache(cache_folder=cache_folder, params={'height': 2.0})
+            self.assertNotEqual(fingerprint, other.fingerprint(_tile(self.values)))
+
+    def test_write_read(self):
+        with tempfile.TemporaryDirectory() as cache_folder:
+            cache = TileCache(cache_folder=cache_folder, params={'height': 1.0})
+            fingerprint = cache.fingerprint(_tile(self.values))
+            self.assertIsNone(cache.read(fingerprint, shape=self.values.shape))
+
+            results = _results(self.values.shape)
+            cache.write(fingerprint, results)
+
+            cached = TileCache(cache_folder=cache_folder, params={'height': 1.0}).read(fingerprint,
+                                                                                      shape=self.values.shape)
+            np.testing.assert_array_equal(cached['flag_grid'], results['flag_grid'])
+            self.assertIsNone(cached['cur_height'])
+            self.assertEqual(cached['median'], 1.5)
+
+    def test_prune(self):
+        with tempfile.TemporaryDirectory() as cache_folder:
+            cache = TileCache(cache_folder=cache_folder, params={'height': 1.0})
+            fingerprint = cache.fingerprint(_tile(self.values))
+            cache.write(fingerprint, _results(self.values.shape))
+
+            cache = TileCache(cache_folder=cache_folder, params={'height': 1.0})
+            cache.prune()
+            self.assertEqual(len(os.listdir(cache_folder)), 0)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2SurveyTileCache))
+    return s
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# run in a fresh interpreter, so that the modules already imported by the tests are not counted
+_import_script = """
+import sys
+import time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+gui_modules = [name for name in ("matplotlib", "PySide2", "PyQt5") if name in sys.modules]
+print("%%.3f;%%s" %% (elapsed, ",".join(gui_modules)))
+"""
+
+
+class TestQC2ImportTime(unittest.TestCase):
+
+    budget = 3.0  # seconds
+
+    def _import(self, module: str) -> tuple:
+        env = dict(os.environ)
+        env.pop("DISPLAY", None)  # as for the batch jobs
+        ret = subprocess.run([sys.executable, "-c", _import_script % module], env=env, capture_output=True,
+                             universal_newlines=True)
+        self.assertEqual(ret.returncode, 0, ret.stderr)
+        elapsed, gui_modules = ret.stdout.strip().splitlines()[-1].split(";")
+        return float(elapsed), gui_modules
+
+    def test_cli_entry_point(self):
+        elapsed, gui_modules = self._import("hyo2.qc.cli.cli")
+        self.assertEqual(gui_modules, "")
+        self.assertLess(elapsed, self.budget)
+
+    def test_survey_project(self):
+        _, gui_modules = self._import("hyo2.qc.survey.project")
+        self.assertEqual(gui_modules, "")
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQC2ImportTime))
+    return s